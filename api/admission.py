@@ -0,0 +1,240 @@
+"""Admission control: per-client rate limits and a cap on expensive work.
+
+Requests are turned away before any work is spent on them:
+
+- Each client IP has a token bucket refilled at ``ADMISSION_IP_RATE``
+  requests per second, holding up to ``ADMISSION_IP_BURST`` tokens. An empty
+  bucket gets ``429``.
+- Each affiliate has a bucket (``ADMISSION_AFFILIATE_RATE`` and
+  ``_BURST``) for ``/api/track`` and ``/api/leads``. It is checked once the
+  body is parsed, and replayed idempotent requests do not spend it.
+- At most ``ADMISSION_MAX_CONCURRENT`` requests run at once on the
+  expensive routes (``ADMISSION_EXPENSIVE_ROUTES``, path templates). Others
+  wait up to ``ADMISSION_QUEUE_MS`` for a slot, then get ``503``.
+
+Rejections carry ``Retry-After``. A rate or cap of 0, the default, turns that
+check off. Limits are kept per worker process.
+
+Behind proxies, set ``ADMISSION_PROXY_HOPS`` to the number of proxies that
+append to ``X-Forwarded-For``. The client is then the address the outermost
+proxy saw: the Nth entry from the right of ``X-Forwarded-For``.
+"""
+
+import asyncio
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable, Iterable
+from typing import Optional
+
+from fastapi import HTTPException
+from starlette.responses import JSONResponse
+from starlette.routing import Router
+
+from .metrics import REGISTRY, RouteLabels
+
+DEFAULT_EXPENSIVE_ROUTES = (
+    "/api/quote",
+    "/api/quote/stream",
+    "/api/quote/matrix",
+    "/api/quote/prepay",
+    "/api/quote/solve",
+    "/api/quotes/batch",
+    "/api/export/{kind}",
+)
+
+# Health and readiness checks and scrapes are never limited.
+EXEMPT_ROUTES = frozenset({"/api/health", "/api/ready", "/api/metrics"})
+
+ADMISSION_REJECTED = REGISTRY.counter(
+    "admission_rejected_total",
+    "Requests turned away by admission control.",
+    ("route", "reason"),
+)
+ADMISSION_QUEUED = REGISTRY.counter(
+    "admission_queued_total",
+    "Requests that waited for a slot on an expensive route.",
+    ("route",),
+)
+ADMISSION_WAITING = REGISTRY.gauge(
+    "admission_waiting", "Requests waiting for a slot on an expensive route."
+)
+
+
+class RateLimiter:
+    """Token buckets per key; the least recently seen keys are forgotten
+    beyond ``max_keys`` (so they start again with a full bucket)."""
+
+    def __init__(
+        self,
+        rate: float,
+        burst: Optional[float] = None,
+        max_keys: int = 10000,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.rate = rate
+        self.burst = burst if burst is not None else max(1.0, rate)
+        self.max_keys = max_keys
+        self.clock = clock
+        self._buckets: OrderedDict[str, tuple[float, float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, prefix: str) -> "RateLimiter":
+        """Build a limiter from ``<prefix>_RATE`` (per second, 0 disables it)
+        and ``<prefix>_BURST`` (default: one second's worth)."""
+        burst = os.getenv(f"{prefix}_BURST")
+        return cls(
+            float(os.getenv(f"{prefix}_RATE", "0")),
+            float(burst) if burst else None,
+            max_keys=int(os.getenv("ADMISSION_MAX_CLIENTS", "10000")),
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self.rate > 0
+
+    def acquire(self, key: str) -> float:
+        """Take a token for ``key``: 0.0, or the seconds until one is due."""
+        if not self.enabled:
+            return 0.0
+        with self._lock:
+            now = self.clock()
+            state = self._buckets.pop(key, None)
+            if state is None:
+                tokens = self.burst
+            else:
+                tokens = min(self.burst, state[0] + (now - state[1]) * self.rate)
+            wait = 0.0
+            if tokens >= 1:
+                tokens -= 1
+            else:
+                wait = (1 - tokens) / self.rate
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+            return wait
+
+
+def retry_after(wait: float) -> str:
+    return str(max(1, math.ceil(wait)))
+
+
+AFFILIATES = RateLimiter.from_env("ADMISSION_AFFILIATE")
+
+
+def admit_affiliate(affiliate: Optional[str], route: str) -> None:
+    """Spend ``affiliate``'s token for a write, or raise ``429``."""
+    if affiliate is None:
+        return
+    wait = AFFILIATES.acquire(affiliate)
+    if wait:
+        ADMISSION_REJECTED.inc(route, "affiliate_rate")
+        raise HTTPException(
+            status_code=429,
+            detail="Too many requests for this affiliate",
+            headers={"Retry-After": retry_after(wait)},
+        )
+
+
+def _routes_from_env() -> tuple[str, ...]:
+    value = os.getenv("ADMISSION_EXPENSIVE_ROUTES")
+    if value is None:
+        return DEFAULT_EXPENSIVE_ROUTES
+    return tuple(r.strip() for r in value.split(",") if r.strip())
+
+
+class AdmissionMiddleware:
+    """Pure ASGI middleware applying the per-IP limit and the concurrency cap;
+    arguments left out are read from the environment."""
+
+    def __init__(
+        self,
+        app,
+        router: Router,
+        clients: Optional[RateLimiter] = None,
+        max_concurrent: Optional[int] = None,
+        queue_timeout: Optional[float] = None,
+        expensive: Optional[Iterable[str]] = None,
+        proxy_hops: Optional[int] = None,
+    ):
+        self.app = app
+        self._route = RouteLabels(router)
+        self.clients = clients or RateLimiter.from_env("ADMISSION_IP")
+        if max_concurrent is None:
+            max_concurrent = int(os.getenv("ADMISSION_MAX_CONCURRENT", "0"))
+        self.max_concurrent = max_concurrent
+        if queue_timeout is None:
+            queue_timeout = int(os.getenv("ADMISSION_QUEUE_MS", "100")) / 1000
+        self.queue_timeout = queue_timeout
+        self.expensive = frozenset(
+            _routes_from_env() if expensive is None else expensive
+        )
+        if proxy_hops is None:
+            proxy_hops = int(os.getenv("ADMISSION_PROXY_HOPS", "0"))
+        self.proxy_hops = proxy_hops
+        self._slots: Optional[asyncio.Semaphore] = None
+
+    def client_ip(self, scope) -> str:
+        if self.proxy_hops > 0:
+            for name, value in scope["headers"]:
+                if name == b"x-forwarded-for":
+                    hops = [h.strip() for h in value.decode("latin-1").split(",")]
+                    return hops[-min(self.proxy_hops, len(hops))]
+        client = scope.get("client")
+        return client[0] if client else "unknown"
+
+    async def _acquire_slot(self, route: str) -> bool:
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_concurrent)
+        if not self._slots.locked():
+            await self._slots.acquire()
+            return True
+        if self.queue_timeout <= 0:
+            return False
+        ADMISSION_QUEUED.inc(route)
+        ADMISSION_WAITING.inc()
+        try:
+            await asyncio.wait_for(self._slots.acquire(), self.queue_timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            ADMISSION_WAITING.dec()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        route = self._route(scope)
+        if route in EXEMPT_ROUTES:
+            await self.app(scope, receive, send)
+            return
+        wait = self.clients.acquire(self.client_ip(scope))
+        if wait:
+            ADMISSION_REJECTED.inc(route, "ip_rate")
+            response = JSONResponse(
+                {"detail": "Too many requests"},
+                status_code=429,
+                headers={"Retry-After": retry_after(wait)},
+            )
+            await response(scope, receive, send)
+            return
+        if self.max_concurrent <= 0 or route not in self.expensive:
+            await self.app(scope, receive, send)
+            return
+        if not await self._acquire_slot(route):
+            ADMISSION_REJECTED.inc(route, "concurrency")
+            response = JSONResponse(
+                {"detail": "Server busy"},
+                status_code=503,
+                headers={"Retry-After": "1"},
+            )
+            await response(scope, receive, send)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self._slots.release()
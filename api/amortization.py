@@ -0,0 +1,333 @@
+"""Fast amortization kernels that reproduce ``quote()`` to the cent.
+
+``api.app.quote`` is the reference implementation: it walks the schedule in
+``Decimal`` and rounds every figure to cents with ``ROUND_HALF_UP``. The
+kernels here work on integer cents instead and must agree with it exactly,
+which ``tests/test_batch_quote.py`` checks differentially.
+
+The only inexact step of the reference loop is the monthly interest,
+``quantize(balance * r)``, where ``r`` is the 28-digit ``Decimal`` monthly
+rate and the product is itself rounded to the context precision before it is
+quantized. :func:`interest_cents` evaluates that expression once for a single
+balance; :class:`CentsRate` replays the same two roundings with plain integer
+arithmetic for the scalar engine (:func:`amortize_cents`); the vectorized
+kernel approximates it in float64 and falls back to :func:`interest_cents` for
+the (rare) rows that land too close to a half-cent for the approximation to be
+trusted. numpy is imported by the vectorized kernels on first use, which keeps
+it out of the API's startup.
+"""
+
+from collections import defaultdict
+from collections.abc import Callable, Iterator, Sequence
+from decimal import ROUND_HALF_UP, Decimal, getcontext
+from typing import TYPE_CHECKING, NamedTuple, Optional
+
+if TYPE_CHECKING:
+    import numpy as np
+
+TWO_PLACES = Decimal("0.01")
+
+# Balances above this lose integer precision in float64; such loans (tens of
+# trillions of dollars) take the exact path for every row.
+_FLOAT_SAFE_CENTS = 2**52
+# The vectorized kernels keep cents in int64; loans whose payments could sum
+# past this (with room for a month's interest) take the scalar engine instead.
+_INT64_SAFE_CENTS = 2**62
+# Relative distance from a half-cent below which the float64 estimate of
+# ``balance * r`` (error under 1e-15 relative) is not trusted.
+_TIE_TOLERANCE = 1e-12
+
+
+class Loan(NamedTuple):
+    """Inputs of one amortization: amounts in cents, monthly rate ``r``."""
+
+    amount_cents: int
+    rate: Decimal
+    payment_cents: int
+    term: int
+
+
+class Schedule(NamedTuple):
+    """Per-month figures in cents plus the exact totals of a schedule."""
+
+    payment: list[int]
+    principal: list[int]
+    interest: list[int]
+    balance: list[int]
+    total_principal: int
+    total_interest: int
+
+
+def to_cents(value: Decimal) -> int:
+    """Convert a ``Decimal`` already rounded to cents into integer cents."""
+    return int(value.scaleb(2))
+
+
+def interest_cents(balance_cents: int, rate: Decimal) -> int:
+    """Interest for one month, rounded exactly as the reference loop does."""
+    interest = (Decimal(balance_cents).scaleb(-2) * rate).quantize(
+        TWO_PLACES, rounding=ROUND_HALF_UP
+    )
+    return to_cents(interest)
+
+
+class CentsRate:
+    """A monthly rate that computes reference-exact interest on integer cents.
+
+    ``Decimal`` multiplies ``balance * r`` exactly, rounds the product to the
+    context precision (``ROUND_HALF_EVEN``) and the reference then quantizes
+    it to cents (``ROUND_HALF_UP``). Both steps are reproduced here on the
+    integer coefficient, so no ``Decimal`` objects are created per month.
+    """
+
+    __slots__ = ("coefficient", "exponent", "limit", "prec")
+
+    def __init__(self, rate: Decimal):
+        sign, digits, exponent = rate.as_tuple()
+        if sign or not isinstance(exponent, int):
+            raise ValueError(f"unsupported rate {rate!r}")
+        self.coefficient = int("".join(map(str, digits)) or "0")
+        # Balances are cents, i.e. coefficient * 10**-2 dollars; express the
+        # product's exponent relative to cents.
+        self.exponent = exponent
+        self.prec = getcontext().prec
+        self.limit = 10**self.prec
+
+    def interest(self, balance_cents: int) -> int:
+        product = balance_cents * self.coefficient
+        shift = self.exponent
+        if product >= self.limit:
+            drop = len(str(product)) - self.prec
+            unit = 10**drop
+            product, rem = divmod(product, unit)
+            half = unit // 2
+            if rem > half or (rem == half and product & 1):
+                product += 1
+            shift += drop
+        if shift >= 0:
+            return product * 10**shift
+        unit = 10**-shift
+        cents, rem = divmod(product, unit)
+        return cents + 1 if 2 * rem >= unit else cents
+
+
+# (month, payment, principal, interest, balance), amounts in cents.
+Row = tuple[int, int, int, int, int]
+
+
+def iter_amortization(loan: Loan) -> Iterator[Row]:
+    """Yield the schedule of ``loan`` one :data:`Row` at a time.
+
+    Row-for-row equal to the reference, including its last-period adjustment
+    (the final payment retires whatever balance is left), while holding only
+    the current balance; :func:`amortize_cents` collects it into a Schedule.
+    """
+    rate = CentsRate(loan.rate) if loan.rate != 0 else None
+    monthly = loan.payment_cents
+    balance = loan.amount_cents
+    term = loan.term
+
+    for month in range(1, term + 1):
+        if balance == 0 or rate is None:
+            interest = 0
+        else:
+            interest = rate.interest(balance)
+        principal = monthly - interest
+        if principal < 0:
+            principal = 0
+            payment = interest
+        else:
+            payment = monthly
+        if principal > balance or month == term:
+            principal = balance
+            payment = principal + interest
+        balance -= principal
+        yield month, payment, principal, interest, balance
+
+
+def iter_prepayment(
+    loan: Loan,
+    extra: Callable[[int], int],
+    start: int = 1,
+    balance: Optional[int] = None,
+) -> Iterator[Row]:
+    """Like :func:`iter_amortization`, paying ``extra(month)`` cents of
+    principal on top of the scheduled payment, and stopping at payoff.
+
+    The walk can resume mid-schedule: rows before the first month with an
+    extra payment equal the baseline, so callers pass that ``month`` and the
+    baseline ``balance`` after the month before it.
+    """
+    rate = CentsRate(loan.rate) if loan.rate != 0 else None
+    monthly = loan.payment_cents
+    if balance is None:
+        balance = loan.amount_cents
+    term = loan.term
+
+    for month in range(start, term + 1):
+        if balance == 0:
+            return
+        interest = 0 if rate is None else rate.interest(balance)
+        principal = monthly - interest
+        if principal < 0:
+            principal = 0
+            payment = interest
+        else:
+            payment = monthly
+        additional = extra(month)
+        principal += additional
+        payment += additional
+        if principal > balance or month == term:
+            principal = balance
+            payment = principal + interest
+        balance -= principal
+        yield month, payment, principal, interest, balance
+
+
+def amortize_cents(loan: Loan) -> Schedule:
+    """Amortize one loan in integer cents, row-for-row equal to the reference."""
+    if loan.term <= 0:
+        return Schedule([], [], [], [], 0, 0)
+    _, payments, principals, interests, balances = map(
+        list, zip(*iter_amortization(loan))
+    )
+    return Schedule(
+        payment=payments,
+        principal=principals,
+        interest=interests,
+        balance=balances,
+        total_principal=sum(principals),
+        total_interest=sum(interests),
+    )
+
+
+def _vector_safe(loan: Loan) -> bool:
+    """Whether ``loan``'s figures and totals fit the int64 kernels."""
+    largest = max(abs(loan.amount_cents), abs(loan.payment_cents))
+    return largest * (loan.term + 1) * (1 + loan.rate) < _INT64_SAFE_CENTS
+
+
+def _interest_vector(
+    balance: "np.ndarray", rate_f: "np.ndarray", rates: Sequence[Decimal]
+) -> "np.ndarray":
+    import numpy as np
+
+    estimate = balance * rate_f
+    interest = np.floor(estimate + 0.5).astype(np.int64)
+    frac = estimate - np.floor(estimate)
+    unsure = np.abs(frac - 0.5) <= _TIE_TOLERANCE * np.maximum(estimate, 1.0)
+    unsure |= balance >= _FLOAT_SAFE_CENTS
+    for i in np.flatnonzero(unsure):
+        interest[i] = interest_cents(int(balance[i]), rates[i])
+    return interest
+
+
+def _batch_months(
+    group: Sequence[Loan],
+) -> Iterator[tuple["np.ndarray", "np.ndarray", "np.ndarray", "np.ndarray"]]:
+    """Yield the (payment, principal, interest, balance) vectors of every
+    month up to the longest term in ``group``, one element per loan.
+
+    A loan whose term has ended has a zero balance, so its later months are
+    all zeros and do not change its totals.
+    """
+    import numpy as np
+
+    rates = [loan.rate for loan in group]
+    rate_f = np.array([float(r) for r in rates], dtype=np.float64)
+    no_interest = np.array([r == 0 for r in rates], dtype=bool)
+    monthly = np.array([loan.payment_cents for loan in group], dtype=np.int64)
+    balance = np.array([loan.amount_cents for loan in group], dtype=np.int64)
+    last = np.array([loan.term - 1 for loan in group], dtype=np.int64)
+
+    for m in range(int(last.max()) + 1):
+        interest = _interest_vector(balance, rate_f, rates)
+        interest[no_interest | (balance == 0)] = 0
+        principal = monthly - interest
+        short = principal < 0
+        principal[short] = 0
+        payment = np.where(short, interest, monthly)
+        payoff = (principal > balance) | (last == m)
+        principal = np.where(payoff, balance, principal)
+        payment = np.where(payoff, principal + interest, payment)
+        balance = balance - principal
+        yield payment, principal, interest, balance
+
+
+def amortize_batch(loans: Sequence[Loan]) -> list[Schedule]:
+    """Amortize many loans at once, one vectorized pass per term length.
+
+    Results are returned in input order and match the reference loop row for
+    row. Loans too large for int64 cents are amortized by :func:`amortize_cents`.
+    """
+    import numpy as np
+
+    results: list[Schedule] = [None] * len(loans)  # type: ignore[list-item]
+    by_term: dict[int, list[int]] = defaultdict(list)
+    for i, loan in enumerate(loans):
+        if _vector_safe(loan):
+            by_term[loan.term].append(i)
+        else:
+            results[i] = amortize_cents(loan)
+
+    for term, members in by_term.items():
+        group = [loans[i] for i in members]
+        shape = (len(group), term)
+        pay_rows = np.empty(shape, dtype=np.int64)
+        principal_rows = np.empty(shape, dtype=np.int64)
+        interest_rows = np.empty(shape, dtype=np.int64)
+        balance_rows = np.empty(shape, dtype=np.int64)
+
+        for m, (payment, principal, interest, balance) in enumerate(
+            _batch_months(group)
+        ):
+            pay_rows[:, m] = payment
+            principal_rows[:, m] = principal
+            interest_rows[:, m] = interest
+            balance_rows[:, m] = balance
+
+        total_principal = principal_rows.sum(axis=1)
+        total_interest = interest_rows.sum(axis=1)
+        for j, i in enumerate(members):
+            results[i] = Schedule(
+                payment=pay_rows[j].tolist(),
+                principal=principal_rows[j].tolist(),
+                interest=interest_rows[j].tolist(),
+                balance=balance_rows[j].tolist(),
+                total_principal=int(total_principal[j]),
+                total_interest=int(total_interest[j]),
+            )
+    return results
+
+
+def amortize_totals(loans: Sequence[Loan]) -> list[tuple[int, int]]:
+    """``(total_principal, total_interest)`` in cents of each loan.
+
+    Same figures as :func:`amortize_batch`, but all loans are amortized in a
+    single vectorized pass whatever their terms, and only running totals are
+    kept, so memory is per loan rather than per loan-month. Loans too large
+    for int64 cents are amortized by :func:`amortize_cents`.
+    """
+    results: list[tuple[int, int]] = []
+    vector: list[int] = []
+    for i, loan in enumerate(loans):
+        if _vector_safe(loan):
+            vector.append(i)
+            results.append((0, 0))
+        else:
+            schedule = amortize_cents(loan)
+            results.append((schedule.total_principal, schedule.total_interest))
+    if not vector:
+        return results
+    import numpy as np
+
+    total_principal = np.zeros(len(vector), dtype=np.int64)
+    total_interest = np.zeros(len(vector), dtype=np.int64)
+    for _, principal, interest, _ in _batch_months([loans[i] for i in vector]):
+        total_principal += principal
+        total_interest += interest
+    for i, totals in zip(
+        vector, zip(total_principal.tolist(), total_interest.tolist())
+    ):
+        results[i] = totals
+    return results
@@ -1,14 +1,89 @@
-import json
+import hashlib
+import math
 import os
-from datetime import datetime
+from collections.abc import Callable, Iterator, Sequence
+from contextlib import asynccontextmanager
+from datetime import date, datetime
 from decimal import ROUND_HALF_UP, Decimal, getcontext
-from typing import Optional
+from itertools import accumulate
+from typing import Annotated, Literal, NamedTuple, Optional, Union
+from urllib.parse import urlencode
 
-from fastapi import FastAPI
+import anyio
+from fastapi import FastAPI, Header, HTTPException, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel, EmailStr, Field
+from fastapi.responses import JSONResponse, RedirectResponse, StreamingResponse
+from pydantic import AliasChoices, BaseModel, EmailStr, Field, model_validator
+
+from . import admission, export, rollups
+from .admission import AdmissionMiddleware
+from .amortization import (
+    Loan,
+    Schedule,
+    amortize_batch,
+    amortize_cents,
+    amortize_totals,
+    iter_amortization,
+    iter_prepayment,
+    to_cents,
+)
+from .cache import LRUCache, canonical_key
+from .idempotency import IdempotencyStore, KeyReused
+from .ingest import IngestQueue, QueueFull
+from .iopool import PERSIST, PoolBusy
+from .metrics import REGISTRY, MetricsMiddleware, SnapshotWriter, metrics_dir, render
+from .profiling import ProfiledRoute, ProfilingMiddleware, span, timed
+from .serialization import CODINGS, accepts, compress, dumps, negotiate_coding
+from .solver import (
+    NoSolution,
+    annuity_principal,
+    annuity_term,
+    max_within,
+    min_within,
+)
+from .storage import get_store
+from .warmup import WARMUP
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Write-behind ingest for /api/track is opt-in via TRACK_WRITE_BEHIND=1;
+    # without it (or outside the lifespan) clicks are written synchronously.
+    track_queue = None
+    if os.getenv("TRACK_WRITE_BEHIND", "0") == "1":
+        track_queue = IngestQueue.from_env("TRACK", lambda: get_store("tracks"))
+        track_queue.start()
+    app.state.track_queue = track_queue
+    # Sync endpoints (quotes) run on AnyIO's default threadpool; persistence
+    # has its own pool (api.iopool), so this one only needs CPU-bound work.
+    threadpool = anyio.to_thread.current_default_thread_limiter()
+    if os.getenv("API_THREADPOOL_SIZE"):
+        threadpool.total_tokens = int(os.environ["API_THREADPOOL_SIZE"])
+    app.state.threadpool = threadpool
+    # Sample quotes, store opening and cache priming run in the background;
+    # /api/ready answers 503 until they are done (api.warmup).
+    warmup = WARMUP.start()
+    # Multi-worker deployments share metrics through METRICS_DIR snapshots.
+    snapshots = SnapshotWriter() if metrics_dir() else None
+    if snapshots is not None:
+        snapshots.start()
+    try:
+        yield
+    finally:
+        app.state.track_queue = None
+        if track_queue is not None:
+            track_queue.stop()
+        warmup.join()
+        WARMUP.reset()  # a worker shutting down takes no new traffic
+        PERSIST.shutdown()
+        rollups.flush()
+        if snapshots is not None:
+            snapshots.stop()
 
-app = FastAPI(title="Dealer Quote API", version="0.1.0")
+
+app = FastAPI(title="Dealer Quote API", version="0.1.0", lifespan=lifespan)
+# Lets ProfilingMiddleware run selected requests' endpoints under cProfile.
+app.router.route_class = ProfiledRoute
 
 # Configure CORS to only allow specific origins instead of allowing all requests.
 # Origins can be supplied via the ALLOWED_ORIGINS environment variable as a
@@ -16,19 +91,30 @@ app = FastAPI(title="Dealer Quote API", version="0.1.0")
 allowed_origins = [
     o.strip() for o in os.getenv("ALLOWED_ORIGINS", "").split(",") if o.strip()
 ]
+# Upper bound on the number of quotes accepted by /api/quotes/batch.
+QUOTE_BATCH_MAX = int(os.getenv("QUOTE_BATCH_MAX", "5000"))
+# Longest term, in months, of any loan the API prices.
+QUOTE_MAX_TERM = int(os.getenv("QUOTE_MAX_TERM", "600"))
+# Upper bound on the summed terms (schedule rows) of one /api/quotes/batch.
+QUOTE_BATCH_MAX_MONTHS = int(os.getenv("QUOTE_BATCH_MAX_MONTHS", "600000"))
+# Inside CORS, so rejections still carry the CORS headers browsers need.
+app.add_middleware(AdmissionMiddleware, router=app.router)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=allowed_origins,
     allow_methods=["GET", "POST"],
     allow_headers=["*"],
 )
+app.add_middleware(ProfilingMiddleware)
+# Outermost, so latency covers CORS handling and the whole response body.
+app.add_middleware(MetricsMiddleware, router=app.router)
 
 
 class QuoteReq(BaseModel):
     vehicle_price: float = Field(..., gt=0)
     down_payment: float = 0
     apr: float = Field(..., ge=0)
-    term_months: int = Field(..., gt=0)
+    term_months: int = Field(..., gt=0, le=QUOTE_MAX_TERM)
     tax_rate: float = 0.0
     fees: float = 0.0
     trade_in_value: float = 0.0
@@ -55,21 +141,79 @@ class AmortizationRow(BaseModel):
     balance: float
 
 
+class YearSummary(BaseModel):
+    year: int
+    payment: float
+    principal: float
+    interest: float
+    balance: float
+
+
 class QuoteResp(BaseModel):
     amount_financed: float
     monthly_payment: float
     total_interest: float
     total_cost: float
     schedule: list[AmortizationRow]
+    # Only present when the schedule was projected (see ScheduleView).
+    schedule_months: Optional[int] = None
+    yearly: Optional[list[YearSummary]] = None
+
+
+class ScheduleView(NamedTuple):
+    """Which parts of the schedule a quote response should carry.
+
+    Totals are always computed from the full schedule; the view only decides
+    which rows are returned (``rows``/``offset``/``limit``/``months``) and
+    whether yearly summaries are added.
+    """
+
+    rows: bool = True
+    offset: int = 0
+    limit: Optional[int] = None
+    months: Optional[tuple[int, ...]] = None
+    yearly: bool = False
+
+    def indices(self, term: int) -> list[int]:
+        if not self.rows:
+            return []
+        if self.months is not None:
+            return sorted({m - 1 for m in self.months if 1 <= m <= term})
+        stop = term if self.limit is None else min(term, self.offset + self.limit)
+        return list(range(self.offset, stop))
+
+
+FULL_SCHEDULE = ScheduleView()
 
 
 @app.get("/api/health")
-def health():
+async def health():
+    # Async, so health checks never wait for a threadpool thread.
     return {"ok": True}
 
 
-@app.post("/api/quote", response_model=QuoteResp)
-def quote(q: QuoteReq):
+@app.get("/api/ready")
+async def ready():
+    """Whether this worker has warmed up; ``503`` until it has.
+
+    Unlike ``/api/health``, which only shows the process serves requests,
+    this is what deploys wait for before sending a worker traffic.
+    """
+    status = WARMUP.status()
+    if not WARMUP.ready:
+        return JSONResponse(status, status_code=503, headers={"Retry-After": "1"})
+    return status
+
+
+@app.get("/api/metrics")
+def metrics():
+    """Prometheus text exposition of request, quote and persistence metrics."""
+    return Response(render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@timed("principal")
+def _loan_terms(q: QuoteReq) -> tuple[Decimal, Decimal, Decimal]:
+    """Return the amount financed, monthly rate and monthly payment for ``q``."""
     amount_after_trade_in = _to_decimal(q.vehicle_price) - _to_decimal(q.trade_in_value)
     taxes = amount_after_trade_in * _to_decimal(q.tax_rate)
     principal = (
@@ -83,6 +227,22 @@ def quote(q: QuoteReq):
     amount_financed = _to_cents(principal)
     principal = amount_financed
 
+    r = _to_decimal(q.apr) / Decimal("100") / Decimal("12")
+    if q.term_months <= 0:
+        return amount_financed, r, Decimal("0")
+    if r == 0:
+        monthly_payment_decimal = principal / q.term_months
+    else:
+        factor = (Decimal("1") + r) ** q.term_months
+        monthly_payment_decimal = principal * (r * factor) / (factor - Decimal("1"))
+    return amount_financed, r, _to_cents(monthly_payment_decimal)
+
+
+@timed("amortize")
+def quote_decimal(q: QuoteReq) -> QuoteResp:
+    """Reference engine: walk the schedule in ``Decimal``, rounding each row."""
+    amount_financed, r, monthly_payment = _loan_terms(q)
+
     if q.term_months <= 0:
         return QuoteResp(
             amount_financed=float(amount_financed),
@@ -92,14 +252,6 @@ def quote(q: QuoteReq):
             schedule=[],
         )
 
-    r = _to_decimal(q.apr) / Decimal("100") / Decimal("12")
-    if r == 0:
-        monthly_payment_decimal = principal / q.term_months
-    else:
-        factor = (Decimal("1") + r) ** q.term_months
-        monthly_payment_decimal = principal * (r * factor) / (factor - Decimal("1"))
-    monthly_payment = _to_cents(monthly_payment_decimal)
-
     balance = amount_financed
     schedule: list[AmortizationRow] = []
     sum_interest = Decimal("0")
@@ -157,10 +309,1084 @@ def quote(q: QuoteReq):
     )
 
 
-def _data_file(filename: str) -> str:
-    data_dir = os.getenv("PERSIST_DIR", "/data")
-    os.makedirs(data_dir, exist_ok=True)
-    return os.path.join(data_dir, filename)
+def _yearly(sched: Schedule) -> list[dict]:
+    years = []
+    for start in range(0, len(sched.payment), 12):
+        end = start + 12
+        years.append(
+            {
+                "year": start // 12 + 1,
+                "payment": sum(sched.payment[start:end]) / 100,
+                "principal": sum(sched.principal[start:end]) / 100,
+                "interest": sum(sched.interest[start:end]) / 100,
+                "balance": sched.balance[min(end, len(sched.balance)) - 1] / 100,
+            }
+        )
+    return years
+
+
+def _view_indices(sched: Schedule, view: ScheduleView) -> Sequence[int]:
+    if view == FULL_SCHEDULE:
+        return range(len(sched.payment))
+    return view.indices(len(sched.payment))
+
+
+def _totals(
+    amount_financed: Decimal,
+    monthly_payment: Decimal,
+    total_principal: int,
+    total_interest: int,
+) -> dict:
+    return {
+        "amount_financed": float(amount_financed),
+        "monthly_payment": float(monthly_payment),
+        "total_interest": total_interest / 100,
+        "total_cost": (total_principal + total_interest) / 100,
+    }
+
+
+@timed("build")
+def _quote_dict(
+    amount_financed: Decimal,
+    monthly_payment: Decimal,
+    sched: Schedule,
+    view: ScheduleView = FULL_SCHEDULE,
+) -> dict:
+    """Build the QuoteResp-shaped payload for a schedule in plain Python types.
+
+    Keys and float values are exactly those ``QuoteResp`` would serialize
+    (with ``None`` fields excluded).
+    """
+    indices = _view_indices(sched, view)
+    data = {
+        **_totals(
+            amount_financed,
+            monthly_payment,
+            sched.total_principal,
+            sched.total_interest,
+        ),
+        "schedule": [
+            {
+                "month": i + 1,
+                "payment": sched.payment[i] / 100,
+                "principal": sched.principal[i] / 100,
+                "interest": sched.interest[i] / 100,
+                "balance": sched.balance[i] / 100,
+            }
+            for i in indices
+        ],
+    }
+    if view != FULL_SCHEDULE:
+        data["schedule_months"] = len(sched.payment)
+        if view.yearly:
+            data["yearly"] = _yearly(sched)
+    return data
+
+
+# Media type of the columnar schedule representation (see _columnar_dict).
+COLUMNAR_MEDIA_TYPE = "application/vnd.dealer-quote.columnar+json"
+
+
+def _delta(values: list[int]) -> list[int]:
+    return values[:1] + [b - a for a, b in zip(values, values[1:])]
+
+
+@timed("build")
+def _columnar_dict(
+    amount_financed: Decimal,
+    monthly_payment: Decimal,
+    sched: Schedule,
+    view: ScheduleView = FULL_SCHEDULE,
+    encoding: str = "float",
+) -> dict:
+    """Build the columnar payload: the schedule as parallel arrays.
+
+    ``encoding`` applies to the schedule columns only: ``float`` holds dollars
+    like the row format, ``cents`` integer cents, and ``delta`` integer cents
+    (and months) stored as the first value followed by successive
+    differences. Totals and yearly summaries are always in dollars.
+    """
+    indices = _view_indices(sched, view)
+    columns = {"month": [i + 1 for i in indices]}
+    for name in ("payment", "principal", "interest", "balance"):
+        values = getattr(sched, name)
+        columns[name] = [values[i] for i in indices]
+    if encoding == "float":
+        for name in ("payment", "principal", "interest", "balance"):
+            columns[name] = [c / 100 for c in columns[name]]
+    elif encoding == "delta":
+        columns = {name: _delta(values) for name, values in columns.items()}
+    data = {
+        **_totals(
+            amount_financed,
+            monthly_payment,
+            sched.total_principal,
+            sched.total_interest,
+        ),
+        "schedule_months": len(sched.payment),
+        "encoding": encoding,
+        "schedule": columns,
+    }
+    if view.yearly:
+        data["yearly"] = _yearly(sched)
+    return data
+
+
+def _quote_from_schedule(
+    amount_financed: Decimal,
+    monthly_payment: Decimal,
+    sched: Schedule,
+    view: ScheduleView = FULL_SCHEDULE,
+) -> QuoteResp:
+    # Validating one nested dict is markedly cheaper than constructing an
+    # AmortizationRow per month.
+    data = _quote_dict(amount_financed, monthly_payment, sched, view)
+    with span("model"):
+        return QuoteResp.model_validate(data)
+
+
+def _schedule_of(resp: QuoteResp) -> Schedule:
+    """Recover the integer-cent schedule from a full reference response."""
+    rows = resp.schedule
+    principal = [round(row.principal * 100) for row in rows]
+    interest = [round(row.interest * 100) for row in rows]
+    return Schedule(
+        payment=[round(row.payment * 100) for row in rows],
+        principal=principal,
+        interest=interest,
+        balance=[round(row.balance * 100) for row in rows],
+        total_principal=sum(principal),
+        total_interest=sum(interest),
+    )
+
+
+def _cents_schedule(q: QuoteReq) -> tuple[Decimal, Decimal, Schedule]:
+    amount_financed, r, monthly_payment = _loan_terms(q)
+    loan = Loan(to_cents(amount_financed), r, to_cents(monthly_payment), q.term_months)
+    with span("amortize"):
+        return amount_financed, monthly_payment, amortize_cents(loan)
+
+
+def quote_cents(q: QuoteReq, view: ScheduleView = FULL_SCHEDULE) -> QuoteResp:
+    """Integer-cents engine; returns exactly what :func:`quote_decimal` does."""
+    if q.term_months <= 0:
+        return quote_decimal(q)
+    return _quote_from_schedule(*_cents_schedule(q), view)
+
+
+def _quote_reference(q: QuoteReq, view: ScheduleView = FULL_SCHEDULE) -> QuoteResp:
+    resp = quote_decimal(q)
+    if view == FULL_SCHEDULE:
+        return resp
+    amount_financed, _, monthly_payment = _loan_terms(q)
+    return _quote_from_schedule(
+        amount_financed, monthly_payment, _schedule_of(resp), view
+    )
+
+
+# Memoizes quote results per (format, engine, request, view); see api/cache.py.
+quote_cache = LRUCache.from_env("QUOTE_CACHE")
+
+# QUOTE_ENGINE selects the implementation behind /api/quote. "decimal" is the
+# reference; "cents" is the default fast path and must agree with it exactly.
+QUOTE_ENGINES = {"decimal": _quote_reference, "cents": quote_cents}
+
+
+QUOTE_TERMS = REGISTRY.histogram(
+    "quote_term_months",
+    "Term lengths of quoted loans.",
+    ("endpoint",),
+    buckets=(12, 24, 36, 48, 60, 72, 84, 96, 120, 180, 240, 360),
+)
+QUOTE_CACHE_EVENTS = REGISTRY.counter(
+    "quote_cache_events_total", "Quote cache lookups and evictions.", ("event",)
+)
+QUOTE_CACHE_SIZE = REGISTRY.gauge("quote_cache_entries", "Entries in the quote cache.")
+TRACK_QUEUE_DEPTH = REGISTRY.gauge(
+    "track_queue_depth", "Clicks waiting in the write-behind queue."
+)
+TRACK_QUEUE_EVENTS = REGISTRY.counter(
+    "track_queue_records_total", "Write-behind queue records by outcome.", ("outcome",)
+)
+THREADPOOL_THREADS = REGISTRY.gauge(
+    "threadpool_threads", "Threads available to sync endpoints."
+)
+THREADPOOL_BUSY = REGISTRY.gauge("threadpool_busy", "Threads running sync endpoints.")
+
+
+@REGISTRY.collector
+def _collect_quote_cache() -> None:
+    stats = quote_cache.stats()
+    for event in ("hits", "misses", "evictions"):
+        QUOTE_CACHE_EVENTS.set(stats[event], event)
+    QUOTE_CACHE_SIZE.set(stats["size"])
+
+
+@REGISTRY.collector
+def _collect_track_queue() -> None:
+    track_queue = getattr(app.state, "track_queue", None)
+    if track_queue is None:
+        return
+    TRACK_QUEUE_DEPTH.set(track_queue.depth)
+    for outcome in ("accepted", "rejected", "written"):
+        TRACK_QUEUE_EVENTS.set(getattr(track_queue, outcome), outcome)
+
+
+@REGISTRY.collector
+def _collect_threadpool() -> None:
+    threadpool = getattr(app.state, "threadpool", None)
+    if threadpool is None:
+        return
+    THREADPOOL_THREADS.set(threadpool.total_tokens)
+    THREADPOOL_BUSY.set(threadpool.borrowed_tokens)
+
+
+def _engine() -> str:
+    engine = os.getenv("QUOTE_ENGINE", "cents")
+    if engine not in QUOTE_ENGINES:
+        raise ValueError(f"Unknown QUOTE_ENGINE {engine!r}")
+    return engine
+
+
+def quote(q: QuoteReq, view: ScheduleView = FULL_SCHEDULE) -> QuoteResp:
+    """Quote a loan with the configured engine, memoized in ``quote_cache``."""
+    engine = _engine()
+    key = ("model", engine, canonical_key(q), view)
+    resp = quote_cache.get(key)
+    if resp is None:
+        resp = QUOTE_ENGINES[engine](q, view)
+        quote_cache.set(key, resp)
+    return resp
+
+
+def _quote_payload(
+    q: QuoteReq, engine: str, view: ScheduleView, encoding: Optional[str]
+) -> dict:
+    if encoding is not None:
+        if engine == "cents":
+            amount_financed, monthly_payment, sched = _cents_schedule(q)
+        else:
+            amount_financed, _, monthly_payment = _loan_terms(q)
+            sched = _schedule_of(quote_decimal(q))
+        return _columnar_dict(amount_financed, monthly_payment, sched, view, encoding)
+    if engine == "cents" and q.term_months > 0:
+        return _quote_dict(*_cents_schedule(q), view)
+    return QUOTE_ENGINES[engine](q, view).model_dump(exclude_none=True)
+
+
+def _compress_min_bytes() -> int:
+    return int(os.getenv("QUOTE_COMPRESS_MIN_BYTES", "1024"))
+
+
+def quote_body(
+    q: QuoteReq,
+    view: ScheduleView = FULL_SCHEDULE,
+    encoding: Optional[str] = None,
+    coding: Optional[str] = None,
+) -> tuple[bytes, Optional[str]]:
+    """Return the encoded ``/api/quote`` body for ``q`` and its content coding.
+
+    ``encoding`` selects the columnar format with that column encoding
+    (``None`` is the row format). The body is compressed with ``coding``
+    unless it is shorter than ``QUOTE_COMPRESS_MIN_BYTES``; the returned
+    coding is ``None`` when it was sent as is. The encoded body and each
+    compressed variant are memoized together under one cache entry.
+    """
+    engine = _engine()
+    fmt = "json" if encoding is None else f"columnar-{encoding}"
+    key = (fmt, engine, canonical_key(q), view)
+    variants = quote_cache.get(key)
+    if variants is None:
+        payload = _quote_payload(q, engine, view, encoding)
+        # Cent columns are integers 100x the dollar amounts.
+        magnitude = payload["total_cost"] * (1 if encoding in (None, "float") else 100)
+        with span("serialize"):
+            variants = {None: dumps(payload, max_magnitude=magnitude)}
+        quote_cache.set(key, variants)
+    body = variants[None]
+    if coding is None or len(body) < _compress_min_bytes():
+        return body, None
+    compressed = variants.get(coding)
+    if compressed is None:
+        with span("compress"):
+            compressed = variants[coding] = compress(body, coding)
+    return compressed, coding
+
+
+def quote_json(q: QuoteReq, view: ScheduleView = FULL_SCHEDULE) -> bytes:
+    """Return the JSON body ``/api/quote`` would send for ``q``, memoized.
+
+    Byte-for-byte the same as serializing :func:`quote` through the response
+    model, but the cents engine's payload goes straight to the encoder
+    without building or re-validating pydantic models.
+    """
+    return quote_body(q, view)[0]
+
+
+# QUOTE_SERIALIZER=fast (default) answers /api/quote with pre-encoded bytes;
+# "pydantic" returns QuoteResp through FastAPI's response_model path.
+def _fast_serializer() -> bool:
+    return os.getenv("QUOTE_SERIALIZER", "fast") == "fast"
+
+
+def _quote_view(
+    schedule: str,
+    offset: int,
+    limit: Optional[int],
+    months: Optional[list[int]],
+    summary: Optional[str],
+) -> ScheduleView:
+    return ScheduleView(
+        rows=schedule != "none",
+        offset=offset,
+        limit=limit,
+        months=tuple(months) if months else None,
+        yearly=summary == "yearly",
+    )
+
+
+def _encoded_quote(
+    q: QuoteReq,
+    view: ScheduleView,
+    columnar: bool,
+    encoding: str,
+    accept_encoding: Optional[str],
+) -> tuple[bytes, str, dict[str, str]]:
+    """The ``/api/quote`` body for ``q``, its media type and its headers."""
+    body, coding = quote_body(
+        q,
+        view,
+        encoding=encoding if columnar else None,
+        coding=negotiate_coding(accept_encoding),
+    )
+    headers = {"Vary": "Accept, Accept-Encoding"}
+    if coding is not None:
+        headers["Content-Encoding"] = coding
+    media_type = COLUMNAR_MEDIA_TYPE if columnar else "application/json"
+    return body, media_type, headers
+
+
+@app.post("/api/quote", response_model=QuoteResp, response_model_exclude_none=True)
+def quote_endpoint(
+    q: QuoteReq,
+    schedule: Literal["full", "none"] = "full",
+    offset: Annotated[int, Query(ge=0)] = 0,
+    limit: Annotated[Optional[int], Query(ge=1)] = None,
+    months: Annotated[Optional[list[int]], Query()] = None,
+    summary: Optional[Literal["yearly"]] = None,
+    wire_format: Annotated[Optional[Literal["columnar"]], Query(alias="format")] = None,
+    encoding: Literal["float", "cents", "delta"] = "float",
+    accept: Annotated[Optional[str], Header()] = None,
+    accept_encoding: Annotated[Optional[str], Header()] = None,
+):
+    """Quote a loan.
+
+    Query options project the schedule without changing the totals:
+    ``schedule=none`` omits the rows, ``offset``/``limit`` or repeated
+    ``months`` select a window, and ``summary=yearly`` adds per-year sums.
+    ``format=columnar`` (or ``Accept: application/vnd.dealer-quote.columnar+json``)
+    returns the schedule as parallel arrays in the given column ``encoding``.
+    """
+    QUOTE_TERMS.observe(q.term_months, "quote")
+    view = _quote_view(schedule, offset, limit, months, summary)
+    columnar = wire_format == "columnar" or accepts(accept, COLUMNAR_MEDIA_TYPE)
+    if not columnar and not _fast_serializer():
+        return quote(q, view)
+    body, media_type, headers = _encoded_quote(
+        q, view, columnar, encoding, accept_encoding
+    )
+    return Response(body, media_type=media_type, headers=headers)
+
+
+# Query parameters of GET /api/quote left out of its canonical URL when they
+# have these values.
+QUOTE_QUERY_DEFAULTS = {
+    "down_payment": "0",
+    "tax_rate": "0",
+    "fees": "0",
+    "trade_in_value": "0",
+    "schedule": "full",
+    "offset": "0",
+    "encoding": "float",
+}
+
+
+def _canonical_number(value: float) -> str:
+    """``value`` as the shortest plain decimal: 2e4 and 20000.0 are "20000"."""
+    text = format(Decimal(str(value)).normalize(), "f")
+    return "0" if text == "-0" else text
+
+
+def canonical_quote_query(
+    q: QuoteReq,
+    schedule: str = "full",
+    offset: int = 0,
+    limit: Optional[int] = None,
+    months: Optional[list[int]] = None,
+    summary: Optional[str] = None,
+    wire_format: Optional[str] = None,
+    encoding: str = "float",
+) -> str:
+    """The canonical query string of a ``GET /api/quote``.
+
+    Parameters are sorted by name, numbers written in their shortest plain
+    form, ``months`` sorted without duplicates, and parameters at their
+    defaults (or without effect, as ``encoding`` without ``format``) left
+    out, so every way of asking for one quote maps to one URL.
+    """
+    amounts = ("vehicle_price", "down_payment", "apr", "tax_rate", "fees")
+    params = [
+        (name, _canonical_number(getattr(q, name)))
+        for name in (*amounts, "trade_in_value")
+    ]
+    params += [
+        ("term_months", str(q.term_months)),
+        ("schedule", schedule),
+        ("offset", str(offset)),
+    ]
+    if limit is not None:
+        params.append(("limit", str(limit)))
+    if summary is not None:
+        params.append(("summary", summary))
+    if wire_format is not None:
+        params += [("format", wire_format), ("encoding", encoding)]
+    params = [p for p in params if QUOTE_QUERY_DEFAULTS.get(p[0]) != p[1]]
+    params += [("months", str(m)) for m in sorted(set(months or ()))]
+    # A stable sort by name keeps the months in numeric order.
+    return urlencode(sorted(params, key=lambda p: p[0]))
+
+
+def quote_max_age() -> int:
+    return int(os.getenv("QUOTE_MAX_AGE", "3600"))
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if if_none_match is None:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # If-None-Match compares weakly: W/"x" matches "x".
+    tags = (t.strip().removeprefix("W/") for t in if_none_match.split(","))
+    return etag in tags
+
+
+@app.get("/api/quote", response_model=QuoteResp, response_model_exclude_none=True)
+def quote_get(
+    request: Request,
+    vehicle_price: Annotated[float, Query(gt=0)],
+    apr: Annotated[float, Query(ge=0)],
+    term_months: Annotated[int, Query(gt=0, le=QUOTE_MAX_TERM)],
+    down_payment: float = 0,
+    tax_rate: float = 0.0,
+    fees: float = 0.0,
+    trade_in_value: float = 0.0,
+    schedule: Literal["full", "none"] = "full",
+    offset: Annotated[int, Query(ge=0)] = 0,
+    limit: Annotated[Optional[int], Query(ge=1)] = None,
+    months: Annotated[Optional[list[int]], Query()] = None,
+    summary: Optional[Literal["yearly"]] = None,
+    wire_format: Annotated[Optional[Literal["columnar"]], Query(alias="format")] = None,
+    encoding: Literal["float", "cents", "delta"] = "float",
+    accept: Annotated[Optional[str], Header()] = None,
+    accept_encoding: Annotated[Optional[str], Header()] = None,
+    if_none_match: Annotated[Optional[str], Header()] = None,
+):
+    """Quote a loan given as query parameters; cacheable.
+
+    Takes the ``POST`` body's fields and query options as query parameters.
+    A request whose query string is not in canonical form (see
+    :func:`canonical_quote_query`) is redirected to it, so caches keyed by
+    URL hold one entry per quote. Responses carry a strong ``ETag`` and
+    ``Cache-Control: public, max-age=QUOTE_MAX_AGE``; a matching
+    ``If-None-Match`` gets ``304``.
+    """
+    q = QuoteReq(
+        vehicle_price=vehicle_price,
+        down_payment=down_payment,
+        apr=apr,
+        term_months=term_months,
+        tax_rate=tax_rate,
+        fees=fees,
+        trade_in_value=trade_in_value,
+    )
+    canonical = canonical_quote_query(
+        q, schedule, offset, limit, months, summary, wire_format, encoding
+    )
+    cache_control = f"public, max-age={quote_max_age()}"
+    if request.url.query != canonical:
+        return RedirectResponse(
+            f"{request.url.path}?{canonical}",
+            status_code=301,
+            headers={"Cache-Control": cache_control},
+        )
+    QUOTE_TERMS.observe(q.term_months, "quote")
+    view = _quote_view(schedule, offset, limit, months, summary)
+    columnar = wire_format == "columnar" or accepts(accept, COLUMNAR_MEDIA_TYPE)
+    body, media_type, headers = _encoded_quote(
+        q, view, columnar, encoding, accept_encoding
+    )
+    # Strong: a digest of the exact bytes, so each content coding has its own.
+    etag = f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+    headers.update({"ETag": etag, "Cache-Control": cache_control})
+    if _etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(body, media_type=media_type, headers=headers)
+
+
+# Rows per chunk written by /api/quote/stream.
+STREAM_CHUNK_ROWS = 256
+
+
+def stream_schedule_ndjson(
+    q: QuoteReq, chunk_rows: int = STREAM_CHUNK_ROWS
+) -> Iterator[bytes]:
+    """Yield ``q``'s schedule as NDJSON, ``chunk_rows`` lines per chunk.
+
+    Each line is a schedule row exactly as ``/api/quote`` renders it; the
+    last line is ``{"summary": {...}}`` with the totals, accumulated while
+    streaming. Rows come from :func:`iter_amortization` one at a time, so
+    memory does not grow with the term.
+    """
+    amount_financed, r, monthly_payment = _loan_terms(q)
+    loan = Loan(to_cents(amount_financed), r, to_cents(monthly_payment), q.term_months)
+    total_principal = total_interest = 0
+    lines = []
+    for month, payment, principal, interest, balance in iter_amortization(loan):
+        total_principal += principal
+        total_interest += interest
+        # Floats render via repr(), exactly as the JSON encoders do.
+        lines.append(
+            f'{{"month":{month},"payment":{payment / 100!r},'
+            f'"principal":{principal / 100!r},"interest":{interest / 100!r},'
+            f'"balance":{balance / 100!r}}}\n'
+        )
+        if len(lines) >= chunk_rows:
+            yield "".join(lines).encode()
+            lines.clear()
+    summary = _totals(amount_financed, monthly_payment, total_principal, total_interest)
+    summary["schedule_months"] = q.term_months
+    body = dumps({"summary": summary}, max_magnitude=summary["total_cost"])
+    lines.append(body.decode() + "\n")
+    yield "".join(lines).encode()
+
+
+@app.post("/api/quote/stream", response_class=StreamingResponse)
+def quote_stream(q: QuoteReq):
+    """Stream the full schedule as NDJSON with a trailing summary record.
+
+    Meant for very long terms and bulk exports: rows are computed by the
+    integer-cents engine as they are sent and never held in memory together.
+    """
+    QUOTE_TERMS.observe(q.term_months, "stream")
+    return StreamingResponse(
+        stream_schedule_ndjson(q), media_type="application/x-ndjson"
+    )
+
+
+# Longest term /api/quote/solve will propose (at most QUOTE_MAX_TERM, so the
+# solved inputs remain a valid quote).
+QUOTE_SOLVE_MAX_TERM = min(
+    int(os.getenv("QUOTE_SOLVE_MAX_TERM", str(QUOTE_MAX_TERM))), QUOTE_MAX_TERM
+)
+# Upper bound on solved vehicle prices, in cents.
+_SOLVE_MAX_PRICE_CENTS = 10**14
+
+
+class SolveReq(BaseModel):
+    """A quote request with a target payment in place of one of its inputs."""
+
+    target_payment: float = Field(..., gt=0)
+    solve_for: Literal["vehicle_price", "down_payment", "term_months"]
+    vehicle_price: Optional[float] = Field(default=None, gt=0)
+    down_payment: float = 0
+    apr: float = Field(..., ge=0)
+    term_months: Optional[int] = Field(default=None, gt=0, le=QUOTE_MAX_TERM)
+    tax_rate: float = 0.0
+    fees: float = 0.0
+    trade_in_value: float = 0.0
+
+    @model_validator(mode="after")
+    def _known_inputs(self) -> "SolveReq":
+        for name in ("vehicle_price", "term_months"):
+            if name != self.solve_for and getattr(self, name) is None:
+                raise ValueError(f"{name} is required unless solving for it")
+        return self
+
+
+class SolveResp(BaseModel):
+    solve_for: str
+    value: Union[int, float]
+    # The complete inputs; posting them to /api/quote reproduces ``quote``.
+    inputs: QuoteReq
+    quote: QuoteResp
+    # Whether the quoted payment equals the target to the cent.
+    exact: bool
+
+
+def _solve(req: SolveReq, target: int) -> QuoteReq:
+    """Complete ``req`` with the solved input (see ``api.solver``)."""
+    known = req.model_dump(exclude={"target_payment", "solve_for"})
+    field = req.solve_for
+    if field == "vehicle_price":
+        known["vehicle_price"] = 0.01
+    elif field == "term_months":
+        known["term_months"] = 1
+    base = QuoteReq(**known)
+
+    def payment(value: int) -> int:
+        update = {field: value if field == "term_months" else value / 100}
+        return to_cents(_loan_terms(base.model_copy(update=update))[2])
+
+    rate = req.apr / 1200
+    if field == "term_months":
+        amount = float(_loan_terms(base)[0])
+        term = annuity_term(amount, target / 100, rate)
+        guess = QUOTE_SOLVE_MAX_TERM if math.isinf(term) else math.ceil(term)
+        value = min_within(payment, target, guess, 1, QUOTE_SOLVE_MAX_TERM)
+        return base.model_copy(update={field: value})
+    affordable = annuity_principal(target / 100, rate, base.term_months)
+    if field == "vehicle_price":
+        taxed = 1 + req.tax_rate
+        price = req.trade_in_value
+        if taxed > 0:
+            price += (affordable - req.fees + req.down_payment) / taxed
+        guess = round(min(max(price, 0), _SOLVE_MAX_PRICE_CENTS / 100) * 100)
+        value = max_within(payment, target, guess, 1, _SOLVE_MAX_PRICE_CENTS)
+    else:
+        # Financing nothing at all is the largest down payment worth making.
+        most = to_cents(_loan_terms(base.model_copy(update={field: 0}))[0])
+        guess = round((most / 100 - affordable) * 100)
+        value = min_within(payment, target, guess, 0, most)
+    return base.model_copy(update={field: value / 100})
+
+
+@app.post(
+    "/api/quote/solve", response_model=SolveResp, response_model_exclude_none=True
+)
+def quote_solve(req: SolveReq):
+    """Solve for the vehicle price, down payment or term meeting a payment.
+
+    Payments are rounded to the cent, so the answer is the largest price, or
+    the smallest down payment or term, whose quoted monthly payment does not
+    exceed ``target_payment``; ``exact`` tells whether it hits it to the cent.
+    The returned ``inputs`` round-trip through ``/api/quote``.
+    """
+    target = math.floor(_to_decimal(req.target_payment).scaleb(2))
+    try:
+        with span("solve"):
+            inputs = _solve(req, target)
+    except NoSolution:
+        raise HTTPException(
+            status_code=422,
+            detail=f"no {req.solve_for} gives a monthly payment of at most "
+            f"{req.target_payment}",
+        ) from None
+    QUOTE_TERMS.observe(inputs.term_months, "solve")
+    resp = quote(inputs, ScheduleView(rows=False))
+    return SolveResp(
+        solve_for=req.solve_for,
+        value=getattr(inputs, req.solve_for),
+        inputs=inputs,
+        quote=resp,
+        exact=to_cents(_to_decimal(resp.monthly_payment)) == target,
+    )
+
+
+# Calculator presets from web/dist/app.js: (APR, term in months).
+PRESETS = {"auto": (10, 60), "rv": (8, 180), "moto": (12, 60), "ski": (9, 36)}
+# How web/dist/app.js asks for a schedule: columnar, delta-encoded, and for
+# terms of SCHEDULE_PAGED_MIN_MONTHS or more a first page of
+# SCHEDULE_PAGE_SIZE rows with yearly sums, then the rest on demand.
+UI_ENCODING = "delta"
+SCHEDULE_PAGE_SIZE = 12
+SCHEDULE_PAGED_MIN_MONTHS = 2 * SCHEDULE_PAGE_SIZE
+
+
+def ui_views(term_months: int) -> list[ScheduleView]:
+    """The schedule views the web UI requests for a loan of ``term_months``."""
+    if term_months < SCHEDULE_PAGED_MIN_MONTHS:
+        return [FULL_SCHEDULE]
+    return [
+        ScheduleView(limit=SCHEDULE_PAGE_SIZE, yearly=True),
+        ScheduleView(offset=SCHEDULE_PAGE_SIZE),
+    ]
+
+
+def prewarm_quote_cache() -> int:
+    """Seed the quote cache with the landing-page preset scenarios.
+
+    Each preset is priced at every ``QUOTE_CACHE_PREWARM_PRICES`` amount in
+    the views and wire format the web UI requests (:func:`ui_views`), under
+    the keys ``GET /api/quote`` uses, with every content coding it may
+    negotiate. Returns the number of quotes computed.
+    """
+    prices = os.getenv("QUOTE_CACHE_PREWARM_PRICES", "10000,20000,30000,50000")
+    count = 0
+    for apr, term in PRESETS.values():
+        for price in (float(p) for p in prices.split(",") if p.strip()):
+            q = QuoteReq(vehicle_price=price, apr=apr, term_months=term)
+            for view in ui_views(term):
+                for coding in CODINGS:
+                    quote_body(q, view, encoding=UI_ENCODING, coding=coding)
+                count += 1
+    return count
+
+
+# Sample loans for warmup: the presets' terms and a spread of longer ones.
+WARMUP_TERMS = (12, 36, 60, 84, 120, 180, 240, 360)
+
+
+@WARMUP.step("quotes")
+def warm_quotes() -> int:
+    """Price ``WARMUP_QUOTES`` sample loans (default 16) the ways a request
+    can: both engines, every wire format and content coding, and the
+    vectorized kernels behind batches and matrices. Bypasses the quote cache.
+    Returns the number of loans priced.
+    """
+    count = int(os.getenv("WARMUP_QUOTES", "16"))
+    samples = [
+        QuoteReq(
+            vehicle_price=10_000 + 2_500 * n,
+            down_payment=500 * (n % 4),
+            apr=(0.0, 3.9, 6.9, 12.5)[n % 4],
+            term_months=WARMUP_TERMS[n % len(WARMUP_TERMS)],
+        )
+        for n in range(count)
+    ]
+    codings = [c for c in ("gzip", negotiate_coding("br")) if c is not None]
+    for q in samples:
+        for engine in QUOTE_ENGINES:
+            QUOTE_ENGINES[engine](q, FULL_SCHEDULE)
+        for encoding in (None, "float", "cents", "delta"):
+            payload = _quote_payload(q, "cents", FULL_SCHEDULE, encoding)
+            body = dumps(payload, max_magnitude=payload["total_cost"] * 100)
+            for coding in codings:
+                compress(body, coding)
+    terms = [_loan_terms(q) for q in samples]
+    loans = [
+        Loan(to_cents(amount), r, to_cents(payment), q.term_months)
+        for q, (amount, r, payment) in zip(samples, terms)
+    ]
+    amortize_batch(loans)
+    amortize_totals(loans)
+    return len(samples)
+
+
+@WARMUP.step("persistence")
+def warm_persistence() -> None:
+    """Open the lead and track stores: fold in legacy files still waiting to
+    be migrated and read the first record, so no request pays for either."""
+    for kind in ("leads", "tracks"):
+        store = get_store(kind)
+        migrate = getattr(store, "migrate", None)
+        if migrate is not None:
+            migrate()
+        for _ in store.scan():
+            break  # one record opens the files (or the database)
+
+
+@WARMUP.step("cache")
+def warm_cache() -> None:
+    """Prime the quote cache (with ``QUOTE_CACHE_PREWARM=1``)."""
+    if os.getenv("QUOTE_CACHE_PREWARM", "0") == "1":
+        prewarm_quote_cache()
+
+
+@WARMUP.step("openapi")
+def warm_openapi() -> None:
+    """Build the OpenAPI schema that ``/docs`` and ``/openapi.json`` serve,
+    which FastAPI otherwise generates on the first request for it."""
+    app.openapi()
+
+
+@app.get("/api/quote/cache")
+def quote_cache_stats():
+    return quote_cache.stats()
+
+
+class QuoteBatchReq(BaseModel):
+    quotes: list[QuoteReq] = Field(..., max_length=QUOTE_BATCH_MAX)
+
+    @model_validator(mode="after")
+    def _bounded_months(self) -> "QuoteBatchReq":
+        if sum(q.term_months for q in self.quotes) > QUOTE_BATCH_MAX_MONTHS:
+            raise ValueError(
+                f"terms must add up to at most {QUOTE_BATCH_MAX_MONTHS} months"
+            )
+        return self
+
+
+class QuoteBatchResp(BaseModel):
+    quotes: list[QuoteResp]
+
+
+@app.post(
+    "/api/quotes/batch", response_model=QuoteBatchResp, response_model_exclude_none=True
+)
+def quote_batch(batch: QuoteBatchReq):
+    """Price many loans in one call; results are in request order.
+
+    Schedules come from the vectorized engine in ``api.amortization`` and are
+    identical to what ``quote()`` returns for each request.
+    """
+    for q in batch.quotes:
+        QUOTE_TERMS.observe(q.term_months, "batch")
+    terms = [_loan_terms(q) for q in batch.quotes]
+    loans = [
+        Loan(to_cents(amount), r, to_cents(payment), q.term_months)
+        for q, (amount, r, payment) in zip(batch.quotes, terms)
+    ]
+    with span("amortize"):
+        schedules = amortize_batch(loans)
+    return QuoteBatchResp(
+        quotes=[
+            _quote_from_schedule(amount, payment, sched)
+            for (amount, _, payment), sched in zip(terms, schedules)
+        ]
+    )
+
+
+# Grid limits for /api/quote/matrix.
+QUOTE_MATRIX_MAX_APRS = int(os.getenv("QUOTE_MATRIX_MAX_APRS", "24"))
+QUOTE_MATRIX_MAX_TERMS = int(os.getenv("QUOTE_MATRIX_MAX_TERMS", "24"))
+
+
+class QuoteMatrixReq(BaseModel):
+    """One loan priced at every combination of ``aprs`` and ``terms``."""
+
+    vehicle_price: float = Field(..., gt=0)
+    down_payment: float = 0
+    aprs: list[Annotated[float, Field(ge=0)]] = Field(
+        ..., min_length=1, max_length=QUOTE_MATRIX_MAX_APRS
+    )
+    terms: list[Annotated[int, Field(gt=0, le=QUOTE_MAX_TERM)]] = Field(
+        ..., min_length=1, max_length=QUOTE_MATRIX_MAX_TERMS
+    )
+    tax_rate: float = 0.0
+    fees: float = 0.0
+    trade_in_value: float = 0.0
+
+
+class QuoteMatrixResp(BaseModel):
+    amount_financed: float
+    aprs: list[float]
+    terms: list[int]
+    # Indexed [apr][term], in request order.
+    monthly_payment: list[list[float]]
+    total_interest: list[list[float]]
+    total_cost: list[list[float]]
+
+
+@app.post("/api/quote/matrix", response_model=QuoteMatrixResp)
+def quote_matrix(req: QuoteMatrixReq):
+    """Payment and totals for every APR × term combination of one loan.
+
+    Cells equal the corresponding ``quote()`` figures; all cells are
+    amortized together by the vectorized engine, keeping only totals.
+    """
+    base = QuoteReq(
+        **req.model_dump(exclude={"aprs", "terms"}),
+        apr=req.aprs[0],
+        term_months=req.terms[0],
+    )
+    for term in req.terms:
+        QUOTE_TERMS.observe(term, "matrix")
+    cells = [
+        _loan_terms(base.model_copy(update={"apr": apr, "term_months": term}))
+        for apr in req.aprs
+        for term in req.terms
+    ]
+    loans = [
+        Loan(to_cents(amount), r, to_cents(payment), term)
+        for (amount, r, payment), term in zip(cells, req.terms * len(req.aprs))
+    ]
+    with span("amortize"):
+        totals = amortize_totals(loans)
+    figures = [
+        _totals(amount, payment, *cell_totals)
+        for (amount, _, payment), cell_totals in zip(cells, totals)
+    ]
+    width = len(req.terms)
+    rows = [figures[i : i + width] for i in range(0, len(figures), width)]
+    return QuoteMatrixResp(
+        amount_financed=figures[0]["amount_financed"],
+        aprs=req.aprs,
+        terms=req.terms,
+        monthly_payment=[[c["monthly_payment"] for c in row] for row in rows],
+        total_interest=[[c["total_interest"] for c in row] for row in rows],
+        total_cost=[[c["total_cost"] for c in row] for row in rows],
+    )
+
+
+# Upper bound on lump sums per /api/quote/prepay request.
+PREPAY_MAX_LUMP_SUMS = 120
+
+
+class LumpSum(BaseModel):
+    month: int = Field(..., gt=0)
+    amount: float = Field(..., gt=0)
+
+
+class PrepayReq(QuoteReq):
+    """A loan plus extra principal payments on top of its schedule."""
+
+    # Paid every month from ``extra_start_month`` on.
+    extra_monthly: float = Field(default=0, ge=0)
+    extra_start_month: int = Field(default=1, gt=0)
+    lump_sums: list[LumpSum] = Field(
+        default_factory=list, max_length=PREPAY_MAX_LUMP_SUMS
+    )
+    # One extra payment a year, spread as a twelfth of the payment added to
+    # every month: the "13th payment" a biweekly plan (half the payment every
+    # two weeks) adds up to, but not a biweekly schedule, since payments and
+    # interest stay monthly. ``biweekly`` is accepted as its former name.
+    thirteenth_payment: bool = Field(
+        default=False,
+        validation_alias=AliasChoices("thirteenth_payment", "biweekly"),
+    )
+
+
+class PrepayResp(BaseModel):
+    baseline: QuoteResp
+    scenario: QuoteResp
+    months_saved: int
+    interest_saved: float
+    # Added to every month's payment for ``thirteenth_payment``.
+    thirteenth_payment_spread_monthly: Optional[float] = None
+
+
+class Baseline(NamedTuple):
+    """A loan's regular schedule, kept to derive prepayment scenarios."""
+
+    amount_financed: Decimal
+    monthly_payment: Decimal
+    loan: Loan
+    schedule: Schedule
+    # interest_before[m]: interest paid in the first m months, in cents.
+    interest_before: list[int]
+
+
+def baseline(q: QuoteReq) -> Baseline:
+    """The regular schedule of ``q``, memoized in ``quote_cache``."""
+    if type(q) is not QuoteReq:
+        # Only the loan fields of subclasses such as PrepayReq matter.
+        q = QuoteReq.model_validate(q.model_dump(include=set(QuoteReq.model_fields)))
+    key = ("baseline", canonical_key(q))
+    base = quote_cache.get(key)
+    if base is None:
+        amount_financed, r, monthly_payment = _loan_terms(q)
+        loan = Loan(
+            to_cents(amount_financed), r, to_cents(monthly_payment), q.term_months
+        )
+        with span("amortize"):
+            sched = amortize_cents(loan)
+        interest_before = [0, *accumulate(sched.interest)]
+        base = Baseline(amount_financed, monthly_payment, loan, sched, interest_before)
+        quote_cache.set(key, base)
+    return base
+
+
+def _paid_months(sched: Schedule) -> int:
+    """Months until the balance first reaches zero."""
+    for i, balance in enumerate(sched.balance):
+        if balance == 0:
+            return i + 1
+    return len(sched.balance)
+
+
+def thirteenth_payment_cents(base: Baseline, req: PrepayReq) -> int:
+    """The twelfth of the payment added monthly for ``thirteenth_payment``."""
+    return (base.loan.payment_cents + 6) // 12 if req.thirteenth_payment else 0
+
+
+def prepay_schedule(base: Baseline, req: PrepayReq) -> Schedule:
+    """The schedule of ``base`` with the extra payments of ``req``.
+
+    Months before the first extra payment are copied from the baseline, so
+    only the rest of the loan is walked again.
+    """
+    recurring = to_cents(_to_cents(_to_decimal(req.extra_monthly)))
+    lumps: dict[int, int] = {}
+    for lump in req.lump_sums:
+        cents = to_cents(_to_cents(_to_decimal(lump.amount)))
+        lumps[lump.month] = lumps.get(lump.month, 0) + cents
+    every_month = thirteenth_payment_cents(base, req)
+    starts = [*lumps]
+    if recurring:
+        starts.append(req.extra_start_month)
+    if every_month:
+        starts.append(1)
+    start = min(starts, default=base.loan.term + 1)
+    sched = base.schedule
+    if start > _paid_months(sched):
+        return sched
+
+    def extra(month: int) -> int:
+        paid = every_month + lumps.get(month, 0)
+        return paid + recurring if month >= req.extra_start_month else paid
+
+    keep = start - 1
+    opening = sched.balance[keep - 1] if keep else base.loan.amount_cents
+    with span("amortize"):
+        rows = list(iter_prepayment(base.loan, extra, start, opening))
+    _, payments, principals, interests, balances = (
+        map(list, zip(*rows)) if rows else ([], [], [], [], [])
+    )
+    return Schedule(
+        payment=sched.payment[:keep] + payments,
+        principal=sched.principal[:keep] + principals,
+        interest=sched.interest[:keep] + interests,
+        balance=sched.balance[:keep] + balances,
+        total_principal=base.loan.amount_cents,
+        total_interest=base.interest_before[keep] + sum(interests),
+    )
+
+
+@app.post(
+    "/api/quote/prepay", response_model=PrepayResp, response_model_exclude_none=True
+)
+def quote_prepay(
+    req: PrepayReq,
+    schedule: Literal["full", "none"] = "full",
+    offset: Annotated[int, Query(ge=0)] = 0,
+    limit: Annotated[Optional[int], Query(ge=1)] = None,
+    summary: Optional[Literal["yearly"]] = None,
+):
+    """Quote a loan with extra principal payments against its baseline.
+
+    ``scenario`` is the prepaid loan, with its schedule projected like
+    ``/api/quote``'s, and ``baseline`` the regular quote without rows. The
+    baseline schedule is cached, so changing only the extra payments
+    recomputes just the months from the first extra payment on.
+
+    ``thirteenth_payment`` approximates a biweekly plan by its yearly total
+    only: the extra payment is spread over the months (and reported as
+    ``thirteenth_payment_spread_monthly``), so its payoff date and interest
+    saved are not those of payments made every two weeks.
+    """
+    QUOTE_TERMS.observe(req.term_months, "prepay")
+    base = baseline(req)
+    sched = prepay_schedule(base, req)
+    view = ScheduleView(
+        rows=schedule != "none", offset=offset, limit=limit, yearly=summary == "yearly"
+    )
+    without_rows = ScheduleView(rows=False)
+    months_saved = _paid_months(base.schedule) - _paid_months(sched)
+    return PrepayResp(
+        baseline=_quote_from_schedule(
+            base.amount_financed, base.monthly_payment, base.schedule, without_rows
+        ),
+        scenario=_quote_from_schedule(
+            base.amount_financed, base.monthly_payment, sched, view
+        ),
+        months_saved=months_saved,
+        interest_saved=(base.schedule.total_interest - sched.total_interest) / 100,
+        thirteenth_payment_spread_monthly=(
+            thirteenth_payment_cents(base, req) / 100
+            if req.thirteenth_payment
+            else None
+        ),
+    )
 
 
 class LeadReq(BaseModel):
@@ -170,26 +1396,72 @@ class LeadReq(BaseModel):
     vehicle_type: Optional[str] = None
     price: Optional[float] = None
     affiliate: Optional[str] = None
+    # Campaign the visitor arrived from, for conversion rollups.
+    utm_source: Optional[str] = None
+    utm_medium: Optional[str] = None
+    utm_campaign: Optional[str] = None
 
 
 class LeadResp(BaseModel):
     message: str
 
 
+# Clients retrying a write send the same key with every attempt.
+IdempotencyKey = Annotated[Optional[str], Header(min_length=1, max_length=255)]
+
+
+def _idempotent(
+    scope: str,
+    key: Optional[str],
+    request: BaseModel,
+    handler: Callable[[], BaseModel],
+):
+    """Run ``handler`` once per ``Idempotency-Key``; replay it otherwise."""
+    if key is None:
+        return handler()
+    store = IdempotencyStore.from_env(scope)
+    try:
+        body, replayed = store.run(
+            key, request.model_dump(mode="json"), lambda: handler().model_dump()
+        )
+    except KeyReused:
+        raise HTTPException(
+            status_code=422,
+            detail="Idempotency-Key was already used for a different request",
+        ) from None
+    if replayed:
+        return JSONResponse(body, headers={"Idempotent-Replayed": "true"})
+    return body
+
+
+async def _persist(fn: Callable, *args):
+    """Run blocking storage work on the persistence I/O pool."""
+    try:
+        return await PERSIST.run(fn, *args)
+    except PoolBusy:
+        raise HTTPException(
+            status_code=503,
+            detail="Storage is busy",
+            headers={"Retry-After": "1"},
+        ) from None
+
+
+def store_lead(lead: LeadReq, idempotency_key: Optional[str] = None):
+    """Store ``lead``; blocks on the data volume."""
+
+    def submit() -> LeadResp:
+        admission.admit_affiliate(lead.affiliate, "/api/leads")
+        lead_entry = lead.model_dump()
+        lead_entry["timestamp"] = datetime.utcnow().isoformat()
+        get_store("leads").append(lead_entry)
+        return LeadResp(message="Lead received")
+
+    return _idempotent("leads", idempotency_key, lead, submit)
+
+
 @app.post("/api/leads", response_model=LeadResp)
-def create_lead(lead: LeadReq):
-    leads_file = _data_file("leads.json")
-    lead_entry = lead.model_dump()
-    lead_entry["timestamp"] = datetime.utcnow().isoformat()
-    if os.path.exists(leads_file):
-        with open(leads_file) as f:
-            data = json.load(f)
-    else:
-        data = []
-    data.append(lead_entry)
-    with open(leads_file, "w") as f:
-        json.dump(data, f)
-    return LeadResp(message="Lead received")
+async def create_lead(lead: LeadReq, idempotency_key: IdempotencyKey = None):
+    return await _persist(store_lead, lead, idempotency_key)
 
 
 class TrackReq(BaseModel):
@@ -205,17 +1477,137 @@ class TrackResp(BaseModel):
     message: str
 
 
-@app.post("/api/track", response_model=TrackResp)
-def track_click(track: TrackReq):
-    track_file = _data_file("tracks.json")
+def _record_click(track: TrackReq) -> TrackResp:
+    admission.admit_affiliate(track.affiliate, "/api/track")
     entry = track.model_dump(exclude_none=True)
     entry["timestamp"] = datetime.utcnow().isoformat()
-    if os.path.exists(track_file):
-        with open(track_file) as f:
-            data = json.load(f)
-    else:
-        data = []
-    data.append(entry)
-    with open(track_file, "w") as f:
-        json.dump(data, f)
+    track_queue = getattr(app.state, "track_queue", None)
+    if track_queue is None:
+        get_store("tracks").append(entry)
+        return TrackResp(message="Tracked")
+    try:
+        track_queue.submit(entry)
+    except QueueFull:
+        raise HTTPException(
+            status_code=429,
+            detail="Tracking is temporarily overloaded",
+            headers={"Retry-After": "1"},
+        ) from None
     return TrackResp(message="Tracked")
+
+
+def store_click(track: TrackReq, idempotency_key: Optional[str] = None):
+    """Store or enqueue ``track``; blocks on the data volume."""
+    return _idempotent("tracks", idempotency_key, track, lambda: _record_click(track))
+
+
+@app.post("/api/track", response_model=TrackResp)
+async def track_click(track: TrackReq, idempotency_key: IdempotencyKey = None):
+    return await _persist(store_click, track, idempotency_key)
+
+
+class RollupBucket(BaseModel):
+    day: str
+    affiliate: Optional[str] = None
+    utm_source: Optional[str] = None
+    utm_medium: Optional[str] = None
+    utm_campaign: Optional[str] = None
+    clicks: int
+    leads: int
+
+
+class RollupResp(BaseModel):
+    buckets: list[RollupBucket]
+    clicks: int
+    leads: int
+
+
+def _require_export_token(authorization: Optional[str]) -> None:
+    """Reject requests without the export token (``EXPORT_TOKEN``)."""
+    if export.token() is None:
+        raise HTTPException(status_code=403, detail="Export is disabled")
+    if not export.authorized(authorization):
+        raise HTTPException(
+            status_code=401,
+            detail="Invalid export token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+
+@app.get("/api/rollups", response_model=RollupResp)
+async def affiliate_rollups(
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    affiliate: Optional[str] = None,
+    authorization: Annotated[Optional[str], Header()] = None,
+):
+    """Daily clicks and lead conversions per affiliate and UTM campaign.
+
+    ``start``/``end`` (inclusive, UTC days) bound the report; its cost is
+    proportional to the buckets in range, not to raw events. Like exports,
+    it needs the export token.
+    """
+    _require_export_token(authorization)
+    if start is not None and end is not None and start > end:
+        raise HTTPException(status_code=422, detail="start must not be after end")
+    found = await _persist(rollups.query, start, end, affiliate)
+    buckets = [RollupBucket(**b) for b in found]
+    return RollupResp(
+        buckets=buckets,
+        clicks=sum(b.clicks for b in buckets),
+        leads=sum(b.leads for b in buckets),
+    )
+
+
+@app.get("/api/export/{kind}", response_class=StreamingResponse)
+async def export_records(
+    kind: Literal["leads", "tracks"],
+    export_format: Annotated[
+        Literal["csv", "ndjson"], Query(alias="format")
+    ] = "ndjson",
+    affiliate: Optional[str] = None,
+    vehicle_type: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    offset: Annotated[int, Query(ge=0)] = 0,
+    authorization: Annotated[Optional[str], Header()] = None,
+):
+    """Stream leads or tracks as NDJSON or CSV; needs the export token.
+
+    ``start`` (inclusive) and ``end`` (exclusive) bound record timestamps.
+    The ``X-Export-Cursor`` response header names this export; a broken
+    download resumes with ``cursor`` and ``offset`` set to the number of
+    records already received, without repeating the filters.
+    """
+    _require_export_token(authorization)
+    if cursor is None:
+        if start is not None and end is not None and start > end:
+            raise HTTPException(status_code=422, detail="start must not be after end")
+        query = export.Query(
+            kind,
+            export.timestamp(start) if start else None,
+            export.timestamp(end) if end else None,
+            affiliate,
+            vehicle_type,
+        ).pinned()
+    else:
+        if any(v is not None for v in (start, end, affiliate, vehicle_type)):
+            raise HTTPException(
+                status_code=422, detail="A cursor already fixes the filters"
+            )
+        try:
+            query = export.decode_cursor(cursor)
+        except export.InvalidCursor as exc:
+            raise HTTPException(status_code=422, detail=str(exc)) from None
+        if query.kind != kind:
+            raise HTTPException(status_code=422, detail=f"Cursor is for {query.kind}")
+    headers = {
+        "X-Export-Cursor": export.encode_cursor(query),
+        "Content-Disposition": f'attachment; filename="{kind}.{export_format}"',
+    }
+    return StreamingResponse(
+        PERSIST.iterate(export.stream(query, export_format, offset)),
+        media_type=export.MEDIA_TYPES[export_format],
+        headers=headers,
+    )
@@ -0,0 +1,95 @@
+"""In-process memoization for pure request handlers such as ``quote()``.
+
+Keys are built from the request model with every float replaced by its
+``Decimal`` value, so ``20000``, ``20000.0`` and ``2e4`` share one entry.
+Entries expire after ``ttl`` seconds and the least recently used entry is
+evicted once ``maxsize`` is reached. The cache is per worker process.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Hashable
+from decimal import Decimal
+from typing import Any, Optional
+
+from pydantic import BaseModel
+
+
+def canonical_key(model: BaseModel) -> tuple:
+    """Return a hashable key for ``model`` with Decimal-canonical numbers."""
+    return tuple(
+        Decimal(str(value)) if isinstance(value, float) else value
+        for value in (getattr(model, name) for name in type(model).model_fields)
+    )
+
+
+class LRUCache:
+    def __init__(self, maxsize: int = 256, ttl: Optional[float] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, prefix: str, maxsize: int = 256, ttl: float = 3600):
+        """Build a cache sized by ``<prefix>_SIZE`` (0 disables it) with a
+        ``<prefix>_TTL`` in seconds (0 means entries never expire)."""
+        ttl = float(os.getenv(f"{prefix}_TTL", str(ttl)))
+        return cls(
+            maxsize=int(os.getenv(f"{prefix}_SIZE", str(maxsize))),
+            ttl=ttl or None,
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self.maxsize > 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        if not self.enabled:
+            return None
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self.misses += 1
+                return None
+            expires, value = item
+            if expires < time.monotonic():
+                del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        if not self.enabled:
+            return
+        expires = time.monotonic() + self.ttl if self.ttl else float("inf")
+        with self._lock:
+            self._data[key] = (expires, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
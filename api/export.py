@@ -0,0 +1,251 @@
+"""Streaming exports of leads and tracking events.
+
+An export selects one kind's records by affiliate, ``vehicle_type`` and a
+timestamp range (``start`` inclusive, ``end`` exclusive, UTC) and renders them
+as NDJSON (each record as stored) or CSV (the kind's known columns). Records
+are read from the store one at a time and sent in chunks of
+``EXPORT_CHUNK_ROWS`` lines, so memory stays flat however many are exported;
+with ``PERSIST_BACKEND=segments`` only the segments overlapping the range are
+read at all, and with ``PERSIST_BACKEND=sqlite`` the range and affiliate are
+looked up by index.
+
+Exports are resumable. An export without an ``end`` is pinned to the moment it
+began, so records written later fall outside it, and its :class:`Query`
+encodes to an opaque cursor. Resuming with that cursor and the number of
+records already received skips exactly those (unless retention dropped
+records inside the range meanwhile).
+
+Over HTTP, ``GET /api/export/{kind}`` with ``Authorization: Bearer
+<EXPORT_TOKEN>``; inside the API container::
+
+    python -m api.export leads --format csv --start 2025-01-01 > leads.csv
+"""
+
+import argparse
+import base64
+import binascii
+import csv
+import io
+import json
+import os
+import secrets
+import sys
+from collections.abc import Iterable, Iterator
+from datetime import datetime, timezone
+from itertools import islice
+from typing import NamedTuple, Optional
+
+from .metrics import REGISTRY
+from .storage import Record, get_store
+
+# CSV columns per kind, in order: the timestamp, then the request fields.
+COLUMNS = {
+    "leads": (
+        "timestamp",
+        "name",
+        "email",
+        "phone",
+        "vehicle_type",
+        "price",
+        "affiliate",
+        "utm_source",
+        "utm_medium",
+        "utm_campaign",
+    ),
+    "tracks": (
+        "timestamp",
+        "affiliate",
+        "utm_source",
+        "utm_medium",
+        "utm_campaign",
+        "utm_term",
+        "utm_content",
+    ),
+}
+MEDIA_TYPES = {"csv": "text/csv; charset=utf-8", "ndjson": "application/x-ndjson"}
+
+EXPORTED = REGISTRY.counter(
+    "export_records_total", "Records streamed by exports.", ("kind", "format")
+)
+
+
+class InvalidCursor(ValueError):
+    """Raised for a cursor that was not produced by :func:`encode_cursor`."""
+
+
+class Query(NamedTuple):
+    kind: str
+    start: Optional[str] = None
+    end: Optional[str] = None
+    affiliate: Optional[str] = None
+    vehicle_type: Optional[str] = None
+
+    def pinned(self, now: Optional[datetime] = None) -> "Query":
+        """This query with an open ``end`` fixed to ``now`` (default: now)."""
+        if self.end is not None:
+            return self
+        return self._replace(end=timestamp(now or datetime.utcnow()))
+
+
+def token() -> Optional[str]:
+    return os.getenv("EXPORT_TOKEN") or None
+
+
+def authorized(authorization: Optional[str]) -> bool:
+    """Whether an ``Authorization`` header carries the export token."""
+    expected = token()
+    if expected is None or authorization is None:
+        return False
+    return secrets.compare_digest(authorization.encode(), f"Bearer {expected}".encode())
+
+
+def chunk_rows() -> int:
+    return int(os.getenv("EXPORT_CHUNK_ROWS", "500"))
+
+
+def timestamp(value: datetime) -> str:
+    """``value`` as stored timestamps are written: naive UTC ISO 8601."""
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value.isoformat()
+
+
+def encode_cursor(query: Query) -> str:
+    payload = json.dumps(list(query), separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Query:
+    try:
+        fields = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        query = Query(*fields)
+    except (binascii.Error, UnicodeDecodeError, ValueError, TypeError):
+        raise InvalidCursor("Invalid export cursor") from None
+    if query.kind not in COLUMNS:
+        raise InvalidCursor("Invalid export cursor")
+    return query
+
+
+def records(query: Query, offset: int = 0) -> Iterator[Record]:
+    """Records selected by ``query`` in store order, skipping ``offset``."""
+    store = get_store(query.kind)
+    migrate = getattr(store, "migrate", None)
+    if migrate is not None:
+        migrate()  # legacy arrays must be in the store being scanned
+    selected = store.select(
+        query.start,
+        query.end,
+        affiliate=query.affiliate,
+        vehicle_type=query.vehicle_type,
+    )
+    return islice(selected, offset, None)
+
+
+def _csv_value(value) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, separators=(",", ":"))
+    return str(value)
+
+
+def chunks(
+    rows: Iterable[Record], kind: str, fmt: str, header: bool = True
+) -> Iterator[tuple[bytes, int]]:
+    """Render ``rows`` as ``(chunk, records in it)`` pairs.
+
+    A CSV export starts with a header line unless ``header`` is false (as
+    when resuming); the header chunk counts no records.
+    """
+    size = chunk_rows()
+    buffer = io.StringIO()
+    if fmt == "csv":
+        columns = COLUMNS[kind]
+        writer = csv.writer(buffer, lineterminator="\n")
+        if header:
+            writer.writerow(columns)
+    count = 0
+    for record in rows:
+        if fmt == "csv":
+            writer.writerow([_csv_value(record.get(name)) for name in columns])
+        else:
+            buffer.write(json.dumps(record, separators=(",", ":")))
+            buffer.write("\n")
+        count += 1
+        if count >= size:
+            EXPORTED.inc(kind, fmt, amount=count)
+            yield buffer.getvalue().encode(), count
+            buffer.seek(0)
+            buffer.truncate()
+            count = 0
+    if count or buffer.tell():
+        EXPORTED.inc(kind, fmt, amount=count)
+        yield buffer.getvalue().encode(), count
+
+
+def stream(query: Query, fmt: str, offset: int = 0) -> Iterator[bytes]:
+    """The export body for ``query`` resumed after ``offset`` records."""
+    for chunk, _ in chunks(records(query, offset), query.kind, fmt, offset == 0):
+        yield chunk
+
+
+def _datetime(value: str) -> str:
+    try:
+        return timestamp(datetime.fromisoformat(value))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"not an ISO 8601 time: {value!r}") from None
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(
+        prog="python -m api.export",
+        description="Stream leads or tracks to stdout.",
+    )
+    parser.add_argument("kind", choices=sorted(COLUMNS), nargs="?")
+    parser.add_argument("--format", choices=sorted(MEDIA_TYPES), default="ndjson")
+    parser.add_argument("--affiliate")
+    parser.add_argument("--vehicle-type")
+    parser.add_argument("--start", type=_datetime, help="inclusive, UTC")
+    parser.add_argument("--end", type=_datetime, help="exclusive, UTC")
+    parser.add_argument("--cursor", help="resume the export this cursor names")
+    parser.add_argument(
+        "--offset", type=int, default=0, help="records already received"
+    )
+    parser.add_argument("--dir", help="data directory (defaults to PERSIST_DIR)")
+    args = parser.parse_args(argv)
+    if args.dir:
+        os.environ["PERSIST_DIR"] = args.dir
+    if args.cursor:
+        try:
+            query = decode_cursor(args.cursor)
+        except InvalidCursor as exc:
+            parser.error(str(exc))
+        if args.kind not in (None, query.kind):
+            parser.error(f"the cursor is for {query.kind}")
+    elif args.kind:
+        query = Query(
+            args.kind, args.start, args.end, args.affiliate, args.vehicle_type
+        ).pinned()
+    else:
+        parser.error("a kind or --cursor is required")
+    cursor = encode_cursor(query)
+    print(f"cursor: {cursor}", file=sys.stderr)
+    written = args.offset
+    out = sys.stdout.buffer
+    try:
+        rows = records(query, args.offset)
+        for chunk, count in chunks(rows, query.kind, args.format, args.offset == 0):
+            out.write(chunk)
+            out.flush()
+            written += count
+    except (BrokenPipeError, KeyboardInterrupt):
+        print(
+            f"interrupted; resume with --cursor {cursor} --offset {written}",
+            file=sys.stderr,
+        )
+        raise SystemExit(1) from None
+    print(f"{query.kind}: exported {written - args.offset} record(s)", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""``Idempotency-Key`` support for write endpoints (``/api/leads``, ``/api/track``).
+
+A client that may retry a write sends the same ``Idempotency-Key`` header with
+every attempt. The first attempt runs the handler and its response is saved
+under the key; later attempts with the key get that response back without
+writing again. Reusing a key for a different request is an error.
+
+Responses live under ``PERSIST_DIR/idempotency/<scope>/``, one small JSON file
+per key named by the key's SHA-256, so they survive restarts and are shared
+by every worker and both colors. A request holds one of a fixed set of
+``flock`` stripes for its key while it runs, so a duplicate arriving
+meanwhile, in any process, waits for the first attempt and then replays it.
+Entries expire ``IDEMPOTENCY_TTL_SECONDS`` (default one day) after they were
+written, and every minute or so a writer sweeps the expired ones and the
+oldest beyond ``IDEMPOTENCY_MAX_KEYS`` per scope (default 10000).
+"""
+
+import hashlib
+import json
+import os
+import time
+from collections.abc import Callable
+from typing import Any, Optional
+
+from .metrics import REGISTRY
+from .storage import data_file, durability, file_lock
+
+# Lock files keys are spread over; duplicates of one key always share one.
+STRIPES = 64
+SWEEP_INTERVAL = 60.0
+
+IDEMPOTENCY_REQUESTS = REGISTRY.counter(
+    "idempotency_requests_total",
+    "Requests carrying an Idempotency-Key, by outcome.",
+    ("scope", "outcome"),
+)
+
+
+class KeyReused(Exception):
+    """Raised when a key comes back with a different request."""
+
+
+def _fingerprint(request: Any) -> str:
+    body = json.dumps(request, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(body.encode()).hexdigest()
+
+
+class IdempotencyStore:
+    def __init__(self, directory: str, ttl: float = 86400, max_keys: int = 10000):
+        self.directory = directory
+        self.ttl = ttl
+        self.max_keys = max_keys
+        os.makedirs(directory, exist_ok=True)
+
+    @classmethod
+    def from_env(cls, scope: str) -> "IdempotencyStore":
+        """The store for ``scope`` under ``PERSIST_DIR``, limited by
+        ``IDEMPOTENCY_TTL_SECONDS`` and ``IDEMPOTENCY_MAX_KEYS``."""
+        return cls(
+            os.path.join(data_file("idempotency"), scope),
+            ttl=float(os.getenv("IDEMPOTENCY_TTL_SECONDS", "86400")),
+            max_keys=int(os.getenv("IDEMPOTENCY_MAX_KEYS", "10000")),
+        )
+
+    @property
+    def scope(self) -> str:
+        return os.path.basename(self.directory)
+
+    def _lock_path(self, name: str) -> str:
+        # "idempotency.<n>" so lock-wait metrics get one "idempotency" label.
+        return os.path.join(self.directory, f"idempotency.{name}")
+
+    def run(
+        self, key: str, request: Any, handler: Callable[[], Any]
+    ) -> tuple[Any, bool]:
+        """Return ``(response, replayed)`` for ``request`` sent with ``key``.
+
+        ``handler`` runs only if no live response is stored for ``key``; its
+        return value (JSON-serializable) is stored unless it raises.
+        """
+        digest = hashlib.sha256(key.encode()).hexdigest()
+        fingerprint = _fingerprint(request)
+        path = os.path.join(self.directory, f"{digest}.json")
+        with file_lock(self._lock_path(f"{int(digest[:8], 16) % STRIPES:02d}")):
+            entry = self._load(path)
+            if entry is not None:
+                if entry["fingerprint"] != fingerprint:
+                    IDEMPOTENCY_REQUESTS.inc(self.scope, "conflict")
+                    raise KeyReused(key)
+                IDEMPOTENCY_REQUESTS.inc(self.scope, "replayed")
+                return entry["response"], True
+            response = handler()
+            self._save(path, {"fingerprint": fingerprint, "response": response})
+        IDEMPOTENCY_REQUESTS.inc(self.scope, "stored")
+        self.sweep()
+        return response, False
+
+    def _load(self, path: str) -> Optional[dict]:
+        try:
+            with open(path) as f:
+                if time.time() - os.fstat(f.fileno()).st_mtime > self.ttl:
+                    return None
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except ValueError:
+            return None  # torn by a crash; the request runs again
+
+    def _save(self, path: str, entry: dict) -> None:
+        tmp = path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(entry, f, separators=(",", ":"))
+            if durability() != "none":
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(tmp, path)
+
+    def sweep(self, force: bool = False) -> int:
+        """Drop expired entries and the oldest beyond ``max_keys``; return
+        how many went. Runs at most every ``SWEEP_INTERVAL`` unless forced."""
+        stamp = self._lock_path("swept")
+        if not force and self._since(stamp) < SWEEP_INTERVAL:
+            return 0
+        with file_lock(self._lock_path("sweep")):
+            if not force and self._since(stamp) < SWEEP_INTERVAL:
+                return 0  # another worker just swept
+            now = time.time()
+            entries = []
+            for entry in os.scandir(self.directory):
+                if entry.name.endswith(".json"):
+                    try:
+                        entries.append((entry.stat().st_mtime, entry.path))
+                    except FileNotFoundError:
+                        continue
+            entries.sort()
+            expired = sum(1 for mtime, _ in entries if now - mtime > self.ttl)
+            doomed = entries[: max(expired, len(entries) - self.max_keys)]
+            for _, path in doomed:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+            with open(stamp, "a"):
+                os.utime(stamp)
+        return len(doomed)
+
+    @staticmethod
+    def _since(path: str) -> float:
+        try:
+            return time.time() - os.path.getmtime(path)
+        except FileNotFoundError:
+            return float("inf")
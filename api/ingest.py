@@ -0,0 +1,154 @@
+"""Write-behind ingest queue for high-volume events (``/api/track``).
+
+Request handlers hand records to :meth:`IngestQueue.submit` and return at once.
+A single writer thread drains the bounded queue in batches, flushing when a
+batch reaches ``batch_size`` records or ``flush_interval`` seconds after its
+first record arrived, whichever comes first. Each batch is one
+:meth:`RecordStore.extend` call, i.e. one append and at most one fsync (group
+commit). When the queue is full, ``submit`` raises :class:`QueueFull` (after
+waiting up to ``block_timeout`` seconds) so callers can shed load explicitly.
+"""
+
+import logging
+import os
+import queue
+import threading
+import time
+from collections.abc import Callable
+from typing import Optional
+
+from .storage import Record, RecordStore
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class QueueFull(Exception):
+    """Raised when the ingest queue cannot accept another record."""
+
+
+class IngestQueue:
+    def __init__(
+        self,
+        store_factory: Callable[[], RecordStore],
+        maxsize: int = 10000,
+        batch_size: int = 500,
+        flush_interval: float = 0.05,
+        block_timeout: float = 0.0,
+    ):
+        self.store_factory = store_factory
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.block_timeout = block_timeout
+        self.accepted = 0
+        self.rejected = 0
+        self.written = 0
+        self.batches = 0
+        self._queue: queue.Queue = queue.Queue(maxsize=maxsize)
+        self._thread: Optional[threading.Thread] = None
+        self._closed = threading.Event()
+
+    @classmethod
+    def from_env(
+        cls, prefix: str, store_factory: Callable[[], RecordStore]
+    ) -> "IngestQueue":
+        """Build a queue from ``<prefix>_QUEUE_MAX``, ``_BATCH_SIZE``,
+        ``_FLUSH_MS`` and ``_QUEUE_BLOCK_MS`` environment variables."""
+        return cls(
+            store_factory,
+            maxsize=int(os.getenv(f"{prefix}_QUEUE_MAX", "10000")),
+            batch_size=int(os.getenv(f"{prefix}_BATCH_SIZE", "500")),
+            flush_interval=int(os.getenv(f"{prefix}_FLUSH_MS", "50")) / 1000,
+            block_timeout=int(os.getenv(f"{prefix}_QUEUE_BLOCK_MS", "0")) / 1000,
+        )
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and not self._closed.is_set()
+
+    @property
+    def depth(self) -> int:
+        return self._queue.qsize()
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(
+            target=self._run, name="ingest-writer", daemon=True
+        )
+        self._thread.start()
+
+    def submit(self, record: Record) -> None:
+        if self._closed.is_set():
+            raise QueueFull("ingest queue is shutting down")
+        try:
+            if self.block_timeout > 0:
+                self._queue.put(record, timeout=self.block_timeout)
+            else:
+                self._queue.put_nowait(record)
+        except queue.Full:
+            self.rejected += 1
+            raise QueueFull("ingest queue is full") from None
+        self.accepted += 1
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """Stop accepting records, flush everything queued, join the writer."""
+        if self._thread is None:
+            return
+        self._closed.set()
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+        self._thread = None
+
+    def _run(self) -> None:
+        stopping = False
+        while not stopping:
+            batch, stopping = self._next_batch()
+            if stopping:
+                # Anything that raced in behind the sentinel still gets written.
+                while True:
+                    try:
+                        item = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item is not _STOP:
+                        batch.append(item)
+            if batch:
+                self._flush(batch, final=stopping)
+
+    def _next_batch(self) -> tuple[list[Record], bool]:
+        first = self._queue.get()
+        if first is _STOP:
+            return [], True
+        batch = [first]
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is _STOP:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _flush(self, batch: list[Record], final: bool = False) -> None:
+        while True:
+            try:
+                self.store_factory().extend(batch)
+            except Exception:
+                if final or self._closed.is_set():
+                    logger.exception("dropping %d queued record(s)", len(batch))
+                    return
+                # Keep the batch and retry; meanwhile the queue fills up and
+                # producers see QueueFull instead of unbounded memory growth.
+                logger.exception("ingest flush failed; retrying")
+                time.sleep(max(self.flush_interval, 0.1))
+                continue
+            self.written += len(batch)
+            self.batches += 1
+            return
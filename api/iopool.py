@@ -0,0 +1,160 @@
+"""A bounded thread pool for blocking persistence I/O.
+
+Lead and track writes (``flock`` waits, appends, fsyncs, idempotency files)
+and storage reads run on a dedicated pool of ``IO_POOL_SIZE`` threads
+(default 8) that async handlers await, instead of on the shared threadpool
+serving sync endpoints such as ``/api/quote``. A slow ``app_data`` volume then
+backs up this pool alone. At most ``IO_QUEUE_MAX`` calls (default 1000) wait
+for a thread; beyond that :meth:`IOPool.run` raises :class:`PoolBusy` so the
+request can be shed with ``503``.
+
+Each call runs in a copy of the caller's context, so profiling spans recorded
+by the work still reach the request's trace; for a profiled request the
+time spent waiting for a thread is the ``io_wait`` span, and the call itself
+is profiled with the request (``api.profiling.offloaded``).
+"""
+
+import asyncio
+import contextvars
+import os
+import threading
+import time
+from collections.abc import AsyncIterator, Callable, Iterator
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import suppress
+from typing import Any, Optional, TypeVar
+
+from .metrics import REGISTRY
+from .profiling import offloaded, record
+
+T = TypeVar("T")
+
+IO_POOL_THREADS = REGISTRY.gauge(
+    "io_pool_threads", "Threads configured for each I/O pool.", ("pool",)
+)
+IO_POOL_ACTIVE = REGISTRY.gauge(
+    "io_pool_active", "Calls running on each I/O pool.", ("pool",)
+)
+IO_POOL_QUEUED = REGISTRY.gauge(
+    "io_pool_queued", "Calls waiting for an I/O pool thread.", ("pool",)
+)
+IO_POOL_WAIT = REGISTRY.histogram(
+    "io_pool_wait_seconds",
+    "Time calls waited for an I/O pool thread.",
+    ("pool",),
+)
+IO_POOL_REJECTED = REGISTRY.counter(
+    "io_pool_rejected_total",
+    "Calls turned away because the I/O pool's queue was full.",
+    ("pool",),
+)
+
+
+class PoolBusy(Exception):
+    """Raised when an I/O pool cannot queue another call."""
+
+
+class IOPool:
+    def __init__(self, name: str, threads: int = 8, max_queued: int = 1000):
+        self.name = name
+        self.threads = threads
+        self.max_queued = max_queued
+        self.active = 0
+        self._pending = 0  # queued or running
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._pid = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, name: str) -> "IOPool":
+        """Build a pool from ``IO_POOL_SIZE`` and ``IO_QUEUE_MAX``."""
+        return cls(
+            name,
+            threads=int(os.getenv("IO_POOL_SIZE", "8")),
+            max_queued=int(os.getenv("IO_QUEUE_MAX", "1000")),
+        )
+
+    @property
+    def queued(self) -> int:
+        return max(0, self._pending - self.active)
+
+    def _submit(self, fn: Callable[..., T], args: tuple, bounded: bool) -> Future:
+        with self._lock:
+            if bounded and self._pending >= self.threads + self.max_queued:
+                IO_POOL_REJECTED.inc(self.name)
+                raise PoolBusy(f"{self.name} I/O pool is full")
+            if self._executor is None or self._pid != os.getpid():
+                # Threads do not survive a fork; a forked worker starts afresh.
+                self._executor = ThreadPoolExecutor(
+                    self.threads, thread_name_prefix=f"{self.name}-io"
+                )
+                self._pid = os.getpid()
+            self._pending += 1
+            executor = self._executor
+        context = contextvars.copy_context()
+        submitted = time.perf_counter()
+
+        def call():
+            waited = time.perf_counter() - submitted
+            IO_POOL_WAIT.observe(waited, self.name)
+            with self._lock:
+                self.active += 1
+            try:
+                context.run(record, "io_wait", waited)
+                return context.run(offloaded, fn, *args)
+            finally:
+                with self._lock:
+                    self.active -= 1
+
+        def done(_):
+            with self._lock:
+                self._pending -= 1
+
+        future = executor.submit(call)
+        future.add_done_callback(done)  # also when cancelled before it ran
+        return future
+
+    async def run(self, fn: Callable[..., T], *args: Any) -> T:
+        """Run ``fn(*args)`` on the pool and return its result."""
+        return await asyncio.wrap_future(self._submit(fn, args, bounded=True))
+
+    async def iterate(self, iterator: Iterator[T]) -> AsyncIterator[T]:
+        """Pull items from a blocking ``iterator`` one call at a time.
+
+        Calls after the response has started are queued however long the
+        queue, since turning them away would cut the response short.
+        """
+        done = object()
+        try:
+            while True:
+                future = self._submit(next, (iterator, done), bounded=False)
+                item = await asyncio.wrap_future(future)
+                if item is done:
+                    return
+                yield item
+        finally:
+            close = getattr(iterator, "close", None)
+            if close is not None:
+                # A reader abandoned midway releases its files here (unless
+                # a cancelled pull is still running it; then it ends with it).
+                with suppress(ValueError):
+                    await asyncio.wrap_future(self._submit(close, (), bounded=False))
+
+    def shutdown(self) -> None:
+        """Finish the calls submitted so far and stop the threads; the pool
+        starts new ones if used again."""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+
+PERSIST = IOPool.from_env("persist")
+
+
+@REGISTRY.collector
+def _collect_pools() -> None:
+    for pool in (PERSIST,):
+        IO_POOL_THREADS.set(pool.threads, pool.name)
+        IO_POOL_ACTIVE.set(pool.active, pool.name)
+        IO_POOL_QUEUED.set(pool.queued, pool.name)
@@ -0,0 +1,396 @@
+"""Prometheus metrics for the API, without third-party dependencies.
+
+Metrics live in a per-process :class:`Registry` and are rendered in the
+Prometheus text format by ``GET /api/metrics``. Updates take one
+uncontended lock per metric: HTTP metrics are recorded by
+:class:`MetricsMiddleware` on the event loop thread, and domain metrics
+(persistence, quotes) by the few threadpool threads doing that work.
+
+Under multi-worker uvicorn each worker has its own registry and a scrape
+reaches only one of them. With ``METRICS_DIR`` set, every worker writes a
+snapshot of its samples to ``METRICS_DIR/<pid>.json`` every
+``METRICS_FLUSH_SECONDS`` (default 5), and the scraped worker adds the
+snapshots of the other live workers to its own figures. Metrics that
+describe shared state (such as data file sizes) are marked ``local`` and
+always come from the scraped worker alone.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from collections.abc import Iterable, Sequence
+from typing import Any, Callable, Optional
+
+from starlette.routing import Match, Router
+
+logger = logging.getLogger(__name__)
+
+Labels = tuple[str, ...]
+
+# Request latency buckets in seconds.
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(
+        self, name: str, help: str, labelnames: Sequence[str] = (), local=False
+    ):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.local = local
+        self._values: dict[Labels, Any] = {}
+        self._lock = threading.Lock()
+
+    def samples(self) -> dict[Labels, Any]:
+        with self._lock:
+            return {k: _copy(v) for k, v in self._values.items()}
+
+    def _merge(self, into: dict[Labels, Any], other: dict[Labels, Any]) -> None:
+        for labels, value in other.items():
+            into[labels] = into.get(labels, 0.0) + value
+
+    def _lines(self, samples: dict[Labels, Any]) -> Iterable[str]:
+        for labels, value in sorted(samples.items()):
+            yield f"{self.name}{_format_labels(self.labelnames, labels)} {_num(value)}"
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def set(self, value: float, *labels: str) -> None:
+        """Mirror a monotonic count kept elsewhere (for collectors)."""
+        with self._lock:
+            self._values[labels] = float(value)
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def dec(self, *labels: str, amount: float = 1.0) -> None:
+        self.inc(*labels, amount=-amount)
+
+    def set(self, value: float, *labels: str) -> None:
+        with self._lock:
+            self._values[labels] = float(value)
+
+
+class Histogram(Metric):
+    """Per-bucket (non-cumulative) counts followed by the sum of observations."""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+        local=False,
+    ):
+        super().__init__(name, help, labelnames, local)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, *labels: str) -> None:
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(labels)
+            if state is None:
+                state = self._values[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            state[i] += 1
+            state[-1] += value
+
+    def time(self, *labels: str) -> "_Timer":
+        """Context manager observing the duration of its block in seconds."""
+        return _Timer(self, labels)
+
+    def _merge(self, into: dict[Labels, Any], other: dict[Labels, Any]) -> None:
+        for labels, state in other.items():
+            mine = into.get(labels)
+            into[labels] = (
+                state if mine is None else [a + b for a, b in zip(mine, state)]
+            )
+
+    def _lines(self, samples: dict[Labels, Any]) -> Iterable[str]:
+        for labels, state in sorted(samples.items()):
+            cumulative = 0
+            for bound, count in zip((*self.buckets, float("inf")), state):
+                cumulative += count
+                le = _format_labels((*self.labelnames, "le"), (*labels, _num(bound)))
+                yield f"{self.name}_bucket{le} {cumulative}"
+            tail = _format_labels(self.labelnames, labels)
+            yield f"{self.name}_sum{tail} {_num(state[-1])}"
+            yield f"{self.name}_count{tail} {cumulative}"
+
+
+class _Timer:
+    __slots__ = ("histogram", "labels", "start")
+
+    def __init__(self, histogram: Histogram, labels: Labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self) -> "_Timer":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.histogram.observe(time.perf_counter() - self.start, *self.labels)
+
+
+def _copy(value: Any) -> Any:
+    return list(value) if isinstance(value, list) else value
+
+
+def _num(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{n}="{_escape(str(v))}"' for n, v in zip(names, values))
+    return "{" + pairs + "}"
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: dict[str, Metric] = {}
+        self._collectors: list[Callable[[], None]] = []
+
+    def _add(self, metric: Metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"metric {metric.name!r} already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help: str, labelnames=(), local=False) -> Counter:
+        return self._add(Counter(name, help, labelnames, local))
+
+    def gauge(self, name: str, help: str, labelnames=(), local=False) -> Gauge:
+        return self._add(Gauge(name, help, labelnames, local))
+
+    def histogram(
+        self, name: str, help: str, labelnames=(), buckets=LATENCY_BUCKETS, local=False
+    ) -> Histogram:
+        return self._add(Histogram(name, help, labelnames, buckets, local))
+
+    def collector(self, fn: Callable[[], None]) -> Callable[[], None]:
+        """Register ``fn`` to refresh metrics right before they are read."""
+        self._collectors.append(fn)
+        return fn
+
+    def collect(self) -> None:
+        for fn in self._collectors:
+            try:
+                fn()
+            except Exception:
+                logger.exception("metrics collector %r failed", fn)
+
+    def snapshot(self) -> dict[str, list]:
+        """Samples of the non-local metrics, in a JSON-friendly form."""
+        return {
+            name: [[list(labels), value] for labels, value in m.samples().items()]
+            for name, m in self._metrics.items()
+            if not m.local
+        }
+
+    def render(self, others: Iterable[dict[str, list]] = ()) -> str:
+        """Prometheus text exposition, adding snapshots of other workers."""
+        self.collect()
+        merged = {name: m.samples() for name, m in self._metrics.items()}
+        for snap in others:
+            for name, samples in snap.items():
+                metric = self._metrics.get(name)
+                if metric is None or metric.local:
+                    continue
+                metric._merge(
+                    merged[name], {tuple(labels): value for labels, value in samples}
+                )
+        lines = []
+        for name, metric in self._metrics.items():
+            lines.append(f"# HELP {name} {metric.help}")
+            lines.append(f"# TYPE {name} {metric.kind}")
+            lines.extend(metric._lines(merged[name]))
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+HTTP_REQUESTS = REGISTRY.counter(
+    "http_requests_total", "HTTP requests handled.", ("method", "route", "status")
+)
+HTTP_LATENCY = REGISTRY.histogram(
+    "http_request_duration_seconds",
+    "Time from request start to the end of the response body.",
+    ("method", "route"),
+)
+HTTP_IN_FLIGHT = REGISTRY.gauge(
+    "http_requests_in_flight", "HTTP requests being handled.", ("method", "route")
+)
+
+
+class RouteLabels:
+    """Map requests to their route's path template (``"unmatched"`` for
+    404s), so labels derived from it stay bounded."""
+
+    _CACHE_MAX = 1024
+
+    def __init__(self, router: Router):
+        self.router = router
+        self._routes: dict[tuple[str, str], str] = {}
+
+    def __call__(self, scope) -> str:
+        key = (scope["method"], scope["path"])
+        route = self._routes.get(key)
+        if route is not None:
+            return route
+        route = "unmatched"
+        for candidate in self.router.routes:
+            match, _ = candidate.matches(scope)
+            if match is Match.FULL:
+                route = candidate.path
+                break
+            if match is Match.PARTIAL and route == "unmatched":
+                route = candidate.path  # wrong method: still this route
+        if route != "unmatched" and len(self._routes) < self._CACHE_MAX:
+            self._routes[key] = route
+        return route
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware recording per-route counts, latency and in-flight
+    requests, labelled by :class:`RouteLabels`."""
+
+    def __init__(self, app, router: Router):
+        self.app = app
+        self._route = RouteLabels(router)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        method = scope["method"]
+        route = self._route(scope)
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        HTTP_IN_FLIGHT.inc(method, route)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            HTTP_LATENCY.observe(time.perf_counter() - start, method, route)
+            HTTP_REQUESTS.inc(method, route, str(status))
+            HTTP_IN_FLIGHT.dec(method, route)
+
+
+def metrics_dir() -> Optional[str]:
+    return os.getenv("METRICS_DIR") or None
+
+
+def flush_interval() -> float:
+    return float(os.getenv("METRICS_FLUSH_SECONDS", "5"))
+
+
+def write_snapshot(registry: Registry = REGISTRY) -> None:
+    directory = metrics_dir()
+    if directory is None:
+        return
+    os.makedirs(directory, exist_ok=True)
+    registry.collect()
+    path = os.path.join(directory, f"{os.getpid()}.json")
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(registry.snapshot(), f)
+    os.replace(tmp, path)
+
+
+def other_snapshots() -> list[dict[str, list]]:
+    """Snapshots of other workers updated within three flush intervals."""
+    directory = metrics_dir()
+    if directory is None or not os.path.isdir(directory):
+        return []
+    fresh_after = time.time() - 3 * flush_interval()
+    own = f"{os.getpid()}.json"
+    snaps = []
+    for entry in os.scandir(directory):
+        if not entry.name.endswith(".json") or entry.name == own:
+            continue
+        try:
+            if entry.stat().st_mtime < fresh_after:
+                continue
+            with open(entry.path) as f:
+                snaps.append(json.load(f))
+        except (OSError, ValueError):
+            continue  # vanished or half-written by a dying worker
+    return snaps
+
+
+def render(registry: Registry = REGISTRY) -> str:
+    return registry.render(other_snapshots())
+
+
+class SnapshotWriter:
+    """Background thread publishing this worker's snapshot to ``METRICS_DIR``."""
+
+    def __init__(self, registry: Registry = REGISTRY):
+        self.registry = registry
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        # The first snapshot is written up front so the worker is visible
+        # to scrapes as soon as it serves requests.
+        self._write()
+        self._thread = threading.Thread(
+            target=self._run, name="metrics-snapshot", daemon=True
+        )
+        self._thread.start()
+
+    def _write(self) -> None:
+        try:
+            write_snapshot(self.registry)
+        except OSError:
+            logger.exception("writing metrics snapshot failed")
+
+    def _run(self) -> None:
+        while not self._stop.wait(flush_interval()):
+            self._write()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        directory = metrics_dir()
+        if directory is not None:
+            try:
+                os.remove(os.path.join(directory, f"{os.getpid()}.json"))
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,283 @@
+"""Opt-in per-request profiling and ``Server-Timing`` spans.
+
+Off unless ``PROFILE_ENABLED=1``. A request is then profiled when it sends
+``X-Profile: 1`` (or ``X-Profile: <PROFILE_TOKEN>`` when a token is set, so
+arbitrary clients cannot trigger profiling), or at random with probability
+``PROFILE_SAMPLE_RATE`` (default 0). For a profiled request:
+
+* the endpoint function runs under ``cProfile`` and the stats are written to
+  ``PERSIST_DIR/profiles`` (readable with ``pstats`` or ``snakeviz``),
+  keeping the newest ``PROFILE_KEEP`` (default 50) files;
+* :func:`span` blocks record their durations, which are returned in a
+  ``Server-Timing`` header along with ``app``, the time to the response
+  headers.
+
+Work a profiled request hands to another thread (the persistence pool,
+``api.iopool``) runs through :func:`offloaded`: its spans reach the request's
+trace and, on Python before 3.12, it gets a profiler of its own whose stats
+are merged into the request's profile. From 3.12 ``cProfile`` already sees
+every thread, so the request's profiler records it directly.
+
+Unprofiled requests only pay a context variable lookup per span or
+:func:`timed` call. Only one request per process runs under ``cProfile`` at
+a time (Python 3.12 refuses a second active profiler, and on the event loop
+overlapping profiles would pick up each other's frames); a request selected
+while another is being profiled still gets its ``Server-Timing`` spans.
+"""
+
+import cProfile
+import functools
+import inspect
+import os
+import pstats
+import random
+import threading
+import time
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Any, Callable, Optional, TypeVar
+
+from fastapi.routing import APIRoute
+from starlette.concurrency import run_in_threadpool
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+
+class Trace:
+    """Spans and profiler of one profiled request."""
+
+    __slots__ = ("spans", "profiler", "offloaded")
+
+    def __init__(self):
+        self.spans: dict[str, float] = {}
+        self.profiler: Optional[cProfile.Profile] = None
+        # Profiles of work run on other threads, merged into ``profiler``'s.
+        self.offloaded: list[cProfile.Profile] = []
+
+    def add(self, name: str, seconds: float) -> None:
+        self.spans[name] = self.spans.get(name, 0.0) + seconds
+
+    def server_timing(self) -> str:
+        return ", ".join(
+            f"{name};dur={seconds * 1000:.3f}" for name, seconds in self.spans.items()
+        )
+
+
+_current: ContextVar[Optional[Trace]] = ContextVar("profiling_trace", default=None)
+
+
+class _Span:
+    __slots__ = ("name", "trace", "start")
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self) -> None:
+        self.trace = _current.get()
+        if self.trace is not None:
+            self.start = time.perf_counter()
+
+    def __exit__(self, *exc) -> None:
+        if self.trace is not None:
+            self.trace.add(self.name, time.perf_counter() - self.start)
+
+
+def span(name: str) -> _Span:
+    """Time a ``with`` block as ``name`` if the request is being profiled.
+
+    Repeated spans of the same name (e.g. per quote in a batch) add up.
+    """
+    return _Span(name)
+
+
+def timed(name: str) -> Callable[[F], F]:
+    """Decorator form of :func:`span` for a whole function."""
+
+    def decorate(fn: F) -> F:
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            trace = _current.get()
+            if trace is None:
+                return fn(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                trace.add(name, time.perf_counter() - start)
+
+        return wrapper  # type: ignore[return-value]
+
+    return decorate
+
+
+def record(name: str, seconds: float) -> None:
+    """Add ``seconds`` to the span ``name`` if the request is being profiled."""
+    trace = _current.get()
+    if trace is not None:
+        trace.add(name, seconds)
+
+
+def offloaded(fn: Callable[..., Any], *args: Any) -> Any:
+    """Call ``fn(*args)`` on behalf of the current request from another thread
+    (run in a copy of its context), profiling it if the request is."""
+    trace = _current.get()
+    if trace is None or trace.profiler is None:
+        return fn(*args)
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:  # Python 3.12+: the request's profiler sees this thread
+        return fn(*args)
+    try:
+        return fn(*args)
+    finally:
+        profiler.disable()
+        trace.offloaded.append(profiler)
+
+
+def enabled() -> bool:
+    return os.getenv("PROFILE_ENABLED", "0") == "1"
+
+
+def profile_dir() -> str:
+    return os.path.join(os.getenv("PERSIST_DIR", "/data"), "profiles")
+
+
+def _selected(headers: dict[bytes, bytes]) -> bool:
+    value = headers.get(b"x-profile")
+    if value is not None:
+        token = os.getenv("PROFILE_TOKEN")
+        if value.decode("latin-1") == (token or "1"):
+            return True
+    rate = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+    return rate > 0 and random.random() < rate
+
+
+def _write_profile(trace: Trace, method: str, path: str) -> str:
+    directory = profile_dir()
+    os.makedirs(directory, exist_ok=True)
+    stamp = datetime.utcnow().strftime("%Y%m%dT%H%M%S%f")
+    slug = path.strip("/").replace("/", "_") or "root"
+    filename = os.path.join(directory, f"{stamp}-{os.getpid()}-{method}-{slug}.prof")
+    stats = pstats.Stats(trace.profiler)
+    for profiler in list(trace.offloaded):
+        stats.add(profiler)
+    stats.dump_stats(filename)
+    keep = int(os.getenv("PROFILE_KEEP", "50"))
+    profiles = sorted(
+        entry.path for entry in os.scandir(directory) if entry.name.endswith(".prof")
+    )
+    for old in profiles[: max(0, len(profiles) - keep)]:
+        try:
+            os.remove(old)
+        except FileNotFoundError:
+            pass  # another worker pruned it first
+    return filename
+
+
+class ProfilingMiddleware:
+    """Select requests for profiling and report their spans."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not enabled():
+            await self.app(scope, receive, send)
+            return
+        if not _selected(dict(scope["headers"])):
+            await self.app(scope, receive, send)
+            return
+        trace = Trace()
+        token = _current.set(trace)
+        start = time.perf_counter()
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                trace.add("app", time.perf_counter() - start)
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", trace.server_timing().encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current.reset(token)
+            if trace.profiler is not None:
+                await run_in_threadpool(
+                    _write_profile, trace, scope["method"], scope["path"]
+                )
+
+
+# Held while a request runs under cProfile.
+_profiler_lock = threading.Lock()
+
+
+def _start_profiler(trace: Trace) -> Optional[cProfile.Profile]:
+    """Enable a profiler for ``trace``, or return ``None`` if one is already
+    active in this process."""
+    if not _profiler_lock.acquire(blocking=False):
+        return None
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:  # another profiling tool is active (Python 3.12+)
+        _profiler_lock.release()
+        return None
+    trace.profiler = profiler
+    return profiler
+
+
+def _stop_profiler(profiler: Optional[cProfile.Profile]) -> None:
+    if profiler is not None:
+        profiler.disable()
+        _profiler_lock.release()
+
+
+def _profiled_call(call: Callable[..., Any]) -> Callable[..., Any]:
+    """Wrap an endpoint so a profiled request runs it under ``cProfile``.
+
+    ``cProfile`` only sees the thread it is enabled in, so it has to start
+    inside the endpoint call (a threadpool thread for sync endpoints).
+    """
+    if inspect.iscoroutinefunction(call):
+
+        @functools.wraps(call)
+        async def async_wrapper(*args, **kwargs):
+            trace = _current.get()
+            if trace is None:
+                return await call(*args, **kwargs)
+            # Also samples other coroutines running on the event loop meanwhile.
+            with span("endpoint"):
+                profiler = _start_profiler(trace)
+                try:
+                    return await call(*args, **kwargs)
+                finally:
+                    _stop_profiler(profiler)
+
+        return async_wrapper
+
+    @functools.wraps(call)
+    def wrapper(*args, **kwargs):
+        trace = _current.get()
+        if trace is None:
+            return call(*args, **kwargs)
+        with span("endpoint"):
+            profiler = _start_profiler(trace)
+            try:
+                return call(*args, **kwargs)
+            finally:
+                _stop_profiler(profiler)
+
+    return wrapper
+
+
+class ProfiledRoute(APIRoute):
+    """``APIRoute`` whose endpoint can be profiled by :class:`ProfilingMiddleware`."""
+
+    def __init__(self, path: str, endpoint: Callable[..., Any], **kwargs: Any):
+        super().__init__(path, endpoint, **kwargs)
+        # The request handler calls dependant.call; swapping it after the
+        # route is built keeps FastAPI's signature analysis of the original.
+        self.dependant.call = _profiled_call(self.dependant.call)
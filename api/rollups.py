@@ -0,0 +1,305 @@
+"""Incrementally maintained affiliate/UTM rollups of tracks and leads.
+
+Every write to the ``tracks`` and ``leads`` stores also adds its records to
+per-day counters keyed by affiliate × ``utm_source`` × ``utm_medium`` ×
+``utm_campaign``: clicks for tracks, conversions for leads. Each day is one
+small JSON file under ``PERSIST_DIR/rollups`` (``2025-01-31.json``), so a
+report over a date range reads one file per day in it and its cost follows
+the number of buckets, not the number of raw events.
+
+Writes do not touch the day files themselves: the store's write hook only
+adds the batch's counts to an in-memory buffer of the process, which is
+merged into the day files every ``ROLLUPS_FLUSH_MS`` (default 1000), at
+shutdown, and before this process answers a query. One read-merge-write per
+day file and flush, under the rollup lock shared by both kinds, thus covers
+all the writes of that interval, and writers never wait for it. Reports can
+lag other workers' writes by up to the flush interval, and a worker that
+crashes loses its unflushed counts (the raw records are stored; a rebuild
+recounts them).
+
+The rollups can be regenerated from the raw history (for example after
+restoring a backup, after a crash, or for data written with
+``ROLLUPS_ENABLED=0``) with::
+
+    python -m api.rollups rebuild [--dir /data]
+"""
+
+import argparse
+import atexit
+import json
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+from collections.abc import Iterable
+from contextlib import ExitStack
+from datetime import date
+from typing import Optional
+
+from .storage import (
+    Record,
+    data_file,
+    durability,
+    file_lock,
+    get_store,
+    write_hook,
+)
+
+logger = logging.getLogger(__name__)
+
+DIMENSIONS = ("affiliate", "utm_source", "utm_medium", "utm_campaign")
+# Counter index per record kind within a bucket's [clicks, leads].
+KINDS = {"tracks": 0, "leads": 1}
+
+# Bucket key (dimension values joined by SEP, missing ones empty) -> counts.
+Buckets = dict[str, list[int]]
+SEP = "\t"
+
+
+def enabled() -> bool:
+    return os.getenv("ROLLUPS_ENABLED", "1") == "1"
+
+
+def rollup_dir() -> str:
+    directory = data_file("rollups")
+    os.makedirs(directory, exist_ok=True)
+    return directory
+
+
+def _day_path(directory: str, day: str) -> str:
+    return os.path.join(directory, f"{day}.json")
+
+
+def _lock_path(directory: str) -> str:
+    return os.path.join(directory, "rollups")
+
+
+def _generation(directory: str) -> int:
+    """How many times the rollups in ``directory`` have been rebuilt."""
+    try:
+        with open(os.path.join(directory, "generation")) as f:
+            return int(f.read() or 0)
+    except FileNotFoundError:
+        return 0
+
+
+def flush_interval() -> float:
+    return int(os.getenv("ROLLUPS_FLUSH_MS", "1000")) / 1000
+
+
+def _key(record: Record) -> str:
+    return SEP.join(str(record.get(name) or "") for name in DIMENSIONS)
+
+
+def aggregate(kind: str, records: Iterable[Record]) -> dict[str, Buckets]:
+    """Per-day buckets of ``records``; records without a timestamp are skipped."""
+    index = KINDS[kind]
+    days: dict[str, Buckets] = defaultdict(dict)
+    for record in records:
+        timestamp = record.get("timestamp")
+        if not isinstance(timestamp, str) or len(timestamp) < 10:
+            continue
+        buckets = days[timestamp[:10]]
+        counts = buckets.setdefault(_key(record), [0, 0])
+        counts[index] += 1
+    return days
+
+
+def _read(path: str) -> Buckets:
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def _write(path: str, buckets: Buckets, level: str) -> None:
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(buckets, f, separators=(",", ":"), sort_keys=True)
+        if level != "none":
+            f.flush()
+            os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def _merge(into: Buckets, buckets: Buckets) -> None:
+    for key, counts in buckets.items():
+        mine = into.get(key)
+        if mine is None:
+            into[key] = list(counts)
+        else:
+            mine[0] += counts[0]
+            mine[1] += counts[1]
+
+
+class _Pending:
+    """Counts of this process's writes not yet merged into the day files.
+
+    Counts are kept per data directory and rebuild generation: the hook runs
+    under the store's lock, which a rebuild holds too, so counts taken in an
+    older generation are already part of the rebuilt files and are dropped.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.days: dict[tuple[str, int], dict[str, Buckets]] = {}
+        self.flusher: Optional[threading.Thread] = None
+        self.pid = os.getpid()
+
+    def add(self, directory: str, days: dict[str, Buckets]) -> None:
+        generation = _generation(directory)
+        with self.lock:
+            self._after_fork()
+            pending = self.days.setdefault((directory, generation), {})
+            for day, buckets in days.items():
+                _merge(pending.setdefault(day, {}), buckets)
+            if self.flusher is None:
+                self.flusher = threading.Thread(
+                    target=self._run, name="rollups-flush", daemon=True
+                )
+                self.flusher.start()
+
+    def take(self) -> dict[tuple[str, int], dict[str, Buckets]]:
+        with self.lock:
+            self._after_fork()
+            days, self.days = self.days, {}
+            return days
+
+    def _after_fork(self) -> None:
+        if self.pid != os.getpid():
+            # The parent flushes its own counts; the flusher thread is gone.
+            self.days, self.flusher, self.pid = {}, None, os.getpid()
+
+    def _run(self) -> None:
+        while True:
+            time.sleep(flush_interval())
+            try:
+                flush()
+            except Exception:
+                logger.exception("rollup flush failed")
+
+
+_PENDING = _Pending()
+
+
+@write_hook
+def update(kind: str, records: list[Record]) -> None:
+    """Add freshly written ``records`` of ``kind`` to the rollups (buffered
+    until the next :func:`flush`)."""
+    if kind not in KINDS or not enabled():
+        return
+    days = aggregate(kind, records)
+    if days:
+        _PENDING.add(rollup_dir(), days)
+
+
+@atexit.register
+def flush() -> None:
+    """Merge this process's buffered counts into the day files."""
+    level = durability()
+    for (directory, generation), days in _PENDING.take().items():
+        with file_lock(_lock_path(directory)):
+            if _generation(directory) != generation:
+                continue  # rebuilt meanwhile, which counted these records
+            for day, buckets in days.items():
+                path = _day_path(directory, day)
+                current = _read(path)
+                _merge(current, buckets)
+                _write(path, current, level)
+
+
+def _days(directory: str) -> list[str]:
+    return sorted(
+        entry.name[:-5]
+        for entry in os.scandir(directory)
+        if entry.name.endswith(".json") and len(entry.name) == 15
+    )
+
+
+def query(
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    affiliate: Optional[str] = None,
+) -> list[dict]:
+    """Buckets of the days from ``start`` to ``end`` (inclusive), oldest first."""
+    flush()
+    directory = rollup_dir()
+    low = start.isoformat() if start else ""
+    high = end.isoformat() if end else "9999-12-31"
+    found = []
+    for day in _days(directory):
+        if not low <= day <= high:
+            continue
+        for key, (clicks, leads) in sorted(_read(_day_path(directory, day)).items()):
+            values = key.split(SEP)
+            if affiliate is not None and values[0] != affiliate:
+                continue
+            found.append(
+                {
+                    "day": day,
+                    **{name: value or None for name, value in zip(DIMENSIONS, values)},
+                    "clicks": clicks,
+                    "leads": leads,
+                }
+            )
+    return found
+
+
+def _counting(records: Iterable[Record], counted: dict[str, int], kind: str):
+    for record in records:
+        counted[kind] += 1
+        yield record
+
+
+def rebuild() -> dict[str, int]:
+    """Regenerate every day file from the raw stores; return records counted.
+
+    Both stores stay locked meanwhile, so no write is counted twice or lost.
+    """
+    stores = {kind: get_store(kind) for kind in KINDS}
+    for store in stores.values():
+        migrate = getattr(store, "migrate", None)
+        if migrate is not None:
+            migrate()  # legacy arrays must be in the store being scanned
+    directory = rollup_dir()
+    level = durability()
+    counted = dict.fromkeys(KINDS, 0)
+    days: dict[str, Buckets] = defaultdict(dict)
+    with ExitStack() as stack:
+        for store in stores.values():
+            stack.enter_context(file_lock(store.path))
+        stack.enter_context(file_lock(_lock_path(directory)))
+        for kind, store in stores.items():
+            records = _counting(store.scan(), counted, kind)
+            for day, buckets in aggregate(kind, records).items():
+                _merge(days[day], buckets)
+        for day, buckets in days.items():
+            _write(_day_path(directory, day), buckets, level)
+        for day in _days(directory):
+            if day not in days:
+                os.remove(_day_path(directory, day))
+        # Counts still buffered by any process were taken in the previous
+        # generation and are already in the scan.
+        generation = os.path.join(directory, "generation")
+        with open(generation + ".tmp", "w") as f:
+            f.write(str(_generation(directory) + 1))
+        os.replace(generation + ".tmp", generation)
+    return counted
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m api.rollups")
+    sub = parser.add_subparsers(dest="command", required=True)
+    reb = sub.add_parser("rebuild", help="regenerate rollups from leads and tracks")
+    reb.add_argument("--dir", help="data directory (defaults to PERSIST_DIR)")
+    args = parser.parse_args(argv)
+    if args.dir:
+        os.environ["PERSIST_DIR"] = args.dir
+    for kind, count in rebuild().items():
+        print(f"{kind}: counted {count} record(s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""JSON encoding for hot response paths.
+
+``dumps`` produces the same bytes as Starlette's ``JSONResponse`` (compact
+separators, UTF-8, Python float ``repr``) without going through FastAPI's
+response-model validation and ``jsonable_encoder``. ``orjson`` is used when it
+is installed; it formats floats like ``repr`` except outside
+``[1e-4, 1e16)``, so payloads with such magnitudes fall back to the stdlib.
+
+``negotiate_coding`` and ``compress`` implement ``Accept-Encoding`` for
+bodies the API memoizes: ``br`` when the optional ``brotli`` package is
+installed, otherwise ``gzip``.
+"""
+
+import gzip
+import json
+from typing import Any, Optional
+
+try:  # optional: a faster, byte-compatible encoder for typical payloads
+    import orjson
+except ImportError:  # pragma: no cover - exercised when orjson is absent
+    orjson = None
+
+try:  # optional: brotli compresses JSON noticeably better than gzip
+    import brotli
+except ImportError:  # pragma: no cover - exercised when brotli is absent
+    brotli = None
+
+# Content codings ``compress`` supports, preferred first.
+CODINGS = ("br", "gzip") if brotli is not None else ("gzip",)
+
+# Largest magnitude orjson renders exactly like ``repr``.
+_ORJSON_SAFE_MAX = 1e16
+
+
+def dumps(content: Any, max_magnitude: float = 0.0) -> bytes:
+    """Encode ``content`` exactly as ``JSONResponse`` would.
+
+    ``max_magnitude`` is the caller's bound on the largest float in
+    ``content``; it decides whether ``orjson`` can be used. Payloads holding
+    non-zero floats below 1e-4 (not produced by cent-rounded money) must not
+    take the ``orjson`` path.
+    """
+    if orjson is not None and max_magnitude < _ORJSON_SAFE_MAX:
+        return orjson.dumps(content)
+    return json.dumps(
+        content,
+        ensure_ascii=False,
+        allow_nan=False,
+        indent=None,
+        separators=(",", ":"),
+    ).encode("utf-8")
+
+
+def _qvalues(header: str) -> dict[str, float]:
+    """Parse a ``token;q=0.5, other`` header into ``{token: q}``."""
+    values = {}
+    for item in header.split(","):
+        token, *params = (part.strip() for part in item.split(";"))
+        if not token:
+            continue
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        values[token.lower()] = q
+    return values
+
+
+def accepts(accept: Optional[str], media_type: str) -> bool:
+    """Whether an ``Accept`` header explicitly asks for ``media_type``."""
+    return _qvalues(accept or "").get(media_type, 0.0) > 0
+
+
+def negotiate_coding(accept_encoding: Optional[str]) -> Optional[str]:
+    """Pick ``"br"`` or ``"gzip"`` for ``accept_encoding``, or ``None``.
+
+    The client's highest-q coding wins; on a tie brotli is preferred. ``*``
+    stands for any coding the header does not list.
+    """
+    offered = _qvalues(accept_encoding or "")
+    wildcard = offered.get("*", 0.0)
+    best, best_q = None, 0.0
+    for coding in CODINGS:
+        q = offered.get(coding, wildcard)
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+def compress(body: bytes, coding: str) -> bytes:
+    """Compress ``body`` for a ``Content-Encoding`` of ``coding``."""
+    if coding == "br":
+        return brotli.compress(body, quality=5)
+    if coding == "gzip":
+        return gzip.compress(body, compresslevel=6, mtime=0)
+    raise ValueError(f"Unsupported content coding {coding!r}")
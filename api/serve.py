@@ -0,0 +1,148 @@
+"""Serve the API from uvicorn workers forked off a warm parent.
+
+``uvicorn --workers N`` starts every worker as a fresh interpreter that
+imports FastAPI, builds the app's models and routes, and warms up on its own
+(see :mod:`api.warmup`). Here the parent does that once: it imports the app,
+runs the warmup steps, binds the socket and then forks the workers, which
+inherit the loaded modules, built schemas and primed caches (copy-on-write)
+and share the listening socket. Each worker's lifespan still runs in the
+worker, so background threads, connection pools and metrics snapshots are
+its own; warmup steps done in the parent are not repeated, and a worker
+reports ready on ``/api/ready`` right after it starts.
+
+    python -m api.serve --host 0.0.0.0 --port 8000 --workers 4
+
+``--workers`` defaults to ``WEB_CONCURRENCY`` (1). The parent replaces
+workers that exit, and stops them all on ``SIGTERM`` or ``SIGINT``.
+``--no-preload`` skips the warmup in the parent.
+"""
+
+import argparse
+import logging
+import os
+import signal
+import sys
+import time
+
+log = logging.getLogger(__name__)
+
+# A worker that dies sooner than this after starting is replaced only after
+# this long, so a crash loop does not spin.
+RESPAWN_DELAY = 1.0
+STOP_SIGNALS = (signal.SIGTERM, signal.SIGINT)
+
+
+def _worker(server, sockets) -> None:
+    """Run one uvicorn ``server`` in a forked child; never returns."""
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(signum, signal.SIG_DFL)
+    status = 0
+    try:
+        server.run(sockets=sockets)
+    except BaseException:
+        log.exception("worker %d failed", os.getpid())
+        status = 1
+    finally:
+        os._exit(status)
+
+
+def supervise(start_worker, workers: int) -> None:
+    """Keep ``workers`` children forked with ``start_worker`` running until
+    ``SIGTERM``/``SIGINT``, then stop them and wait for them to exit."""
+    children: dict[int, float] = {}  # pid -> start time
+    stopping = False
+
+    def spawn() -> None:
+        # A stop() between the fork and recording the child would miss it.
+        signal.pthread_sigmask(signal.SIG_BLOCK, STOP_SIGNALS)
+        try:
+            pid = os.fork()
+            if pid == 0:
+                for signum in STOP_SIGNALS:
+                    signal.signal(signum, signal.SIG_DFL)
+                signal.pthread_sigmask(signal.SIG_UNBLOCK, STOP_SIGNALS)
+                start_worker()
+            children[pid] = time.monotonic()
+        finally:
+            signal.pthread_sigmask(signal.SIG_UNBLOCK, STOP_SIGNALS)
+
+    def stop(signum, frame) -> None:
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    for signum in STOP_SIGNALS:
+        signal.signal(signum, stop)
+    for _ in range(workers):
+        spawn()
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        started = children.pop(pid, None)
+        if started is None or stopping:
+            continue
+        log.warning(
+            "worker %d exited with status %d; starting another",
+            pid,
+            os.waitstatus_to_exitcode(status),
+        )
+        if time.monotonic() - started < RESPAWN_DELAY:
+            time.sleep(RESPAWN_DELAY)
+        if not stopping:
+            spawn()
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m api.serve")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=int(os.getenv("WEB_CONCURRENCY", "1")),
+        help="worker processes (default WEB_CONCURRENCY or 1)",
+    )
+    parser.add_argument(
+        "--no-preload",
+        dest="preload",
+        action="store_false",
+        help="leave the warmup to each worker",
+    )
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=args.log_level.upper())
+
+    import uvicorn
+
+    from .app import app
+    from .warmup import WARMUP
+
+    if args.preload:
+        took = WARMUP.run()
+        if WARMUP.failed is not None:
+            step, error = WARMUP.failed
+            log.error("preload warmup step %r failed: %s", step, error)
+        else:
+            log.info(
+                "preloaded: %s", ", ".join(f"{s} {t:.3f}s" for s, t in took.items())
+            )
+    config = uvicorn.Config(
+        app, host=args.host, port=args.port, log_level=args.log_level
+    )
+    server = uvicorn.Server(config)
+    if args.workers <= 1:
+        server.run()
+        return 0
+    sockets = [config.bind_socket()]
+    supervise(lambda: _worker(server, sockets), args.workers)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,93 @@
+"""Inverse quote helpers: solve for one loan input given a monthly payment.
+
+The monthly payment is a step function of each input (it is rounded to the
+cent), so there is usually no exact inverse. The solvers answer the
+affordability question instead: the largest price, or the smallest down
+payment or term, whose quoted payment does not exceed the target. A closed
+form annuity inverse gives a starting estimate, and an exponential bracket
+plus bisection over integer cents (or months) makes it exact against the
+real payment function.
+"""
+
+import math
+from typing import Callable
+
+# Safety bound on payment evaluations per solve.
+MAX_EVALUATIONS = 200
+
+
+class NoSolution(ValueError):
+    """No input value within the bounds meets the target payment."""
+
+
+def annuity_principal(payment: float, rate: float, term: int) -> float:
+    """Principal that ``payment`` per period amortizes over ``term`` periods."""
+    if rate == 0:
+        return payment * term
+    return payment * (1 - (1 + rate) ** -term) / rate
+
+
+def annuity_term(principal: float, payment: float, rate: float) -> float:
+    """Periods needed to amortize ``principal`` at ``payment`` (may be inf)."""
+    if principal <= 0:
+        return 0.0
+    if rate == 0:
+        return principal / payment
+    if payment <= principal * rate:
+        return math.inf  # the payment does not even cover the interest
+    return -math.log(1 - principal * rate / payment) / math.log(1 + rate)
+
+
+class _Budget:
+    def __init__(self, fn: Callable[[int], int]):
+        self.fn = fn
+        self.calls = 0
+
+    def __call__(self, x: int) -> int:
+        self.calls += 1
+        if self.calls > MAX_EVALUATIONS:
+            raise NoSolution("solver did not converge")
+        return self.fn(x)
+
+
+def max_within(
+    payment: Callable[[int], int], target: int, guess: int, lo: int, hi: int
+) -> int:
+    """Largest ``x`` in ``[lo, hi]`` with ``payment(x) <= target``, for a
+    non-decreasing ``payment``."""
+    f = _Budget(payment)
+    if f(lo) > target:
+        raise NoSolution("target payment is below the payment at the lower bound")
+    if f(hi) <= target:
+        return hi
+    # Bracket [good, bad) around the guess, then bisect.
+    guess = min(max(guess, lo), hi)
+    step = 1
+    if f(guess) <= target:
+        good = guess
+        bad = min(guess + step, hi)
+        while f(bad) <= target:
+            good, step = bad, step * 2
+            bad = min(bad + step, hi)
+    else:
+        bad = guess
+        good = max(guess - step, lo)
+        while f(good) > target:
+            bad, step = good, step * 2
+            good = max(good - step, lo)
+    while bad - good > 1:
+        mid = (good + bad) // 2
+        if f(mid) <= target:
+            good = mid
+        else:
+            bad = mid
+    return good
+
+
+def min_within(
+    payment: Callable[[int], int], target: int, guess: int, lo: int, hi: int
+) -> int:
+    """Smallest ``x`` in ``[lo, hi]`` with ``payment(x) <= target``, for a
+    non-increasing ``payment``."""
+    # Mirror onto max_within: y = -x makes the payment non-decreasing.
+    return -max_within(lambda y: payment(-y), target, -guess, -hi, -lo)
@@ -0,0 +1,999 @@
+"""Persistence backends for leads and tracking events.
+
+Records live under ``PERSIST_DIR`` (default ``/data``), which in Docker is the
+``app_data`` volume shared by the blue and green stacks. The default backend is
+an append-only JSON Lines file per record kind (``leads.jsonl``,
+``tracks.jsonl``): each write appends whole lines under an exclusive
+``flock`` on a sidecar ``.lock`` file, so concurrent workers and both colors
+can write safely and every append costs O(1) regardless of history size.
+
+The segmented backend (``PERSIST_BACKEND=segments``) partitions each kind by
+time into JSON Lines segment files under ``PERSIST_DIR/<kind>/``, one per UTC
+day (or month, with ``PERSIST_SEGMENT=month``). Readers can scan just the
+segments overlapping a time range, retention drops whole segments older than
+``<KIND>_RETENTION_DAYS`` (``TRACKS_RETENTION_DAYS`` defaults to 183, leads
+are kept), and compaction merges runs of small closed segments::
+
+    python -m api.storage retain [--dir /data]
+    python -m api.storage compact [--dir /data]
+
+The SQLite backend (``PERSIST_BACKEND=sqlite``) keeps each kind in a WAL-mode
+database (``leads.sqlite3``, ``tracks.sqlite3``) indexed by timestamp,
+affiliate and ``utm_source``, written in batches through a per-process
+connection pool of ``SQLITE_POOL_SIZE`` connections.
+
+The legacy backend (``PERSIST_BACKEND=json``) keeps the original single JSON
+array per kind. Legacy ``leads.json``/``tracks.json`` arrays (and, for the
+segmented and SQLite backends, ``leads.jsonl``/``tracks.jsonl`` files) are
+folded into the configured store the first time it is written, or explicitly
+with::
+
+    python -m api.storage migrate [--backend sqlite] [--dir /data]
+"""
+
+import argparse
+import calendar
+import fcntl
+import json
+import logging
+import mmap
+import os
+import re
+import sqlite3
+import threading
+from collections import defaultdict
+from collections.abc import Iterable, Iterator
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Any, Callable, NamedTuple, Optional
+
+from .metrics import REGISTRY
+from .profiling import span
+
+logger = logging.getLogger(__name__)
+
+Record = dict[str, Any]
+
+# "none": leave flushing to the OS page cache (previous behaviour).
+# "fsync": fsync the data file after every write batch.
+# "full": additionally fsync the directory when a file is created or renamed.
+DURABILITY_LEVELS = ("none", "fsync", "full")
+
+
+PERSIST_WRITE = REGISTRY.histogram(
+    "persistence_write_seconds",
+    "Time to write a batch of records, including waiting for the file lock.",
+    ("store", "backend"),
+)
+LOCK_WAIT = REGISTRY.histogram(
+    "persistence_lock_wait_seconds",
+    "Time spent waiting for a data file lock.",
+    ("store",),
+)
+STORE_BYTES = REGISTRY.gauge(
+    "persistence_store_bytes",
+    "Size of each store's data file(s).",
+    ("store",),
+    local=True,
+)
+SQLITE_CONNECTIONS = REGISTRY.gauge(
+    "persistence_sqlite_connections",
+    "Open connections to each store's database (SQLite backend).",
+    ("store",),
+)
+STORE_SEGMENTS = REGISTRY.gauge(
+    "persistence_store_segments",
+    "Segment files of each store (segmented backend).",
+    ("store",),
+    local=True,
+)
+
+
+def _store_name(path: str) -> str:
+    return os.path.basename(path).split(".", 1)[0]
+
+
+# Called as hook(kind, records) after every write, still under the store lock.
+WRITE_HOOKS: list[Callable[[str, list[Record]], None]] = []
+
+
+def write_hook(fn: Callable[[str, list[Record]], None]):
+    """Register ``fn`` to see every batch of records written to a store.
+
+    Hooks run inside the writer's lock, so a reader holding the store's lock
+    sees the store and everything derived from it in the same state.
+    """
+    WRITE_HOOKS.append(fn)
+    return fn
+
+
+def data_file(filename: str) -> str:
+    data_dir = os.getenv("PERSIST_DIR", "/data")
+    os.makedirs(data_dir, exist_ok=True)
+    return os.path.join(data_dir, filename)
+
+
+def durability() -> str:
+    level = os.getenv("PERSIST_DURABILITY", "none").strip().lower()
+    if level not in DURABILITY_LEVELS:
+        raise ValueError(
+            f"PERSIST_DURABILITY must be one of {', '.join(DURABILITY_LEVELS)}"
+        )
+    return level
+
+
+def _fsync_dir(path: str) -> None:
+    fd = os.open(os.path.dirname(path) or ".", os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+@contextmanager
+def file_lock(path: str) -> Iterator[None]:
+    """Hold an exclusive advisory lock on ``path`` + ``.lock``.
+
+    ``flock`` locks are honoured across processes and containers sharing the
+    same kernel, which covers multiple uvicorn workers and both color stacks
+    mounting ``app_data``.
+    """
+    fd = os.open(path + ".lock", os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        with span("lock_wait"), LOCK_WAIT.time(_store_name(path)):
+            fcntl.flock(fd, fcntl.LOCK_EX)
+        yield
+    finally:
+        os.close(fd)
+
+
+class RecordStore:
+    """An ordered collection of JSON records for one kind (leads, tracks)."""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def append(self, record: Record) -> None:
+        self.extend([record])
+
+    def extend(self, records: Iterable[Record]) -> None:
+        raise NotImplementedError
+
+    def scan(self) -> Iterator[Record]:
+        raise NotImplementedError
+
+    def scan_range(
+        self, start: Optional[str] = None, end: Optional[str] = None
+    ) -> Iterator[Record]:
+        """Records with ``start <= timestamp < end`` (ISO strings, UTC).
+
+        Records without a timestamp are only returned by unbounded scans.
+        """
+        for record in self.scan():
+            if _in_range(record, start, end):
+                yield record
+
+    def select(
+        self, start: Optional[str] = None, end: Optional[str] = None, **fields
+    ) -> Iterator[Record]:
+        """Records from :meth:`scan_range` whose ``fields`` equal the given
+        values; a field given as ``None`` matches any record."""
+        wanted = {name: value for name, value in fields.items() if value is not None}
+        for record in self.scan_range(start, end):
+            if all(record.get(name) == value for name, value in wanted.items()):
+                yield record
+
+    def size(self) -> int:
+        """Bytes on disk."""
+        try:
+            return os.path.getsize(self.path)
+        except FileNotFoundError:
+            return 0
+
+    def _written(self, records: list[Record]) -> None:
+        kind = _store_name(self.path)
+        for hook in WRITE_HOOKS:
+            try:
+                hook(kind, records)
+            except Exception:
+                # The records are stored; derived data can be rebuilt.
+                logger.exception("write hook %r failed", hook)
+
+
+class JsonArrayStore(RecordStore):
+    """Legacy store: one JSON array rewritten in full on every write."""
+
+    def extend(self, records: Iterable[Record]) -> None:
+        records = list(records)
+        if not records:
+            return
+        level = durability()
+        timer = PERSIST_WRITE.time(_store_name(self.path), "json")
+        with span("persist"), timer, file_lock(self.path):
+            if os.path.exists(self.path):
+                with open(self.path) as f:
+                    data = json.load(f)
+            else:
+                data = []
+            data.extend(records)
+            tmp = self.path + ".tmp"
+            with open(tmp, "w") as f:
+                json.dump(data, f)
+                if level != "none":
+                    f.flush()
+                    os.fsync(f.fileno())
+            os.replace(tmp, self.path)
+            if level == "full":
+                _fsync_dir(self.path)
+            self._written(records)
+
+    def scan(self) -> Iterator[Record]:
+        if not os.path.exists(self.path):
+            return
+        with open(self.path) as f:
+            yield from json.load(f)
+
+
+class JsonlStore(RecordStore):
+    """Append-only JSON Lines store.
+
+    ``legacy_path`` names a JSON array file from the previous backend; if it
+    exists when the store is written to, its records are migrated first.
+    """
+
+    def __init__(self, path: str, legacy_path: Optional[str] = None):
+        super().__init__(path)
+        self.legacy_path = legacy_path
+
+    def extend(self, records: Iterable[Record]) -> None:
+        records = list(records)
+        payload = "".join(_encode(r) for r in records)
+        if not payload:
+            return
+        level = durability()
+        timer = PERSIST_WRITE.time(_store_name(self.path), "jsonl")
+        with span("persist"), timer, file_lock(self.path):
+            if self.legacy_path and os.path.exists(self.legacy_path):
+                self._migrate_locked(level)
+            self._append_locked(payload, level)
+            self._written(records)
+
+    def scan(self) -> Iterator[Record]:
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "rb") as f:
+            yield from _decode_lines(f)
+
+    def migrate(self) -> int:
+        """Fold the legacy JSON array into this store; return records moved."""
+        if not self.legacy_path:
+            return 0
+        with file_lock(self.path):
+            if not os.path.exists(self.legacy_path):
+                return 0
+            return self._migrate_locked(durability())
+
+    def _append_locked(self, payload: str, level: str) -> None:
+        _append_file(self.path, payload, level)
+
+    def _migrate_locked(self, level: str) -> int:
+        assert self.legacy_path is not None
+        # Parse errors propagate and leave the legacy file untouched.
+        with open(self.legacy_path) as f:
+            data = json.load(f)
+        if not isinstance(data, list):
+            raise ValueError(f"{self.legacy_path} does not contain a JSON array")
+        if data:
+            self._append_locked("".join(_encode(r) for r in data), level)
+            self._written(data)
+        _retire(self.legacy_path, level)
+        return len(data)
+
+
+def _retire(path: str, level: str) -> None:
+    """Keep a migrated legacy file as ``<path>.migrated``."""
+    backup = path + ".migrated"
+    if os.path.exists(backup):
+        stamp = datetime.utcnow().strftime("%Y%m%dT%H%M%S%f")
+        backup = f"{backup}.{stamp}"
+    os.replace(path, backup)
+    if level == "full":
+        _fsync_dir(path)
+
+
+def _encode(record: Record) -> str:
+    return json.dumps(record, separators=(",", ":")) + "\n"
+
+
+def _decode_lines(lines: Iterable[bytes]) -> Iterator[Record]:
+    for line in lines:
+        # A line without its newline is a write still in progress.
+        if not line.endswith(b"\n") or not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError:
+            # Whole lines are written under the lock, so an
+            # undecodable one can only be a write torn by a crash.
+            continue
+        yield record
+
+
+def _append_file(path: str, payload: str, level: str) -> None:
+    """Append whole lines to ``path``; the caller holds the store lock."""
+    created = not os.path.exists(path)
+    fd = os.open(path, os.O_RDWR | os.O_APPEND | os.O_CREAT, 0o644)
+    try:
+        data = payload.encode()
+        size = os.fstat(fd).st_size
+        if size and os.pread(fd, 1, size - 1) != b"\n":
+            # Terminate a line torn by a crash so it cannot swallow ours.
+            data = b"\n" + data
+        while data:
+            written = os.write(fd, data)
+            data = data[written:]
+        if level != "none":
+            os.fsync(fd)
+    finally:
+        os.close(fd)
+    if created and level == "full":
+        _fsync_dir(path)
+
+
+def _in_range(record: Record, start: Optional[str], end: Optional[str]) -> bool:
+    if start is None and end is None:
+        return True
+    timestamp = record.get("timestamp")
+    if not isinstance(timestamp, str):
+        return False
+    return (start is None or timestamp >= start) and (end is None or timestamp < end)
+
+
+SEGMENT_GRANULARITIES = ("day", "month")
+# 2025-03-01.jsonl (day), 2025-03.jsonl (month), 2025-03-01--2025-03-09.jsonl
+# (compacted run).
+_SEGMENT_NAME = re.compile(
+    r"^(\d{4}-\d{2}(?:-\d{2})?)(?:--(\d{4}-\d{2}-\d{2}))?\.jsonl$"
+)
+# Records read into memory per batch when folding legacy files in.
+_MIGRATE_BATCH = 10000
+
+
+class Segment(NamedTuple):
+    path: str
+    first: str  # first and last UTC day covered, YYYY-MM-DD
+    last: str
+
+
+def _segment(directory: str, name: str) -> Optional[Segment]:
+    match = _SEGMENT_NAME.match(name)
+    if match is None:
+        return None
+    first, last = match.groups()
+    if last is None:
+        last = first
+        if len(first) == 7:
+            year, month = map(int, first.split("-"))
+            first = f"{first}-01"
+            last = f"{first[:7]}-{calendar.monthrange(year, month)[1]:02d}"
+    return Segment(os.path.join(directory, name), first, last)
+
+
+def segment_granularity() -> str:
+    granularity = os.getenv("PERSIST_SEGMENT", "day").strip().lower()
+    if granularity not in SEGMENT_GRANULARITIES:
+        raise ValueError(
+            f"PERSIST_SEGMENT must be one of {', '.join(SEGMENT_GRANULARITIES)}"
+        )
+    return granularity
+
+
+def retention_days(kind: str) -> Optional[int]:
+    """``<KIND>_RETENTION_DAYS``; raw tracking is kept 6 months by default."""
+    default = "183" if kind == "tracks" else ""
+    value = os.getenv(f"{kind.upper()}_RETENTION_DAYS", default).strip()
+    return int(value) if value else None
+
+
+class _FoldingStore(RecordStore):
+    """A store that folds a legacy JSONL store (and, through it, a legacy
+    JSON array) into itself, in batches, under its own lock."""
+
+    def __init__(self, path: str, legacy: Optional[JsonlStore] = None):
+        super().__init__(path)
+        self.legacy = legacy
+
+    def _prepare_storage(self, level: str) -> None:
+        """Create whatever the store keeps its records in."""
+
+    def _append_locked(self, records: list[Record], level: str) -> None:
+        raise NotImplementedError
+
+    def _legacy_pending(self) -> bool:
+        legacy = self.legacy
+        return legacy is not None and (
+            os.path.exists(legacy.path)
+            or bool(legacy.legacy_path and os.path.exists(legacy.legacy_path))
+        )
+
+    def migrate(self) -> int:
+        """Fold the legacy JSONL store in; return records moved."""
+        if self.legacy is None:
+            return 0
+        with file_lock(self.path):
+            if not self._legacy_pending():
+                return 0
+            level = durability()
+            self._prepare_storage(level)
+            return self._migrate_locked(level)
+
+    def _migrate_locked(self, level: str) -> int:
+        legacy = self.legacy
+        assert legacy is not None
+        sources: list[tuple[str, Iterable[Record]]] = []
+        if legacy.legacy_path and os.path.exists(legacy.legacy_path):
+            # Parse errors propagate and leave the legacy files untouched.
+            with open(legacy.legacy_path) as f:
+                data = json.load(f)
+            if not isinstance(data, list):
+                raise ValueError(f"{legacy.legacy_path} does not contain a JSON array")
+            sources.append((legacy.legacy_path, data))
+        if os.path.exists(legacy.path):
+            sources.append((legacy.path, legacy.scan()))
+        moved = 0
+        for path, records in sources:
+            # Records appended to the JSONL store were seen by the write hooks
+            # then; only the JSON array predates them.
+            new = path != legacy.path
+            batch: list[Record] = []
+            for record in records:
+                batch.append(record)
+                if len(batch) == _MIGRATE_BATCH:
+                    self._append_locked(batch, level)
+                    if new:
+                        self._written(batch)
+                    moved += len(batch)
+                    batch = []
+            if batch:
+                self._append_locked(batch, level)
+                if new:
+                    self._written(batch)
+                moved += len(batch)
+            _retire(path, level)
+        return moved
+
+
+class SegmentedStore(_FoldingStore):
+    """Time-partitioned JSON Lines segments in the directory ``path``.
+
+    Records go to the segment of their ``timestamp`` (records without one to
+    that of the write time). Segments are only appended to, under the lock
+    ``path`` + ``.lock``; retention and compaction replace whole files under
+    the same lock. Compaction writes a journal first, so a crash while it
+    swaps files never loses or duplicates records; scans take no lock, so
+    one overlapping a compaction may miss the segments being merged.
+    ``legacy`` is a JSONL store folded in on the first write.
+    """
+
+    def __init__(
+        self, path: str, legacy: Optional[JsonlStore] = None, granularity="day"
+    ):
+        super().__init__(path, legacy)
+        self.granularity = granularity
+        self.journal = os.path.join(path, "compact.journal")
+
+    def _period(self, record: Record) -> str:
+        timestamp = record.get("timestamp")
+        if not isinstance(timestamp, str) or len(timestamp) < 10:
+            timestamp = datetime.utcnow().isoformat()
+        return timestamp[:10] if self.granularity == "day" else timestamp[:7]
+
+    def extend(self, records: Iterable[Record]) -> None:
+        records = list(records)
+        if not records:
+            return
+        level = durability()
+        timer = PERSIST_WRITE.time(_store_name(self.path), "segments")
+        with span("persist"), timer, file_lock(self.path):
+            self._prepare_locked(level)
+            self._append_locked(records, level)
+            self._written(records)
+
+    def _prepare_locked(self, level: str) -> None:
+        self._prepare_storage(level)
+        if os.path.exists(self.journal):
+            self._recover_locked()
+        if self._legacy_pending():
+            self._migrate_locked(level)
+
+    def _append_locked(self, records: list[Record], level: str) -> None:
+        payloads: dict[str, list[str]] = defaultdict(list)
+        for record in records:
+            payloads[self._period(record)].append(_encode(record))
+        for period, lines in payloads.items():
+            path = os.path.join(self.path, f"{period}.jsonl")
+            _append_file(path, "".join(lines), level)
+
+    def segments(
+        self, first: Optional[str] = None, last: Optional[str] = None
+    ) -> list[Segment]:
+        """Segments overlapping the days ``first``..``last``, oldest first."""
+        try:
+            names = os.listdir(self.path)
+        except FileNotFoundError:
+            return []
+        replaced = self._replaced()
+        found = []
+        for name in names:
+            segment = _segment(self.path, name)
+            if segment is None or name in replaced:
+                continue
+            if (first is None or segment.last >= first) and (
+                last is None or segment.first <= last
+            ):
+                found.append(segment)
+        return sorted(found, key=lambda s: (s.first, s.last))
+
+    def _replaced(self) -> set[str]:
+        """Sources of a compaction whose merged segment is already in place."""
+        try:
+            with open(self.journal) as f:
+                journal = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return set()
+        if not os.path.exists(os.path.join(self.path, journal["target"])):
+            return set()
+        return set(journal["sources"]) - {journal["target"]}
+
+    def scan(self) -> Iterator[Record]:
+        return self.scan_range()
+
+    def scan_range(
+        self, start: Optional[str] = None, end: Optional[str] = None
+    ) -> Iterator[Record]:
+        first = start[:10] if start else None
+        last = end[:10] if end else None
+        for segment in self.segments(first, last):
+            for record in _read_segment(segment.path):
+                if _in_range(record, start, end):
+                    yield record
+
+    def size(self) -> int:
+        total = 0
+        for segment in self.segments():
+            try:
+                total += os.path.getsize(segment.path)
+            except FileNotFoundError:
+                pass
+        return total
+
+    def retain(self, days: int, now: Optional[datetime] = None) -> int:
+        """Drop segments entirely older than ``days``; return how many."""
+        cutoff = ((now or datetime.utcnow()) - timedelta(days=days)).date().isoformat()
+        level = durability()
+        dropped = 0
+        with file_lock(self.path):
+            if os.path.exists(self.journal):
+                self._recover_locked()
+            for segment in self.segments():
+                if segment.last < cutoff:
+                    os.remove(segment.path)
+                    dropped += 1
+            if dropped and level == "full":
+                _fsync_dir(os.path.join(self.path, "."))
+        return dropped
+
+    def compact(self, target_bytes: int, now: Optional[datetime] = None) -> int:
+        """Merge runs of closed segments into files of up to ``target_bytes``.
+
+        Only segments before the current period are touched, so appends keep
+        going to their own file. Returns the number of segments merged away.
+        """
+        today = (now or datetime.utcnow()).date().isoformat()
+        current = today if self.granularity == "day" else f"{today[:7]}-01"
+        level = durability()
+        merged = 0
+        with file_lock(self.path):
+            if os.path.exists(self.journal):
+                self._recover_locked()
+            run: list[Segment] = []
+            run_bytes = 0
+            for segment in self.segments(last=current):
+                size = os.path.getsize(segment.path)
+                if segment.last >= current or size >= target_bytes:
+                    # Open or already large: ends the run without joining it.
+                    merged += self._merge_locked(run, level)
+                    run, run_bytes = [], 0
+                    continue
+                if run_bytes + size > target_bytes:
+                    merged += self._merge_locked(run, level)
+                    run, run_bytes = [], 0
+                run.append(segment)
+                run_bytes += size
+            merged += self._merge_locked(run, level)
+        return merged
+
+    def _merge_locked(self, run: list[Segment], level: str) -> int:
+        if len(run) < 2:
+            return 0
+        first = min(s.first for s in run)
+        last = max(s.last for s in run)
+        target = f"{first}--{last}.jsonl"
+        target_path = os.path.join(self.path, target)
+        tmp = target_path + ".tmp"
+        with open(tmp, "wb") as out:
+            for segment in run:
+                with open(segment.path, "rb") as f:
+                    data = f.read()
+                if data and not data.endswith(b"\n"):
+                    data += b"\n"  # keep a torn line from swallowing the next
+                out.write(data)
+            if level != "none":
+                out.flush()
+                os.fsync(out.fileno())
+        journal = {"target": target, "sources": [os.path.basename(s.path) for s in run]}
+        with open(self.journal, "w") as f:
+            json.dump(journal, f)
+            if level != "none":
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(tmp, target_path)
+        if level == "full":
+            _fsync_dir(target_path)
+        self._recover_locked()
+        return len(run) - 1
+
+    def _recover_locked(self) -> None:
+        """Finish (or roll back) a compaction interrupted by a crash."""
+        try:
+            with open(self.journal) as f:
+                journal = json.load(f)
+        except ValueError:
+            journal = None  # torn before the merged file was swapped in
+        if journal is not None:
+            target = os.path.join(self.path, journal["target"])
+            if os.path.exists(target):
+                for name in journal["sources"]:
+                    if name != journal["target"]:
+                        try:
+                            os.remove(os.path.join(self.path, name))
+                        except FileNotFoundError:
+                            pass
+            else:
+                try:
+                    os.remove(target + ".tmp")
+                except FileNotFoundError:
+                    pass
+        os.remove(self.journal)
+
+    def _prepare_storage(self, level: str) -> None:
+        if not os.path.isdir(self.path):
+            os.makedirs(self.path, exist_ok=True)
+            if level == "full":
+                _fsync_dir(self.path)
+
+
+def _read_segment(path: str) -> Iterator[Record]:
+    try:
+        f = open(path, "rb")
+    except FileNotFoundError:
+        return  # dropped by retention or compaction meanwhile
+    with f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            return
+        # Mapping skips the copies a buffered reader makes; lines past
+        # ``size`` (appended meanwhile) are left for the next scan.
+        with mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ) as mapped:
+            yield from _decode_lines(iter(mapped.readline, b""))
+
+
+# Seconds a connection waits for another process's write lock.
+SQLITE_BUSY_TIMEOUT = 30.0
+SQLITE_SYNCHRONOUS = {"none": "NORMAL", "fsync": "FULL", "full": "FULL"}
+# Record fields copied into indexed columns; the record itself is kept whole
+# as JSON in ``data``.
+SQLITE_INDEXED = ("timestamp", "affiliate", "utm_source")
+_SQL_NAME = re.compile(r"^[a-z_][a-z0-9_]*$")
+
+
+def sqlite_pool_size() -> int:
+    return int(os.getenv("SQLITE_POOL_SIZE", "4"))
+
+
+def _connect(path: str) -> sqlite3.Connection:
+    """Open ``path`` in WAL mode with its schema in place."""
+    table = _store_name(path)
+    if not _SQL_NAME.match(table):
+        raise ValueError(f"not a usable table name: {table!r}")
+    # Autocommit mode: writes open their transactions explicitly. The
+    # connection moves between threads through the pool, never shared.
+    conn = sqlite3.connect(
+        path,
+        timeout=SQLITE_BUSY_TIMEOUT,
+        isolation_level=None,
+        check_same_thread=False,
+    )
+    try:
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {table} (id INTEGER PRIMARY KEY, "
+            "timestamp TEXT, affiliate TEXT, utm_source TEXT, data TEXT NOT NULL)"
+        )
+        for column in SQLITE_INDEXED:
+            conn.execute(
+                f"CREATE INDEX IF NOT EXISTS idx_{table}_{column} "
+                f"ON {table}({column})"
+            )
+    except BaseException:
+        conn.close()
+        raise
+    return conn
+
+
+class ConnectionPool:
+    """Connections to one database, reused across requests in this process.
+
+    Each connection serves one caller at a time; a caller finding none idle
+    opens another, and at most ``size`` are kept once returned.
+    """
+
+    def __init__(self, path: str, size: int):
+        self.path = path
+        self.size = size
+        self._idle: list[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        with self._lock:
+            conn = self._idle.pop() if self._idle else None
+        if conn is None:
+            conn = _connect(self.path)
+            SQLITE_CONNECTIONS.inc(_store_name(self.path))
+        try:
+            yield conn
+        except BaseException:
+            self._close(conn)  # it may be mid-transaction
+            raise
+        with self._lock:
+            if len(self._idle) < self.size:
+                self._idle.append(conn)
+                return
+        self._close(conn)
+
+    def _close(self, conn: sqlite3.Connection) -> None:
+        conn.close()
+        SQLITE_CONNECTIONS.dec(_store_name(self.path))
+
+
+# Per process: connections must not cross a fork.
+_POOLS: dict[tuple[int, str], ConnectionPool] = {}
+_POOLS_LOCK = threading.Lock()
+
+
+def _pool(path: str) -> ConnectionPool:
+    key = (os.getpid(), path)
+    with _POOLS_LOCK:
+        pool = _POOLS.get(key)
+        if pool is None:
+            pool = _POOLS[key] = ConnectionPool(path, sqlite_pool_size())
+        return pool
+
+
+class SqliteStore(_FoldingStore):
+    """An SQLite database in WAL mode, one table named after the kind.
+
+    Each record is kept as JSON in ``data``, with ``timestamp``,
+    ``affiliate`` and ``utm_source`` copied into indexed columns so range
+    and equality reads use an index rather than a full scan. A batch is
+    inserted in one transaction by one prepared statement. Writers still
+    take the store's ``flock`` (SQLite's own locking would do for the data,
+    but write hooks rely on it); readers take none and see the last
+    committed batch. WAL needs shared memory between the processes using
+    the database, which containers on one host sharing ``app_data`` have
+    and network filesystems do not. ``legacy`` is a JSONL store folded in
+    on the first write.
+    """
+
+    def __init__(self, path: str, legacy: Optional[JsonlStore] = None):
+        super().__init__(path, legacy)
+        self.table = _store_name(path)
+        self.pool = _pool(path)
+        self._insert = (
+            f"INSERT INTO {self.table} (timestamp, affiliate, utm_source, data) "
+            "VALUES (?, ?, ?, ?)"
+        )
+
+    def extend(self, records: Iterable[Record]) -> None:
+        records = list(records)
+        if not records:
+            return
+        level = durability()
+        timer = PERSIST_WRITE.time(self.table, "sqlite")
+        with span("persist"), timer, file_lock(self.path):
+            self._prepare_storage(level)
+            if self._legacy_pending():
+                self._migrate_locked(level)
+            self._append_locked(records, level)
+            self._written(records)
+
+    def _prepare_storage(self, level: str) -> None:
+        if os.path.exists(self.path):
+            return
+        with self.pool.connection():
+            pass  # creates the database and its schema
+        if level == "full":
+            _fsync_dir(self.path)
+
+    def _append_locked(self, records: list[Record], level: str) -> None:
+        rows = [
+            (
+                *(_indexed(record.get(column)) for column in SQLITE_INDEXED),
+                json.dumps(record, separators=(",", ":")),
+            )
+            for record in records
+        ]
+        with self.pool.connection() as conn:
+            conn.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS[level]}")
+            conn.execute("BEGIN IMMEDIATE")
+            conn.executemany(self._insert, rows)
+            conn.execute("COMMIT")
+
+    def _query(self, where: str = "", params: tuple = ()) -> Iterator[Record]:
+        if not os.path.exists(self.path):
+            return
+        sql = f"SELECT data FROM {self.table}{where} ORDER BY id"
+        with self.pool.connection() as conn:
+            for (data,) in conn.execute(sql, params):
+                yield json.loads(data)
+
+    def scan(self) -> Iterator[Record]:
+        return self._query()
+
+    def scan_range(
+        self, start: Optional[str] = None, end: Optional[str] = None
+    ) -> Iterator[Record]:
+        return self.select(start, end)
+
+    def select(
+        self, start: Optional[str] = None, end: Optional[str] = None, **fields
+    ) -> Iterator[Record]:
+        conditions, params = [], []
+        if start is not None:
+            conditions.append("timestamp >= ?")
+            params.append(start)
+        if end is not None:
+            conditions.append("timestamp < ?")
+            params.append(end)
+        rest = {}
+        for name, value in fields.items():
+            if value is None:
+                continue
+            if name in SQLITE_INDEXED and isinstance(value, str):
+                conditions.append(f"{name} = ?")
+                params.append(value)
+            else:
+                rest[name] = value
+        where = " WHERE " + " AND ".join(conditions) if conditions else ""
+        for record in self._query(where, tuple(params)):
+            if all(record.get(name) == value for name, value in rest.items()):
+                yield record
+
+    def size(self) -> int:
+        total = 0
+        for path in (self.path, self.path + "-wal"):
+            try:
+                total += os.path.getsize(path)
+            except FileNotFoundError:
+                pass
+        return total
+
+
+def _indexed(value: Any) -> Optional[str]:
+    # Only strings are comparable the way records are filtered in Python.
+    return value if isinstance(value, str) else None
+
+
+def get_store(kind: str) -> RecordStore:
+    """Return the configured store for ``kind`` ("leads" or "tracks")."""
+    backend = os.getenv("PERSIST_BACKEND", "jsonl").strip().lower()
+    if backend == "jsonl":
+        return JsonlStore(data_file(f"{kind}.jsonl"), data_file(f"{kind}.json"))
+    if backend == "json":
+        return JsonArrayStore(data_file(f"{kind}.json"))
+    if backend == "segments":
+        return SegmentedStore(
+            data_file(kind),
+            JsonlStore(data_file(f"{kind}.jsonl"), data_file(f"{kind}.json")),
+            segment_granularity(),
+        )
+    if backend == "sqlite":
+        return SqliteStore(
+            data_file(f"{kind}.sqlite3"),
+            JsonlStore(data_file(f"{kind}.jsonl"), data_file(f"{kind}.json")),
+        )
+    raise ValueError(f"Unknown PERSIST_BACKEND {backend!r}")
+
+
+@REGISTRY.collector
+def _collect_store_sizes() -> None:
+    for kind in ("leads", "tracks"):
+        store = get_store(kind)
+        STORE_BYTES.set(store.size(), kind)
+        if isinstance(store, SegmentedStore):
+            STORE_SEGMENTS.set(len(store.segments()), kind)
+
+
+def migrate(kinds: Iterable[str] = ("leads", "tracks")) -> dict[str, int]:
+    """Convert legacy files under ``PERSIST_DIR`` to the configured store
+    (JSON Lines unless ``PERSIST_BACKEND`` is ``segments`` or ``sqlite``)."""
+    moved = {}
+    for kind in kinds:
+        store = get_store(kind)
+        if not isinstance(store, _FoldingStore):
+            store = JsonlStore(data_file(f"{kind}.jsonl"), data_file(f"{kind}.json"))
+        moved[kind] = store.migrate()
+    return moved
+
+
+def _segmented(kind: str) -> SegmentedStore:
+    store = get_store(kind)
+    if not isinstance(store, SegmentedStore):
+        raise SystemExit("this command needs PERSIST_BACKEND=segments")
+    return store
+
+
+def retain(kinds: Iterable[str] = ("leads", "tracks")) -> dict[str, int]:
+    """Apply each kind's retention; return segments dropped."""
+    dropped = {}
+    for kind in kinds:
+        days = retention_days(kind)
+        dropped[kind] = 0 if days is None else _segmented(kind).retain(days)
+    return dropped
+
+
+def compact(
+    target_bytes: int, kinds: Iterable[str] = ("leads", "tracks")
+) -> dict[str, int]:
+    """Merge small closed segments; return segments merged away."""
+    return {kind: _segmented(kind).compact(target_bytes) for kind in kinds}
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m api.storage")
+    sub = parser.add_subparsers(dest="command", required=True)
+    mig = sub.add_parser("migrate", help="fold legacy files into the store")
+    ret = sub.add_parser("retain", help="drop segments past their retention")
+    com = sub.add_parser("compact", help="merge small closed segments")
+    com.add_argument(
+        "--target-bytes",
+        type=int,
+        default=int(os.getenv("PERSIST_COMPACT_BYTES", str(16 * 2**20))),
+        help="largest merged segment (default PERSIST_COMPACT_BYTES or 16 MiB)",
+    )
+    mig.add_argument(
+        "--backend",
+        choices=("jsonl", "segments", "sqlite"),
+        help="store to migrate into (defaults to PERSIST_BACKEND)",
+    )
+    for command in (mig, ret, com):
+        command.add_argument("--dir", help="data directory (defaults to PERSIST_DIR)")
+    args = parser.parse_args(argv)
+    if args.dir:
+        os.environ["PERSIST_DIR"] = args.dir
+    if getattr(args, "backend", None):
+        os.environ["PERSIST_BACKEND"] = args.backend
+    if args.command == "migrate":
+        for kind, count in migrate().items():
+            print(f"{kind}: migrated {count} record(s)")
+    elif args.command == "retain":
+        for kind, count in retain().items():
+            print(f"{kind}: dropped {count} segment(s)")
+    else:
+        for kind, count in compact(args.target_bytes).items():
+            print(f"{kind}: merged {count} segment(s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""Warmup steps that a fresh worker runs before ``/api/ready`` reports ready.
+
+``/api/health`` answers as soon as the app serves requests. A new worker,
+though, still has cold code paths (the numpy kernels are imported on first
+use, the serializers and compressors have not run), unopened stores and an
+empty quote cache. Its first requests pay for all of that. Steps registered
+with :meth:`Warmup.step` do this work up front, in registration order, on a
+background thread started by the app's lifespan, and ``/api/ready`` answers
+``503`` until they have finished. ``WARMUP_STEPS`` picks the steps to run as
+a comma-separated list (default: all; empty for none).
+
+A step runs once per process, and a step that completed before a fork is not
+repeated in the child. ``python -m api.serve`` warms its parent that way, so
+each forked worker is ready as soon as its lifespan has started.
+"""
+
+import logging
+import os
+import threading
+import time
+from collections.abc import Callable
+from typing import Optional
+
+from .metrics import REGISTRY
+
+log = logging.getLogger(__name__)
+
+WARMUP_SECONDS = REGISTRY.gauge(
+    "warmup_seconds",
+    "Time each warmup step took in the scraped worker.",
+    ("step",),
+    local=True,
+)
+WORKERS_READY = REGISTRY.gauge(
+    "workers_ready", "Workers that have warmed up and report ready."
+)
+
+
+class Warmup:
+    def __init__(self):
+        self.steps: dict[str, Callable[[], object]] = {}
+        self.done: dict[str, float] = {}  # step -> seconds it took
+        self.failed: Optional[tuple[str, str]] = None  # (step, error)
+        self.ready = False
+        self._lock = threading.Lock()
+
+    def step(self, name: str) -> Callable:
+        """Register the decorated function as warmup step ``name``."""
+
+        def register(fn: Callable[[], object]) -> Callable[[], object]:
+            self.steps[name] = fn
+            return fn
+
+        return register
+
+    def selected(self) -> list[str]:
+        """The steps named by ``WARMUP_STEPS``, in registration order."""
+        value = os.getenv("WARMUP_STEPS")
+        if value is None:
+            return list(self.steps)
+        names = {n.strip() for n in value.split(",") if n.strip()}
+        unknown = names - set(self.steps)
+        if unknown:
+            raise ValueError(f"unknown WARMUP_STEPS: {', '.join(sorted(unknown))}")
+        return [name for name in self.steps if name in names]
+
+    def run(self) -> dict[str, float]:
+        """Run the selected steps not done yet and report ready; return how
+        long each step took. A failing step stops the warmup: the worker then
+        stays unready."""
+        with self._lock:
+            name = "WARMUP_STEPS"
+            try:
+                for name in self.selected():
+                    if name in self.done:
+                        continue
+                    start = time.perf_counter()
+                    self.steps[name]()
+                    self.done[name] = time.perf_counter() - start
+                    WARMUP_SECONDS.set(self.done[name], name)
+            except Exception as exc:
+                self.failed = (name, f"{type(exc).__name__}: {exc}")
+                log.exception("warmup step %r failed", name)
+                return dict(self.done)
+            self.failed = None
+            self.ready = True
+            WORKERS_READY.set(1)
+            return dict(self.done)
+
+    def start(self) -> threading.Thread:
+        """Run the warmup on a background thread."""
+        self.reset()
+        thread = threading.Thread(target=self.run, name="warmup", daemon=True)
+        thread.start()
+        return thread
+
+    def reset(self) -> None:
+        """Report unready until the next :meth:`run`; completed steps stay
+        done."""
+        self.ready = False
+        self.failed = None
+        WORKERS_READY.set(0)
+
+    def status(self) -> dict:
+        if self.ready:
+            state = "ready"
+        elif self.failed is not None:
+            state = "failed"
+        else:
+            state = "warming"
+        body = {
+            "status": state,
+            "steps": {name: round(s, 4) for name, s in self.done.items()},
+        }
+        if self.failed is not None:
+            body["failed"] = {"step": self.failed[0], "error": self.failed[1]}
+        return body
+
+
+WARMUP = Warmup()
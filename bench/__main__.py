@@ -0,0 +1,87 @@
+"""Run the benchmark suite and gate on regressions against a baseline.
+
+    python -m bench [--quick] [--output bench-results.json]
+                    [--baseline bench/baseline.json] [--threshold 0.5]
+                    [--update-baseline]
+
+Exits non-zero when a benchmark is slower than its baseline by more than
+``--threshold`` (``BENCH_THRESHOLD``, default 0.5 = 50%) or when a
+baseline benchmark was not run. Costs are compared relative to a
+calibration workload timed alongside each benchmark (see ``bench.harness``),
+which absorbs most machine-speed drift; still, refresh the baseline with
+``--update-baseline`` (``make bench-baseline``) when the CI machine type or
+Python version changes.
+"""
+
+import argparse
+import os
+import sys
+
+from . import harness, persistence, quote, serialization, startup
+
+BASELINE = os.path.join(os.path.dirname(__file__), "baseline.json")
+
+
+def run(quick: bool = False) -> harness.Results:
+    results: harness.Results = {}
+    if quick:
+        results.update(quote.measure(terms=(60, 360), aprs=(6.9,), number=10))
+        results.update(persistence.measure(records=(0, 10_000), number=20))
+        results.update(serialization.results(terms=[60], number=5))
+        results.update(startup.measure(repeat=1))
+    else:
+        results.update(quote.measure())
+        results.update(persistence.measure())
+        results.update(serialization.results(terms=[12, 60, 240]))
+        results.update(startup.measure())
+    return results
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m bench")
+    parser.add_argument("--quick", action="store_true", help="small smoke run")
+    parser.add_argument("--output", help="write results JSON here")
+    parser.add_argument("--baseline", default=BASELINE)
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=float(os.getenv("BENCH_THRESHOLD", "0.5")),
+        help="allowed slowdown as a fraction (default 0.5)",
+    )
+    parser.add_argument(
+        "--update-baseline",
+        action="store_true",
+        help="store these results as the new baseline instead of comparing",
+    )
+    args = parser.parse_args(argv)
+
+    results = run(args.quick)
+    if args.output:
+        harness.save(args.output, results)
+    if args.update_baseline:
+        harness.save(args.baseline, results)
+        print(harness.report(results, None))
+        print(f"baseline written to {args.baseline}")
+        return 0
+
+    baseline = harness.load(args.baseline) if os.path.exists(args.baseline) else {}
+    print(harness.report(results, baseline))
+    if not baseline:
+        print(f"no baseline at {args.baseline}; nothing to compare")
+        return 0
+    regressions, missing = harness.compare(results, baseline, args.threshold)
+    if args.quick:
+        missing = []  # a quick run covers a subset of the baseline
+    for change in regressions:
+        print(
+            f"REGRESSION {change.name}: {change.baseline.us:.2f} -> "
+            f"{change.current.us:.2f} µs, {change.ratio - 1:+.1%} calibrated "
+            f"(limit {args.threshold:+.0%})"
+        )
+    for name in missing:
+        print(f"MISSING {name}: in the baseline but not measured")
+    return 1 if regressions or missing else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
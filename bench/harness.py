@@ -0,0 +1,141 @@
+"""Timing, result files and baseline comparison for the benchmark suite.
+
+Every benchmark reports microseconds per operation (lower is better) under a
+dotted name such as ``quote.term=60.apr=6.9``. ``python -m bench`` collects
+them into one JSON document and compares it with ``bench/baseline.json``.
+
+Wall-clock timings drift with CPU frequency, noisy neighbours and the CI
+runner, so each benchmark is timed back to back with a fixed pure-Python
+calibration workload and also reported relative to it. The regression gate
+compares those relative costs; the microseconds are for humans.
+"""
+
+import json
+import os
+import platform
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from typing import Callable, NamedTuple, Optional
+
+
+class Timing(NamedTuple):
+    us: float  # microseconds per call
+    relative: float  # cost in units of the calibration workload
+
+
+Results = dict[str, Timing]
+
+
+def _time(fn: Callable[[], object], number: int) -> float:
+    start = time.perf_counter()
+    for _ in range(number):
+        fn()
+    return time.perf_counter() - start
+
+
+def _calibration_workload() -> int:
+    total = 0
+    for i in range(2000):
+        total += (i * 7) % 13 // 3
+    return total
+
+
+def best_of(
+    fn: Callable[[], object], number: int, repeat: int = 5, min_time: float = 0.02
+) -> Timing:
+    """Time ``fn``: the fastest of ``repeat`` runs, which filters out scheduler
+    noise. Like ``timeit``'s autorange, each run makes at least ``number``
+    calls and at least ``min_time`` seconds' worth. Every run is followed by
+    a calibration run of similar length.
+    """
+    fn()  # warm up caches and lazy imports
+    elapsed = _time(fn, number)
+    while elapsed < min_time:
+        number *= 2
+        elapsed = _time(fn, number)
+    cal_number = max(1, round(elapsed / _time(_calibration_workload, 1)))
+    best = calibration = float("inf")
+    for _ in range(repeat):
+        best = min(best, _time(fn, number) / number)
+        cal = _time(_calibration_workload, cal_number) / cal_number
+        calibration = min(calibration, cal)
+    return Timing(round(best * 1e6, 2), round(best / calibration, 4))
+
+
+@contextmanager
+def env(**values: str) -> Iterator[None]:
+    """Temporarily set environment variables."""
+    saved = {name: os.environ.get(name) for name in values}
+    os.environ.update(values)
+    try:
+        yield
+    finally:
+        for name, value in saved.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+
+
+def document(results: Results) -> dict:
+    return {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "results": {name: t._asdict() for name, t in sorted(results.items())},
+    }
+
+
+def load(path: str) -> Results:
+    with open(path, encoding="utf-8") as fh:
+        data = json.load(fh)["results"]
+    return {name: Timing(**values) for name, values in data.items()}
+
+
+def save(path: str, results: Results) -> None:
+    with open(path, "w", encoding="utf-8") as fh:
+        json.dump(document(results), fh, indent=2)
+        fh.write("\n")
+
+
+class Change(NamedTuple):
+    name: str
+    baseline: Timing
+    current: Timing
+
+    @property
+    def ratio(self) -> float:
+        """Calibrated cost relative to the baseline (1.25 = 25% slower)."""
+        if not self.baseline.relative:
+            return 1.0
+        return self.current.relative / self.baseline.relative
+
+
+def compare(
+    results: Results, baseline: Results, threshold: float
+) -> tuple[list[Change], list[str]]:
+    """Return benchmarks slower than ``baseline`` by more than ``threshold``
+    (0.25 means 25%) and baseline names missing from ``results``."""
+    changes = [
+        Change(name, baseline[name], current)
+        for name, current in sorted(results.items())
+        if name in baseline
+    ]
+    regressions = [c for c in changes if c.ratio > 1 + threshold]
+    missing = sorted(set(baseline) - set(results))
+    return regressions, missing
+
+
+def report(results: Results, baseline: Optional[Results]) -> str:
+    """Tabulate ``results`` and their calibrated change from ``baseline``."""
+    baseline = baseline or {}
+    width = max(map(len, results), default=0)
+    lines = [f"{'benchmark':<{width}} {'µs':>10} {'baseline µs':>12} {'change':>8}"]
+    for name, current in sorted(results.items()):
+        if name in baseline:
+            change = Change(name, baseline[name], current).ratio - 1
+            base, delta = f"{baseline[name].us:.2f}", f"{change:+.1%}"
+        else:
+            base = delta = "-"
+        lines.append(f"{name:<{width}} {current.us:>10.2f} {base:>12} {delta:>8}")
+    return "\n".join(lines)
@@ -0,0 +1,501 @@
+"""Concurrent end-to-end load with a lead/track integrity check.
+
+Drives a mix of ``POST /api/quote`` (varied prices, APRs and terms),
+``/api/leads`` and ``/api/track`` from ``--concurrency`` concurrent clients,
+then reports throughput and p50/p95/p99 latency per route. Targets:
+
+- the in-process ASGI app (default), in a scratch ``PERSIST_DIR``;
+  ``--processes N`` runs N copies of the app and the load in forked
+  processes sharing that directory, as workers share ``app_data``;
+- ``--workers N``: ``uvicorn --workers N`` on a local port, same scratch dir;
+- ``--url``: a running stack, e.g. a color before cutover.
+
+Every write carries a run id (``affiliate=load-<run>``) and a unique key, so
+afterwards the stored leads and tracks of the run can be compared with the
+writes the API acknowledged. Each acknowledged write must be stored exactly
+once, with the fields that were sent. Locally the store is read directly;
+against ``--url`` it is read through ``/api/export`` with ``--export-token``.
+Writes the API did not acknowledge (timeouts, ``429``/``503``) may or may not
+be stored and are only reported.
+
+    python -m bench.load [--requests 2000] [--concurrency 32] [--processes 4]
+    python -m bench.load --workers 4 --backend sqlite
+    python -m bench.load --url http://localhost --export-token "$EXPORT_TOKEN"
+
+Exits non-zero when the integrity check fails.
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from collections import Counter, defaultdict
+from collections.abc import AsyncIterator, Iterator, Sequence
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, NamedTuple, Optional
+
+import httpx
+
+from .harness import env
+
+ROUTES = ("quote", "lead", "track")
+DEFAULT_MIX = {"quote": 8, "track": 3, "lead": 1}
+TERMS = (12, 24, 36, 48, 60, 72, 84, 96, 120, 180, 240, 360)
+VEHICLE_TYPES = ("auto", "rv", "motorcycle", "jet_ski")
+# The field that tells a run's records apart, per kind.
+KEYS = {"leads": "email", "tracks": "utm_content"}
+
+
+class Write(NamedTuple):
+    kind: str
+    key: str
+    record: dict[str, Any]  # the fields sent
+
+
+class Stats:
+    """Latencies, status counts and acknowledged writes of a load run."""
+
+    def __init__(self):
+        self.latencies: dict[str, list[float]] = defaultdict(list)
+        self.statuses: dict[str, Counter] = defaultdict(Counter)
+        self.writes: list[Write] = []
+        self.elapsed = 0.0
+
+    def merge(self, other: "Stats") -> None:
+        for route, values in other.latencies.items():
+            self.latencies[route].extend(values)
+        for route, counts in other.statuses.items():
+            self.statuses[route].update(counts)
+        self.writes.extend(other.writes)
+        self.elapsed = max(self.elapsed, other.elapsed)
+
+
+def percentile(values: Sequence[float], q: float) -> float:
+    """The nearest-rank ``q``-th percentile of ``values``."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * q // 100))
+    return ordered[int(rank) - 1]
+
+
+def parse_mix(value: str) -> dict[str, int]:
+    """``quote=8,track=3,lead=1`` as route weights."""
+    mix = {}
+    for part in value.split(","):
+        route, _, weight = part.partition("=")
+        if route.strip() not in ROUTES or not weight.strip().isdigit():
+            raise argparse.ArgumentTypeError(f"not a route=weight list: {value!r}")
+        mix[route.strip()] = int(weight)
+    if not any(mix.values()):
+        raise argparse.ArgumentTypeError("the mix needs a positive weight")
+    return mix
+
+
+def request(
+    n: int, mix: dict[str, int], run_id: str, seed: int
+) -> tuple[str, str, dict, Optional[Write]]:
+    """Request number ``n`` of a run: ``(route, path, body, write)``."""
+    rng = random.Random(f"{seed}-{n}")
+    route = rng.choices(list(mix), weights=list(mix.values()))[0]
+    if route == "quote":
+        price = rng.randrange(5_000, 100_000, 500)
+        body = {
+            "vehicle_price": price,
+            "down_payment": rng.randrange(0, price // 5 + 1, 250),
+            "apr": round(rng.uniform(0, 15), 1),
+            "term_months": rng.choice(TERMS),
+        }
+        return route, "/api/quote", body, None
+    affiliate = f"load-{run_id}"
+    if route == "lead":
+        body = {
+            "name": f"Load Test {n}",
+            "email": f"load-{run_id}-{n}@example.com",
+            "phone": f"+1555{n % 10_000_000:07d}",
+            "vehicle_type": rng.choice(VEHICLE_TYPES),
+            "price": float(rng.randrange(5_000, 100_000, 500)),
+            "affiliate": affiliate,
+            "utm_source": "load",
+        }
+        return route, "/api/leads", body, Write("leads", body["email"], body)
+    body = {
+        "affiliate": affiliate,
+        "utm_source": "load",
+        "utm_campaign": run_id,
+        "utm_content": str(n),
+    }
+    return route, "/api/track", body, Write("tracks", body["utm_content"], body)
+
+
+async def drive(
+    client: httpx.AsyncClient,
+    numbers: Iterator[int],
+    concurrency: int,
+    mix: dict[str, int],
+    run_id: str,
+    seed: int,
+) -> Stats:
+    """Send request ``n`` for every ``n`` in ``numbers`` from ``concurrency``
+    concurrent clients."""
+    stats = Stats()
+
+    async def worker():
+        for n in numbers:  # shared, so each number is sent once
+            route, path, body, write = request(n, mix, run_id, seed)
+            start = time.perf_counter()
+            try:
+                resp = await client.post(path, json=body)
+            except httpx.HTTPError as exc:
+                stats.statuses[route][type(exc).__name__] += 1
+                continue
+            finally:
+                stats.latencies[route].append(time.perf_counter() - start)
+            stats.statuses[route][str(resp.status_code)] += 1
+            if write is not None and resp.status_code == 200:
+                stats.writes.append(write)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    stats.elapsed = time.perf_counter() - start
+    return stats
+
+
+@asynccontextmanager
+async def connect(url: Optional[str], concurrency: int) -> AsyncIterator:
+    """A client for ``url``, or for the in-process app when it is ``None``."""
+    if url is None:
+        from api.app import app
+
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://load") as c:
+            yield c
+        return
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(base_url=url, timeout=30, limits=limits) as c:
+        yield c
+
+
+async def _load(
+    url: Optional[str],
+    numbers: Iterator[int],
+    concurrency: int,
+    mix: dict[str, int],
+    run_id: str,
+    seed: int,
+) -> Stats:
+    async with connect(url, concurrency) as client:
+        return await drive(client, numbers, concurrency, mix, run_id, seed)
+
+
+def _child(conn, url, numbers, concurrency, mix, run_id, seed) -> None:
+    stats = asyncio.run(_load(url, iter(numbers), concurrency, mix, run_id, seed))
+    conn.send(stats)
+    conn.close()
+
+
+def run(
+    url: Optional[str],
+    requests: int,
+    concurrency: int,
+    mix: dict[str, int],
+    run_id: str,
+    seed: int = 0,
+    processes: int = 1,
+) -> Stats:
+    """Send ``requests`` requests, split over ``processes`` forked processes
+    of ``concurrency`` clients each."""
+    if processes <= 1:
+        return asyncio.run(
+            _load(url, iter(range(requests)), concurrency, mix, run_id, seed)
+        )
+    ctx = multiprocessing.get_context("fork")
+    children = []
+    for p in range(processes):
+        numbers = range(p, requests, processes)
+        receiver, sender = ctx.Pipe(duplex=False)
+        args = (sender, url, numbers, concurrency, mix, run_id, seed)
+        child = ctx.Process(target=_child, args=args)
+        child.start()
+        children.append((child, receiver))
+    stats = Stats()
+    for child, receiver in children:
+        stats.merge(receiver.recv())
+        child.join()
+    return stats
+
+
+class Integrity(NamedTuple):
+    acknowledged: int
+    stored: int
+    missing: list[str]
+    duplicated: list[str]
+    corrupted: list[str]
+    unacknowledged: list[str]  # stored, though the API did not say so
+
+    @property
+    def ok(self) -> bool:
+        return not (self.missing or self.duplicated or self.corrupted)
+
+
+def verify(writes: Sequence[Write], stored: Sequence[dict]) -> Integrity:
+    """Compare one kind's acknowledged ``writes`` with its ``stored`` records."""
+    field = KEYS[writes[0].kind] if writes else None
+    by_key: dict[str, list[dict]] = defaultdict(list)
+    for record in stored:
+        by_key[str(record.get(field or "", ""))].append(record)
+    missing, duplicated, corrupted = [], [], []
+    for write in writes:
+        found = by_key.get(write.key, [])
+        if not found:
+            missing.append(write.key)
+            continue
+        if len(found) > 1:
+            duplicated.append(write.key)
+        record = found[0]
+        sent = all(record.get(name) == value for name, value in write.record.items())
+        if not sent or not isinstance(record.get("timestamp"), str):
+            corrupted.append(write.key)
+    acknowledged = {w.key for w in writes}
+    extra = sorted(k for k in by_key if k not in acknowledged)
+    return Integrity(len(writes), len(stored), missing, duplicated, corrupted, extra)
+
+
+def stored_locally(kind: str, run_id: str) -> list[dict]:
+    """The run's records, read from the configured store under PERSIST_DIR."""
+    from api.storage import get_store
+
+    store = get_store(kind)
+    migrate = getattr(store, "migrate", None)
+    if migrate is not None:
+        migrate()
+    return list(store.select(affiliate=f"load-{run_id}"))
+
+
+def stored_remotely(url: str, token: str, kind: str, run_id: str) -> list[dict]:
+    """The run's records, read through the stack's export endpoint."""
+    resp = httpx.get(
+        f"{url}/api/export/{kind}",
+        params={"affiliate": f"load-{run_id}"},
+        headers={"Authorization": f"Bearer {token}"},
+        timeout=60,
+    )
+    resp.raise_for_status()
+    return [json.loads(line) for line in resp.text.splitlines() if line]
+
+
+def check(stats: Stats, read, settle: float = 2.0) -> dict[str, Integrity]:
+    """Verify each kind, re-reading for up to ``settle`` seconds while writes
+    acknowledged before they were stored (write-behind) arrive."""
+    deadline = time.monotonic() + settle
+    while True:
+        results = {
+            kind: verify([w for w in stats.writes if w.kind == kind], read(kind))
+            for kind in KEYS
+        }
+        if all(r.ok for r in results.values()) or time.monotonic() >= deadline:
+            return results
+        time.sleep(0.2)
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@contextmanager
+def serve(workers: int, timeout: float = 30.0) -> Iterator[str]:
+    """Run ``uvicorn api.app:app --workers N`` locally; yield its URL."""
+    port = _free_port()
+    server = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            "api.app:app",
+            "--host",
+            "127.0.0.1",
+            "--port",
+            str(port),
+            "--workers",
+            str(workers),
+            "--log-level",
+            "warning",
+        ]
+    )
+    url = f"http://127.0.0.1:{port}"
+    try:
+        deadline = time.monotonic() + timeout
+        while True:
+            if server.poll() is not None:
+                raise SystemExit(f"uvicorn exited with status {server.returncode}")
+            try:
+                if httpx.get(f"{url}/api/ready", timeout=1).status_code == 200:
+                    break
+            except httpx.HTTPError:
+                pass
+            if time.monotonic() > deadline:
+                raise SystemExit("uvicorn did not become ready")
+            time.sleep(0.2)
+        yield url
+    finally:
+        server.terminate()
+        server.wait(timeout)
+
+
+def report(stats: Stats) -> str:
+    """Tabulate throughput and latency percentiles (ms) per route."""
+    lines = [
+        f"{'route':<8} {'requests':>9} {'ok':>8} {'req/s':>9} "
+        f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}  other statuses"
+    ]
+    elapsed = stats.elapsed or float("inf")
+    for route in ROUTES:
+        values = stats.latencies.get(route)
+        if not values:
+            continue
+        counts = stats.statuses[route]
+        ok = counts.get("200", 0)
+        other = ", ".join(f"{s}: {n}" for s, n in sorted(counts.items()) if s != "200")
+        p50, p95, p99 = (percentile(values, q) * 1000 for q in (50, 95, 99))
+        lines.append(
+            f"{route:<8} {len(values):>9} {ok:>8} {len(values) / elapsed:>9.1f} "
+            f"{p50:>8.2f} {p95:>8.2f} {p99:>8.2f}  {other or '-'}"
+        )
+    total = sum(len(v) for v in stats.latencies.values())
+    lines.append(
+        f"{total} requests in {stats.elapsed:.2f}s: {total / elapsed:.1f} req/s"
+    )
+    return "\n".join(lines)
+
+
+def integrity_report(results: dict[str, Integrity]) -> str:
+    lines = []
+    for kind, r in results.items():
+        status = "ok" if r.ok else "FAILED"
+        lines.append(
+            f"{kind}: {status}: {r.acknowledged} acknowledged, {r.stored} stored, "
+            f"{len(r.missing)} missing, {len(r.duplicated)} duplicated, "
+            f"{len(r.corrupted)} corrupted, {len(r.unacknowledged)} unacknowledged"
+        )
+        for label, keys in (
+            ("missing", r.missing),
+            ("duplicated", r.duplicated),
+            ("corrupted", r.corrupted),
+        ):
+            if keys:
+                lines.append(f"  {label}: {', '.join(keys[:10])}")
+    return "\n".join(lines)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m bench.load")
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument("--url", help="a running stack (default: in-process app)")
+    target.add_argument(
+        "--workers", type=int, help="serve with uvicorn --workers N locally"
+    )
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=32, help="per process")
+    parser.add_argument(
+        "--processes", type=int, default=1, help="forked load processes"
+    )
+    parser.add_argument(
+        "--mix",
+        type=parse_mix,
+        default=DEFAULT_MIX,
+        help="route weights (default quote=8,track=3,lead=1)",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--backend", help="PERSIST_BACKEND for local targets (default: as set)"
+    )
+    parser.add_argument(
+        "--export-token",
+        default=os.getenv("EXPORT_TOKEN"),
+        help="verify a --url target through /api/export (default EXPORT_TOKEN)",
+    )
+    parser.add_argument("--output", help="write the figures as JSON here")
+    args = parser.parse_args(argv)
+    run_id = uuid.uuid4().hex[:12]
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        settings = {}
+        if args.url is None:
+            settings["PERSIST_DIR"] = data_dir
+            if args.backend:
+                settings["PERSIST_BACKEND"] = args.backend
+        with env(**settings):
+            if args.workers:
+                with serve(args.workers) as url:
+                    stats = run(
+                        url,
+                        args.requests,
+                        args.concurrency,
+                        args.mix,
+                        run_id,
+                        args.seed,
+                        args.processes,
+                    )
+            else:
+                stats = run(
+                    args.url,
+                    args.requests,
+                    args.concurrency,
+                    args.mix,
+                    run_id,
+                    args.seed,
+                    args.processes,
+                )
+            print(report(stats))
+            if args.url is None:
+                results = check(stats, lambda kind: stored_locally(kind, run_id))
+            elif args.export_token:
+                results = check(
+                    stats,
+                    lambda kind: stored_remotely(
+                        args.url, args.export_token, kind, run_id
+                    ),
+                )
+            else:
+                results = {}
+                print("integrity: skipped (set --export-token to verify a --url)")
+    if results:
+        print(integrity_report(results))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as fh:
+            json.dump(summary(stats, results), fh, indent=2)
+            fh.write("\n")
+    return 0 if all(r.ok for r in results.values()) else 1
+
+
+def summary(stats: Stats, results: dict[str, Integrity]) -> dict:
+    routes = {}
+    for route, values in sorted(stats.latencies.items()):
+        routes[route] = {
+            "requests": len(values),
+            "statuses": dict(stats.statuses[route]),
+            "rps": round(len(values) / stats.elapsed, 1) if stats.elapsed else 0,
+            **{
+                f"p{q}_ms": round(percentile(values, q) * 1000, 3) for q in (50, 95, 99)
+            },
+        }
+    integrity = {kind: {**r._asdict(), "ok": r.ok} for kind, r in results.items()}
+    return {
+        "elapsed": round(stats.elapsed, 3),
+        "routes": routes,
+        "integrity": integrity,
+    }
+
+
+if __name__ == "__main__":
+    sys.exit(main())
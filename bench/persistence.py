@@ -0,0 +1,78 @@
+"""Lead/track write latency as a function of the existing data file size.
+
+Each data file is pre-filled with ``N`` records in a scratch directory, then
+``store_lead``/``store_click`` (the blocking work behind ``create_lead`` and
+``track_click``) are timed on top of it. With the ``json`` backend every write
+rewrites the whole array, so its cost grows with ``N``; with ``jsonl`` (the
+default) it should not.
+
+    python -m bench.persistence [--records 0 10000 100000] [--backend jsonl]
+"""
+
+import argparse
+import json
+import os
+import tempfile
+from collections.abc import Sequence
+
+from api.app import LeadReq, TrackReq, store_click, store_lead
+
+from .harness import Results, best_of, env, report
+
+RECORDS = (0, 10_000, 100_000)
+
+LEAD = {
+    "name": "Jane Doe",
+    "email": "jane@example.com",
+    "phone": "+15551234567",
+    "vehicle_type": "rv",
+    "price": 82000.0,
+    "affiliate": "dealer-42",
+}
+TRACK = {"affiliate": "dealer-42", "utm_source": "google", "utm_medium": "cpc"}
+TIMESTAMP = "2024-01-01T00:00:00.000000"
+
+
+def _prefill(path: str, record: dict, count: int, backend: str) -> None:
+    entry = {**record, "timestamp": TIMESTAMP}
+    with open(path, "w", encoding="utf-8") as fh:
+        if backend == "json":
+            json.dump([entry] * count, fh)
+        else:
+            line = json.dumps(entry, separators=(",", ":")) + "\n"
+            fh.write(line * count)
+
+
+def measure(
+    records: Sequence[int] = RECORDS, backend: str = "jsonl", number: int = 200
+) -> Results:
+    lead, track = LeadReq(**LEAD), TrackReq(**TRACK)
+    writers = {
+        "leads": (LEAD, lambda: store_lead(lead)),
+        "tracks": (TRACK, lambda: store_click(track)),
+    }
+    results = {}
+    for count in records:
+        with tempfile.TemporaryDirectory() as tmp:
+            with env(PERSIST_DIR=tmp, PERSIST_BACKEND=backend):
+                for kind, (record, write) in writers.items():
+                    path = os.path.join(tmp, f"{kind}.{backend}")
+                    _prefill(path, record, count, backend)
+                    # The JSON array backend rewrites the file on every call.
+                    calls = number if backend == "jsonl" else max(1, number // 20)
+                    name = f"persistence.{backend}.{kind}.records={count}"
+                    results[name] = best_of(write, calls)
+    return results
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m bench.persistence")
+    parser.add_argument("--records", type=int, nargs="+", default=list(RECORDS))
+    parser.add_argument("--backend", choices=["jsonl", "json"], default="jsonl")
+    parser.add_argument("--number", type=int, default=200)
+    args = parser.parse_args(argv)
+    print(report(measure(args.records, args.backend, args.number), None))
+
+
+if __name__ == "__main__":
+    main()
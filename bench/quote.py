@@ -0,0 +1,55 @@
+"""Cost of ``quote()`` across term lengths and APRs, with the cache off.
+
+    python -m bench.quote [--terms 12 60 240] [--aprs 0 6.9 19.99]
+"""
+
+import argparse
+from collections.abc import Sequence
+
+import api.app as app_module
+from api.app import QuoteReq, quote
+from api.cache import LRUCache
+
+from .harness import Results, best_of, env, report
+
+TERMS = (12, 36, 60, 84, 180, 240, 360)
+APRS = (0.0, 6.9, 19.99)
+
+
+def measure(
+    terms: Sequence[int] = TERMS, aprs: Sequence[float] = APRS, number: int = 50
+) -> Results:
+    results = {}
+    cache = app_module.quote_cache
+    app_module.quote_cache = LRUCache(maxsize=0)
+    try:
+        with env(QUOTE_ENGINE="cents"):
+            for term in terms:
+                for apr in aprs:
+                    q = QuoteReq(
+                        vehicle_price=35000,
+                        down_payment=3000,
+                        apr=apr,
+                        term_months=term,
+                        tax_rate=0.0825,
+                        fees=495,
+                    )
+                    results[f"quote.term={term}.apr={apr:g}"] = best_of(
+                        lambda q=q: quote(q), number
+                    )
+    finally:
+        app_module.quote_cache = cache
+    return results
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m bench.quote")
+    parser.add_argument("--terms", type=int, nargs="+", default=list(TERMS))
+    parser.add_argument("--aprs", type=float, nargs="+", default=list(APRS))
+    parser.add_argument("--number", type=int, default=50)
+    args = parser.parse_args(argv)
+    print(report(measure(args.terms, args.aprs, args.number), None))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""Per-request serialization cost of /api/quote responses.
+
+Compares the ``pydantic`` path (engine builds ``QuoteResp``, FastAPI validates
+it against ``response_model`` and renders it with ``JSONResponse``) with the
+``fast`` path (engine payload encoded straight to bytes). The quote math is
+excluded: both paths start from an already amortized schedule.
+
+    python -m bench.serialization [--terms 12 60 240] [--repeat 200]
+"""
+
+import argparse
+import asyncio
+import time
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import APIRoute, serialize_response
+
+from api.app import (
+    FULL_SCHEDULE,
+    QuoteReq,
+    _cents_schedule,
+    _quote_dict,
+    _quote_from_schedule,
+    app,
+)
+from api.serialization import dumps
+
+from .harness import Results, best_of
+
+
+def _quote_route() -> APIRoute:
+    for route in app.routes:
+        if isinstance(route, APIRoute) and route.path == "/api/quote":
+            return route
+    raise LookupError("/api/quote route not found")
+
+
+async def _pydantic_once(route: APIRoute, parts) -> None:
+    resp = _quote_from_schedule(*parts, FULL_SCHEDULE)
+    content = await serialize_response(
+        field=route.response_field,
+        response_content=resp,
+        exclude_none=True,
+        is_coroutine=False,
+    )
+    JSONResponse(content)  # renders the body
+
+
+def _fast_once(parts) -> None:
+    payload = _quote_dict(*parts, FULL_SCHEDULE)
+    dumps(payload, max_magnitude=payload["total_cost"])
+
+
+async def _pydantic_path(route: APIRoute, parts, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        await _pydantic_once(route, parts)
+    return (time.perf_counter() - start) / repeat
+
+
+def _fast_path(parts, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        _fast_once(parts)
+    return (time.perf_counter() - start) / repeat
+
+
+def _parts(term: int):
+    q = QuoteReq(vehicle_price=35000, down_payment=3000, apr=6.9, term_months=term)
+    return _cents_schedule(q)
+
+
+def measure(terms: list[int], repeat: int) -> list[dict]:
+    route = _quote_route()
+    results = []
+    for term in terms:
+        parts = _parts(term)
+        pydantic_s = asyncio.run(_pydantic_path(route, parts, repeat))
+        fast_s = _fast_path(parts, repeat)
+        results.append(
+            {
+                "term_months": term,
+                "pydantic_us": round(pydantic_s * 1e6, 1),
+                "fast_us": round(fast_s * 1e6, 1),
+                "speedup": round(pydantic_s / fast_s, 1),
+            }
+        )
+    return results
+
+
+def results(terms: list[int], number: int = 20) -> Results:
+    """Both paths in the suite's form (the pydantic path includes driving its
+    coroutine on an event loop)."""
+    route = _quote_route()
+    loop = asyncio.new_event_loop()
+    out = {}
+    try:
+        for term in terms:
+            parts = _parts(term)
+            out[f"serialization.pydantic.term={term}"] = best_of(
+                lambda p=parts: loop.run_until_complete(_pydantic_once(route, p)),
+                number,
+            )
+            out[f"serialization.fast.term={term}"] = best_of(
+                lambda p=parts: _fast_once(p), number
+            )
+    finally:
+        loop.close()
+    return out
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m bench.serialization")
+    parser.add_argument("--terms", type=int, nargs="+", default=[12, 60, 240])
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args(argv)
+    print(f"{'term':>6} {'pydantic µs':>12} {'fast µs':>10} {'speedup':>8}")
+    for row in measure(args.terms, args.repeat):
+        print(
+            f"{row['term_months']:>6} {row['pydantic_us']:>12} "
+            f"{row['fast_us']:>10} {row['speedup']:>7}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""Cold-start cost of an API worker, in fresh interpreters.
+
+``startup.import`` times ``python -c "import api.app"``; ``startup.ready``
+also runs the warmup steps a worker runs before ``/api/ready`` reports ready
+(``api.warmup``). Run on its own, the module also breaks one start down by
+warmup step and lists where import time goes, per top-level package (from
+``python -X importtime``), to show what is worth deferring.
+
+    python -m bench.startup [--repeat 3] [--top 12]
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+import tempfile
+from collections import Counter
+
+from .harness import Results, best_of, env, report
+
+READY = """
+import json, time
+start = time.perf_counter()
+import api.app
+imported = time.perf_counter() - start
+from api.warmup import WARMUP
+steps = WARMUP.run()
+print(json.dumps({"import": imported, **steps, "ready": time.perf_counter() - start}))
+"""
+
+
+def _python(*args: str) -> subprocess.CompletedProcess:
+    return subprocess.run(
+        [sys.executable, *args], capture_output=True, text=True, check=True
+    )
+
+
+def measure(repeat: int = 3) -> Results:
+    with tempfile.TemporaryDirectory() as data_dir, env(PERSIST_DIR=data_dir):
+        return {
+            "startup.import": best_of(
+                lambda: _python("-c", "import api.app"), 1, repeat
+            ),
+            "startup.ready": best_of(lambda: _python("-c", READY), 1, repeat),
+        }
+
+
+def breakdown() -> dict[str, float]:
+    """Seconds to import the app, to run each warmup step, and in total."""
+    with tempfile.TemporaryDirectory() as data_dir, env(PERSIST_DIR=data_dir):
+        return json.loads(_python("-c", READY).stdout)
+
+
+def import_profile() -> Counter:
+    """Import time in seconds of the app's imports, by top-level package."""
+    stderr = _python("-X", "importtime", "-c", "import api.app").stderr
+    packages: Counter = Counter()
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, _, name = line[len("import time:") :].split("|")
+        packages[name.strip().split(".")[0]] += int(self_us) / 1e6
+    return packages
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m bench.startup")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--top", type=int, default=12, help="packages to list")
+    args = parser.parse_args(argv)
+    print(report(measure(args.repeat), None))
+    print()
+    for name, seconds in breakdown().items():
+        print(f"{name:<12} {seconds * 1000:9.1f} ms")
+    print()
+    for package, seconds in import_profile().most_common(args.top):
+        print(f"{package:<24} {seconds * 1000:9.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -44,16 +44,26 @@ fi
 echo "Deploying to $ENV environment..."
 docker compose -p $PROJECT_NAME up -d --build caddy api web
 
-echo "Waiting for $ENV environment to be healthy..."
-sleep 15
-
-# Health check on the internal service
-if ! docker run --rm --network=${PROJECT_NAME}_default curlimages/curl:latest -sSf http://api:8000/api/health > /dev/null; then
-  echo "Health check failed for $ENV environment."
+# Wait until the API reports ready: /api/ready answers 503 until a worker has
+# warmed up (sample quotes, stores opened, caches primed), so traffic is only
+# switched to a warm color. READY_TIMEOUT caps the wait (seconds).
+READY_TIMEOUT="${READY_TIMEOUT:-120}"
+echo "Waiting for $ENV environment to be ready (up to ${READY_TIMEOUT}s)..."
+ready=false
+deadline=$((SECONDS + READY_TIMEOUT))
+while [ "$SECONDS" -lt "$deadline" ]; do
+  if docker run --rm --network=${PROJECT_NAME}_default curlimages/curl:latest -sSf http://api:8000/api/ready > /dev/null 2>&1; then
+    ready=true; break
+  fi
+  sleep 2
+done
+if [ "$ready" != true ]; then
+  echo "Readiness check failed for $ENV environment."
+  docker run --rm --network=${PROJECT_NAME}_default curlimages/curl:latest -sS http://api:8000/api/ready || true
   exit 1
 fi
 
-echo "$ENV environment is healthy."
+echo "$ENV environment is ready."
 
 # Switch traffic by creating a new Caddyfile for the edge
 echo "Switching traffic to $ENV environment."
@@ -81,7 +91,7 @@ rollback_edge() {
 
 # Internal upstream health from edge container (network reachability)
 echo "Verifying upstream from edge network..."
-if ! docker run --rm --network=edge-net curlimages/curl:latest -sSf "http://${PROJECT_NAME}-caddy:80/api/health" > /dev/null; then
+if ! docker run --rm --network=edge-net curlimages/curl:latest -sSf "http://${PROJECT_NAME}-caddy:80/api/ready" > /dev/null; then
   echo "Upstream not reachable from edge."
   rollback_edge
   exit 1
@@ -0,0 +1,54 @@
+#!/usr/bin/env bash
+set -euo pipefail
+
+usage() {
+  cat <<EOF
+Usage: $0 [--color blue|green] <leads|tracks> [options] > out.ndjson
+       $0 [--color blue|green] --cursor <cursor> --offset <n> [--format csv] >> out
+
+Streams leads or tracks out of a color stack's API container
+(python -m api.export) to stdout as NDJSON or CSV.
+
+Options (passed through):
+  --format csv|ndjson    Output format (default ndjson)
+  --affiliate NAME       Only records of this affiliate
+  --vehicle-type TYPE    Only leads for this vehicle type
+  --start TIME           Records at or after TIME (ISO 8601, UTC)
+  --end TIME             Records before TIME (ISO 8601, UTC)
+  --cursor C --offset N  Resume an interrupted export after N records
+
+Needs EXPORT_TOKEN set for the stack (in .env), as the API's export does.
+The export's cursor is printed to stderr; an interrupted run prints the
+--cursor/--offset pair that resumes it.
+
+Examples:
+  $0 leads --format csv --start 2025-01-01 > leads.csv
+  $0 --color green tracks --affiliate partnerX > partnerX.ndjson
+EOF
+}
+
+COLOR=blue
+if [[ "${1:-}" == "--color" ]]; then
+  COLOR="${2:-}"
+  shift 2 || { usage >&2; exit 1; }
+fi
+if [[ "$COLOR" != "blue" && "$COLOR" != "green" ]]; then
+  echo "Color must be 'blue' or 'green'" >&2
+  exit 1
+fi
+case "${1:-}" in
+  leads|tracks|--cursor) ;;
+  -h|--help) usage; exit 0 ;;
+  *) usage >&2; exit 1 ;;
+esac
+
+# Exports are disabled, here as over HTTP, unless the stack has a token.
+if [[ -z "$(docker compose -p "loancalc-$COLOR" exec -T api printenv EXPORT_TOKEN || true)" ]]; then
+  echo "EXPORT_TOKEN is not set in the loancalc-$COLOR api container;" \
+    "set it in .env and recreate the container" \
+    "(docker compose -p loancalc-$COLOR up -d api)" >&2
+  exit 1
+fi
+
+# -T: no TTY, so the output is passed through byte for byte.
+exec docker compose -p "loancalc-$COLOR" exec -T api python -m api.export "$@"
@@ -0,0 +1,168 @@
+import asyncio
+
+import httpx
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from api import admission
+from api.admission import (
+    ADMISSION_REJECTED,
+    AdmissionMiddleware,
+    RateLimiter,
+)
+from api.app import app
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def limited_app(**options):
+    demo = FastAPI()
+
+    @demo.get("/api/health")
+    def health():
+        return {"ok": True}
+
+    @demo.get("/api/quote")
+    def quote():
+        return {}
+
+    demo.add_middleware(AdmissionMiddleware, router=demo.router, **options)
+    return demo
+
+
+def test_bucket_allows_bursts_then_refills():
+    clock = Clock()
+    limiter = RateLimiter(rate=2, burst=3, clock=clock)
+    assert [limiter.acquire("a") for _ in range(3)] == [0, 0, 0]
+    assert limiter.acquire("a") == pytest.approx(0.5)
+    assert limiter.acquire("b") == 0  # buckets are per key
+    clock.now = 0.5
+    assert limiter.acquire("a") == 0
+    assert limiter.acquire("a") > 0
+    clock.now = 100
+    assert [limiter.acquire("a") for _ in range(4)][-1] > 0  # never above burst
+
+
+def test_forgotten_keys_start_full():
+    limiter = RateLimiter(rate=1, burst=1, max_keys=2, clock=Clock())
+    for key in ("a", "b", "c"):
+        assert limiter.acquire(key) == 0
+    assert limiter.acquire("a") == 0  # evicted as least recently seen
+    assert limiter.acquire("c") > 0
+
+
+def test_disabled_limiter_admits_everything():
+    limiter = RateLimiter(rate=0)
+    assert not limiter.enabled
+    assert all(limiter.acquire("a") == 0 for _ in range(100))
+
+
+def test_ip_limit_rejects_with_retry_after():
+    clients = RateLimiter(rate=0.5, burst=2, clock=Clock())
+    client = TestClient(limited_app(clients=clients))
+    before = ADMISSION_REJECTED.samples().get(("/api/quote", "ip_rate"), 0)
+    assert [client.get("/api/quote").status_code for _ in range(2)] == [200, 200]
+    resp = client.get("/api/quote")
+    assert resp.status_code == 429
+    assert resp.headers["Retry-After"] == "2"
+    assert ADMISSION_REJECTED.samples()[("/api/quote", "ip_rate")] == before + 1
+    # Health checks are never limited.
+    assert client.get("/api/health").status_code == 200
+
+
+def test_client_ip_from_forwarded_for():
+    clients = RateLimiter(rate=1, burst=1, clock=Clock())
+    client = TestClient(limited_app(clients=clients, proxy_hops=2))
+
+    def get(forwarded):
+        return client.get("/api/quote", headers={"X-Forwarded-For": forwarded})
+
+    assert get("203.0.113.9, 10.0.0.2").status_code == 200
+    assert get("203.0.113.7, 10.0.0.2").status_code == 200
+    # A spoofed leftmost entry does not make a new client.
+    assert get("198.51.100.1, 203.0.113.9, 10.0.0.2").status_code == 429
+
+
+def test_concurrency_cap_queues_then_rejects():
+    async def scenario():
+        gate = asyncio.Event()
+        demo = FastAPI()
+
+        @demo.get("/slow")
+        async def slow():
+            await gate.wait()
+            return {}
+
+        @demo.get("/fast")
+        async def fast():
+            return {}
+
+        demo.add_middleware(
+            AdmissionMiddleware,
+            router=demo.router,
+            clients=RateLimiter(rate=0),
+            max_concurrent=1,
+            queue_timeout=0.05,
+            expensive=["/slow"],
+        )
+        transport = httpx.ASGITransport(app=demo)
+        async with httpx.AsyncClient(transport=transport, base_url="http://t") as c:
+            first = asyncio.create_task(c.get("/slow"))
+            await asyncio.sleep(0.01)
+            busy = await c.get("/slow")
+            assert busy.status_code == 503
+            assert busy.headers["Retry-After"] == "1"
+            assert (await c.get("/fast")).status_code == 200  # not capped
+            queued = asyncio.create_task(c.get("/slow"))
+            await asyncio.sleep(0.01)
+            gate.set()
+            assert (await first).status_code == 200
+            assert (await queued).status_code == 200
+
+    before = admission.ADMISSION_QUEUED.samples().get(("/slow",), 0)
+    asyncio.run(scenario())
+    assert admission.ADMISSION_QUEUED.samples()[("/slow",)] == before + 2
+    assert admission.ADMISSION_WAITING.samples()[()] == 0
+
+
+@pytest.fixture
+def affiliate_limit(tmp_path, monkeypatch):
+    monkeypatch.setenv("PERSIST_DIR", str(tmp_path))
+    monkeypatch.setenv("ROLLUPS_ENABLED", "0")
+    monkeypatch.setattr(
+        admission, "AFFILIATES", RateLimiter(rate=1, burst=2, clock=Clock())
+    )
+
+
+def test_affiliate_limit_on_writes(affiliate_limit):
+    client = TestClient(app)
+    track = {"affiliate": "flood"}
+    statuses = [client.post("/api/track", json=track).status_code for _ in range(2)]
+    assert statuses == [200, 200]
+    resp = client.post("/api/track", json=track)
+    assert resp.status_code == 429
+    assert resp.headers["Retry-After"] == "1"
+    assert client.post("/api/track", json={"affiliate": "calm"}).status_code == 200
+    lead = {"name": "Jo", "email": "jo@example.com", "affiliate": "flood"}
+    assert client.post("/api/leads", json=lead).status_code == 429
+    lead["affiliate"] = None
+    assert client.post("/api/leads", json=lead).status_code == 200
+
+
+def test_idempotent_replays_do_not_spend_tokens(affiliate_limit):
+    client = TestClient(app)
+    headers = {"Idempotency-Key": "once"}
+    for _ in range(5):
+        resp = client.post("/api/track", json={"affiliate": "a1"}, headers=headers)
+        assert resp.status_code == 200
+
+
+def test_app_installs_admission_control():
+    assert AdmissionMiddleware in [m.cls for m in app.user_middleware]
@@ -0,0 +1,163 @@
+import random
+
+import pytest
+from fastapi.testclient import TestClient
+
+from api.amortization import Loan, amortize_batch, interest_cents
+from api.app import (
+    QUOTE_BATCH_MAX,
+    QUOTE_BATCH_MAX_MONTHS,
+    QUOTE_MAX_TERM,
+    QuoteBatchReq,
+    QuoteReq,
+    app,
+    quote_batch,
+    quote_decimal,
+)
+
+client = TestClient(app)
+
+TERMS = [1, 2, 3, 12, 24, 36, 48, 60, 72, 84, 120, 180, 240]
+
+
+def random_quote(rng: random.Random) -> QuoteReq:
+    price = round(rng.uniform(500, 250000), rng.choice([0, 2]))
+    return QuoteReq(
+        vehicle_price=price,
+        down_payment=round(rng.uniform(0, price * 0.3), rng.choice([0, 2])),
+        apr=rng.choice([0.0, round(rng.uniform(0, 30), rng.choice([0, 1, 2, 3]))]),
+        term_months=rng.choice(TERMS + [rng.randint(1, 360)]),
+        tax_rate=rng.choice([0.0, round(rng.uniform(0, 0.12), 4)]),
+        fees=rng.choice([0.0, round(rng.uniform(0, 2500), 2)]),
+        trade_in_value=rng.choice([0.0, round(rng.uniform(0, price * 1.2), 2)]),
+    )
+
+
+def test_batch_matches_scalar_quote_randomized():
+    """Differential check: every batch result equals the Decimal reference."""
+    rng = random.Random(20250825)
+    reqs = [random_quote(rng) for _ in range(1500)]
+    batch = quote_batch(QuoteBatchReq(quotes=reqs))
+    for req, got in zip(reqs, batch.quotes):
+        assert got.model_dump() == quote_decimal(req).model_dump(), req
+
+
+@pytest.mark.parametrize(
+    "apr,price",
+    [
+        # balance * r lands exactly on (or within 1e-26 of) a half cent
+        (1.0, 6.0),
+        (1.0, 123456.78),
+        (6.0, 1.0),
+        (12.0, 0.5),
+        (3.6, 12500.0),
+        (0.012, 5000.0),
+    ],
+)
+def test_batch_matches_scalar_on_half_cent_ties(apr, price):
+    reqs = [QuoteReq(vehicle_price=price, apr=apr, term_months=term) for term in TERMS]
+    batch = quote_batch(QuoteBatchReq(quotes=reqs))
+    for req, got in zip(reqs, batch.quotes):
+        assert got.model_dump() == quote_decimal(req).model_dump()
+
+
+def test_interest_cents_matches_decimal_context_rounding():
+    from decimal import ROUND_HALF_UP, Decimal
+
+    r = Decimal("1") / Decimal("100") / Decimal("12")
+    for balance in [600, 601, 1800, 12345678, 10**12 + 600]:
+        expected = (Decimal(balance) / 100 * r).quantize(
+            Decimal("0.01"), rounding=ROUND_HALF_UP
+        )
+        assert interest_cents(balance, r) == int(expected * 100)
+    # 6.00 * r rounds to exactly 0.005 at 28 digits, then half-up to a cent.
+    assert interest_cents(600, r) == 1
+
+
+def test_amortize_batch_preserves_order_across_terms():
+    from decimal import Decimal
+
+    loans = [
+        Loan(100000, Decimal("0.005"), 1000, 120),
+        Loan(50000, Decimal("0"), 4167, 12),
+        Loan(100000, Decimal("0.005"), 1000, 120),
+    ]
+    first, second, third = amortize_batch(loans)
+    assert len(first.balance) == 120 and len(second.balance) == 12
+    assert first == third
+    assert second.total_interest == 0
+    assert second.total_principal == 50000
+
+
+def test_batch_endpoint_roundtrip():
+    payload = {
+        "quotes": [
+            {
+                "vehicle_price": 20000,
+                "down_payment": 2000,
+                "apr": 3.0,
+                "term_months": 60,
+                "tax_rate": 0.07,
+                "fees": 500,
+            },
+            {"vehicle_price": 10000, "apr": 0, "term_months": 10},
+        ]
+    }
+    resp = client.post("/api/quotes/batch", json=payload)
+    assert resp.status_code == 200
+    quotes = resp.json()["quotes"]
+    assert [q["monthly_payment"] for q in quotes] == [357.58, 1000.0]
+    assert quotes[0]["total_cost"] == 21454.61
+    single = client.post("/api/quote", json=payload["quotes"][0]).json()
+    assert quotes[0] == single
+
+
+def test_batch_endpoint_limits():
+    one = {"vehicle_price": 1000, "apr": 5, "term_months": 12}
+    resp = client.post(
+        "/api/quotes/batch", json={"quotes": [one] * (QUOTE_BATCH_MAX + 1)}
+    )
+    assert resp.status_code == 422
+    bad = client.post("/api/quotes/batch", json={"quotes": [{**one, "apr": -1}]})
+    assert bad.status_code == 422
+    empty = client.post("/api/quotes/batch", json={"quotes": []})
+    assert empty.status_code == 200
+    assert empty.json() == {"quotes": []}
+
+
+def test_batch_term_limits():
+    one = {"vehicle_price": 1000, "apr": 5, "term_months": QUOTE_MAX_TERM}
+    ok = client.post("/api/quotes/batch", json={"quotes": [one]})
+    assert ok.status_code == 200
+    long = {**one, "term_months": QUOTE_MAX_TERM + 1}
+    resp = client.post("/api/quotes/batch", json={"quotes": [one, long]})
+    assert resp.status_code == 422
+    assert resp.json()["detail"][0]["loc"] == ["body", "quotes", 1, "term_months"]
+    count = QUOTE_BATCH_MAX_MONTHS // QUOTE_MAX_TERM + 1
+    assert count <= QUOTE_BATCH_MAX  # the total is what the request exceeds
+    resp = client.post("/api/quotes/batch", json={"quotes": [one] * count})
+    assert resp.status_code == 422
+    assert f"at most {QUOTE_BATCH_MAX_MONTHS} months" in resp.text
+
+
+@pytest.mark.parametrize("price", [9.2e15, 1e17, 1e20])
+def test_batch_prices_loans_beyond_int64_cents(price):
+    reqs = [
+        {"vehicle_price": price, "apr": 7.5, "term_months": 600},
+        {"vehicle_price": 20000, "apr": 5, "term_months": 60},
+    ]
+    resp = client.post("/api/quotes/batch", json={"quotes": reqs})
+    assert resp.status_code == 200
+    for req, got in zip(reqs, resp.json()["quotes"]):
+        assert got == client.post("/api/quote", json=req).json()
+
+
+def test_int64_boundary_takes_the_scalar_engine():
+    from decimal import Decimal
+
+    from api.amortization import _INT64_SAFE_CENTS, amortize_cents
+
+    r = Decimal("0.005")
+    for amount in (_INT64_SAFE_CENTS // 1000, _INT64_SAFE_CENTS // 3, 2**63 + 1):
+        loan = Loan(amount, r, amount // 100, 240)
+        assert amortize_batch([loan]) == [amortize_cents(loan)]
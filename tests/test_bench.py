@@ -0,0 +1,52 @@
+import json
+
+import bench.__main__ as bench_cli
+from bench import harness, persistence, quote
+from bench.harness import Timing
+
+
+def test_compare_uses_calibrated_cost():
+    baseline = {"a": Timing(100.0, 1.0), "b": Timing(100.0, 1.0), "gone": Timing(1, 1)}
+    results = {
+        # Slower wall clock on a slower machine: not a regression.
+        "a": Timing(180.0, 1.1),
+        "b": Timing(100.0, 1.6),
+        "new": Timing(5.0, 0.1),
+    }
+    regressions, missing = harness.compare(results, baseline, threshold=0.5)
+    assert [c.name for c in regressions] == ["b"]
+    assert round(regressions[0].ratio, 2) == 1.6
+    assert missing == ["gone"]
+    assert harness.compare(results, baseline, threshold=0.7)[0] == []
+
+
+def test_best_of_reports_time_and_calibrated_cost():
+    timing = harness.best_of(lambda: sum(range(100)), number=10, min_time=0.001)
+    assert timing.us > 0 and timing.relative > 0
+
+
+def test_suite_measures_quote_and_persistence(tmp_path):
+    results = quote.measure(terms=(12,), aprs=(0, 6.9), number=1)
+    assert set(results) == {"quote.term=12.apr=0", "quote.term=12.apr=6.9"}
+    results = persistence.measure(records=(0, 50), number=1)
+    assert "persistence.jsonl.leads.records=50" in results
+    assert "persistence.jsonl.tracks.records=0" in results
+
+
+def test_cli_gates_on_baseline(tmp_path, monkeypatch, capsys):
+    baseline = tmp_path / "baseline.json"
+    output = tmp_path / "results.json"
+    current = {"quote.x": Timing(10.0, 1.0)}
+    monkeypatch.setattr(bench_cli, "run", lambda quick=False: dict(current))
+
+    assert bench_cli.main(["--baseline", str(baseline), "--update-baseline"]) == 0
+    saved = json.loads(baseline.read_text())["results"]
+    assert saved == {"quote.x": {"us": 10.0, "relative": 1.0}}
+
+    assert bench_cli.main(["--baseline", str(baseline), "--output", str(output)]) == 0
+    assert json.loads(output.read_text())["results"] == saved
+
+    current["quote.x"] = Timing(20.0, 2.0)
+    assert bench_cli.main(["--baseline", str(baseline), "--threshold", "0.5"]) == 1
+    assert "REGRESSION quote.x" in capsys.readouterr().out
+    assert bench_cli.main(["--baseline", str(baseline), "--threshold", "1.5"]) == 0
@@ -0,0 +1,143 @@
+import gzip
+from itertools import accumulate
+
+import pytest
+from fastapi.testclient import TestClient
+
+import api.app as app_module
+from api.app import COLUMNAR_MEDIA_TYPE, app
+from api.cache import LRUCache
+from api.serialization import negotiate_coding
+
+client = TestClient(app)
+
+PAYLOAD = {
+    "vehicle_price": 82000.55,
+    "down_payment": 8000,
+    "apr": 7.49,
+    "term_months": 240,
+    "tax_rate": 0.0825,
+    "fees": 649.99,
+}
+QUERIES = ["", "offset=5&limit=3", "months=2&months=1", "limit=12&summary=yearly"]
+COLUMNS = ["month", "payment", "principal", "interest", "balance"]
+
+
+@pytest.fixture(autouse=True)
+def fresh_cache(monkeypatch):
+    cache = LRUCache(maxsize=16)
+    monkeypatch.setattr(app_module, "quote_cache", cache)
+    return cache
+
+
+def _rows(data, encoding):
+    columns = data["schedule"]
+    if encoding == "delta":
+        columns = {name: list(accumulate(values)) for name, values in columns.items()}
+    if encoding != "float":
+        columns = {
+            name: values if name == "month" else [v / 100 for v in values]
+            for name, values in columns.items()
+        }
+    return [dict(zip(COLUMNS, values)) for values in zip(*map(columns.get, COLUMNS))]
+
+
+@pytest.mark.parametrize("engine", ["cents", "decimal"])
+@pytest.mark.parametrize("encoding", ["float", "cents", "delta"])
+@pytest.mark.parametrize("query", QUERIES)
+def test_columnar_decodes_to_row_format(monkeypatch, engine, encoding, query):
+    monkeypatch.setenv("QUOTE_ENGINE", engine)
+    rows = client.post(f"/api/quote?{query}", json=PAYLOAD).json()
+    res = client.post(
+        f"/api/quote?{query}&format=columnar&encoding={encoding}", json=PAYLOAD
+    )
+    assert res.status_code == 200
+    assert res.headers["content-type"] == COLUMNAR_MEDIA_TYPE
+    data = res.json()
+    assert data["encoding"] == encoding
+    assert data["schedule_months"] == 240
+    assert _rows(data, encoding) == rows["schedule"]
+    for key in ("amount_financed", "monthly_payment", "total_interest", "total_cost"):
+        assert data[key] == rows[key]
+    assert data.get("yearly") == rows.get("yearly")
+
+
+def test_columnar_is_smaller():
+    rows = client.post("/api/quote", json=PAYLOAD)
+    delta = client.post("/api/quote?format=columnar&encoding=delta", json=PAYLOAD)
+    assert len(delta.content) < len(rows.content) / 3
+
+
+def test_accept_header_selects_columnar():
+    res = client.post(
+        "/api/quote?encoding=cents",
+        json=PAYLOAD,
+        headers={"Accept": f"{COLUMNAR_MEDIA_TYPE}, application/json;q=0.5"},
+    )
+    assert res.headers["content-type"] == COLUMNAR_MEDIA_TYPE
+    data = res.json()
+    assert data["schedule"]["payment"][0] == round(data["monthly_payment"] * 100)
+    assert "Accept" in res.headers["vary"]
+
+
+def test_default_shape_unchanged():
+    res = client.post("/api/quote", json=PAYLOAD, headers={"Accept": "*/*"})
+    assert res.headers["content-type"] == "application/json"
+    assert isinstance(res.json()["schedule"], list)
+
+
+def test_gzip_negotiated_and_memoized(fresh_cache):
+    headers = {"Accept-Encoding": "gzip"}
+    res = client.post("/api/quote?format=columnar", json=PAYLOAD, headers=headers)
+    assert res.headers["content-encoding"] == "gzip"
+    plain = client.post(
+        "/api/quote?format=columnar",
+        json=PAYLOAD,
+        headers={"Accept-Encoding": "identity"},
+    )
+    assert "content-encoding" not in plain.headers
+    assert res.content == plain.content
+    # One cache entry holds the encoded body and its compressed variants.
+    assert fresh_cache.stats()["size"] == 1 and fresh_cache.hits == 1
+    key = next(iter(fresh_cache._data))
+    variants = fresh_cache._data[key][1]
+    assert gzip.decompress(variants["gzip"]) == variants[None]
+
+
+def test_small_bodies_are_not_compressed():
+    res = client.post(
+        "/api/quote?schedule=none",
+        json=PAYLOAD,
+        headers={"Accept-Encoding": "gzip"},
+    )
+    assert "content-encoding" not in res.headers
+
+
+@pytest.mark.parametrize(
+    "header, expected",
+    [
+        (None, None),
+        ("", None),
+        ("identity", None),
+        ("gzip", "gzip"),
+        ("gzip;q=0, deflate", None),
+        ("deflate, *;q=0.1", "gzip"),
+        ("GZIP ; q=0.8", "gzip"),
+    ],
+)
+def test_negotiate_coding(monkeypatch, header, expected):
+    monkeypatch.setattr("api.serialization.brotli", None)
+    assert negotiate_coding(header) == expected
+
+
+def test_brotli_preferred_when_installed():
+    pytest.importorskip("brotli")
+    assert negotiate_coding("gzip, br") == "br"
+    assert negotiate_coding("gzip, br;q=0.5") == "gzip"
+    res = client.post(
+        "/api/quote?format=columnar",
+        json=PAYLOAD,
+        headers={"Accept-Encoding": "br"},
+    )
+    assert res.headers["content-encoding"] == "br"
+    assert res.json()["encoding"] == "float"  # decoded by the client
@@ -0,0 +1,158 @@
+import hashlib
+import multiprocessing
+import os
+import threading
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from api.app import app
+from api.idempotency import IdempotencyStore, KeyReused
+from api.storage import get_store
+
+client = TestClient(app)
+
+LEAD = {"name": "Jane", "email": "jane@example.com", "affiliate": "partnerX"}
+
+
+@pytest.fixture(autouse=True)
+def data_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv("PERSIST_DIR", str(tmp_path))
+    monkeypatch.setenv("ROLLUPS_ENABLED", "0")
+    return tmp_path
+
+
+def post_lead(key, body=LEAD):
+    return client.post("/api/leads", json=body, headers={"Idempotency-Key": key})
+
+
+def test_retried_lead_is_stored_once():
+    first = post_lead("k1")
+    again = post_lead("k1")
+    assert first.status_code == again.status_code == 200
+    assert again.json() == first.json()
+    assert "Idempotent-Replayed" not in first.headers
+    assert again.headers["Idempotent-Replayed"] == "true"
+    assert len(list(get_store("leads").scan())) == 1
+    post_lead("k2")
+    assert len(list(get_store("leads").scan())) == 2
+
+
+def test_requests_without_a_key_are_not_deduplicated():
+    client.post("/api/leads", json=LEAD)
+    client.post("/api/leads", json=LEAD)
+    assert len(list(get_store("leads").scan())) == 2
+
+
+def test_key_reused_for_another_request_is_rejected():
+    post_lead("k1")
+    resp = post_lead("k1", {**LEAD, "email": "other@example.com"})
+    assert resp.status_code == 422
+    assert len(list(get_store("leads").scan())) == 1
+
+
+def test_keys_are_scoped_per_endpoint():
+    post_lead("shared")
+    resp = client.post(
+        "/api/track", json={"affiliate": "a1"}, headers={"Idempotency-Key": "shared"}
+    )
+    assert resp.status_code == 200
+    assert "Idempotent-Replayed" not in resp.headers
+    client.post(
+        "/api/track", json={"affiliate": "a1"}, headers={"Idempotency-Key": "shared"}
+    )
+    assert len(list(get_store("tracks").scan())) == 1
+
+
+@pytest.mark.parametrize("key", ["", "x" * 256])
+def test_malformed_keys_are_rejected(key):
+    assert post_lead(key).status_code == 422
+
+
+def test_failed_attempts_are_not_remembered(tmp_path):
+    store = IdempotencyStore(str(tmp_path / "s"))
+
+    def failing():
+        raise OSError("disk full")
+
+    with pytest.raises(OSError):
+        store.run("k", {"a": 1}, failing)
+    assert store.run("k", {"a": 1}, lambda: {"ok": True}) == ({"ok": True}, False)
+
+
+def test_responses_survive_a_new_store(tmp_path):
+    IdempotencyStore(str(tmp_path / "s")).run("k", {}, lambda: {"n": 1})
+    again = IdempotencyStore(str(tmp_path / "s")).run("k", {}, lambda: {"n": 2})
+    assert again == ({"n": 1}, True)
+    with pytest.raises(KeyReused):
+        IdempotencyStore(str(tmp_path / "s")).run("k", {"x": 1}, lambda: {})
+
+
+def test_entries_expire(tmp_path):
+    store = IdempotencyStore(str(tmp_path / "s"), ttl=60)
+    store.run("k", {}, lambda: {"n": 1})
+    age(store, "k", 120)
+    assert store.run("k", {}, lambda: {"n": 2}) == ({"n": 2}, False)
+
+
+def age(store, key, seconds):
+    digest = hashlib.sha256(key.encode()).hexdigest()
+    then = time.time() - seconds
+    os.utime(os.path.join(store.directory, f"{digest}.json"), (then, then))
+
+
+def test_sweep_keeps_the_store_bounded(tmp_path):
+    store = IdempotencyStore(str(tmp_path / "s"), ttl=60, max_keys=3)
+    for n in range(6):
+        store.run(f"k{n}", {}, lambda: {})
+        age(store, f"k{n}", 10 - n)
+    assert store.sweep() == 0  # the first write swept less than a minute ago
+    assert store.sweep(force=True) == 3
+    assert store.run("k2", {}, lambda: {"n": 1}) == ({"n": 1}, False)  # oldest went
+    assert store.run("k3", {}, lambda: {"n": 1}) == ({}, True)
+    for n in range(2, 6):
+        age(store, f"k{n}", 120)
+    assert store.sweep(force=True) == 4
+
+
+def test_concurrent_duplicates_are_coalesced(tmp_path):
+    store = IdempotencyStore(str(tmp_path / "s"))
+    calls = []
+    results = []
+
+    def slow():
+        calls.append(1)
+        time.sleep(0.2)
+        return {"n": len(calls)}
+
+    def attempt():
+        results.append(store.run("k", {"a": 1}, slow))
+
+    threads = [threading.Thread(target=attempt) for _ in range(5)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(calls) == 1
+    assert sorted(replayed for _, replayed in results) == [False] + [True] * 4
+    assert {r["n"] for r, _ in results} == {1}
+
+
+def _submit(barrier):
+    barrier.wait()
+    IdempotencyStore.from_env("leads").run(
+        "k", {"a": 1}, lambda: get_store("leads").append({"n": 1}) or {"ok": True}
+    )
+
+
+def test_duplicates_from_other_processes_are_coalesced():
+    ctx = multiprocessing.get_context("fork")
+    barrier = ctx.Barrier(4)
+    procs = [ctx.Process(target=_submit, args=(barrier,)) for _ in range(4)]
+    for p in procs:
+        p.start()
+    for p in procs:
+        p.join(10)
+    assert [p.exitcode for p in procs] == [0, 0, 0, 0]
+    assert len(list(get_store("leads").scan())) == 1
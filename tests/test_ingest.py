@@ -0,0 +1,89 @@
+import json
+import threading
+
+import pytest
+from fastapi.testclient import TestClient
+
+from api.app import app
+from api.ingest import IngestQueue, QueueFull
+from api.storage import JsonlStore, RecordStore
+
+
+class _BlockingStore(RecordStore):
+    """Store whose writes wait until the test releases them."""
+
+    def __init__(self):
+        super().__init__("unused")
+        self.release = threading.Event()
+        self.batches = []
+
+    def extend(self, records):
+        self.release.wait(5)
+        self.batches.append(list(records))
+
+
+def test_write_behind_track_persists_on_shutdown(tmp_path, monkeypatch):
+    """Queued clicks are flushed to disk when the app shuts down."""
+    monkeypatch.setenv("PERSIST_DIR", str(tmp_path))
+    monkeypatch.setenv("TRACK_WRITE_BEHIND", "1")
+    monkeypatch.setenv("TRACK_FLUSH_MS", "1000")
+    with TestClient(app) as c:
+        for i in range(25):
+            resp = c.post("/api/track", json={"affiliate": f"p{i}"})
+            assert resp.status_code == 200
+            assert resp.json() == {"message": "Tracked"}
+    lines = (tmp_path / "tracks.jsonl").read_text().splitlines()
+    assert [json.loads(line)["affiliate"] for line in lines] == [
+        f"p{i}" for i in range(25)
+    ]
+
+
+def test_write_behind_full_queue_returns_429(tmp_path, monkeypatch):
+    monkeypatch.setenv("PERSIST_DIR", str(tmp_path))
+    monkeypatch.setenv("TRACK_WRITE_BEHIND", "1")
+    with TestClient(app) as c:
+        store = _BlockingStore()
+        blocked = IngestQueue(lambda: store, maxsize=2, batch_size=1)
+        blocked.start()
+        app.state.track_queue = blocked
+        try:
+            statuses = [
+                c.post("/api/track", json={"affiliate": "p"}).status_code
+                for _ in range(6)
+            ]
+            assert statuses[-1] == 429
+            resp = c.post("/api/track", json={"affiliate": "p"})
+            assert resp.headers["retry-after"] == "1"
+        finally:
+            store.release.set()
+            blocked.stop()
+    assert blocked.rejected >= 2
+    assert sum(len(b) for b in store.batches) == blocked.accepted
+
+
+def test_ingest_groups_records_into_batches(tmp_path):
+    store = JsonlStore(str(tmp_path / "tracks.jsonl"))
+    q = IngestQueue(lambda: store, batch_size=10, flush_interval=5)
+    q.start()
+    for i in range(35):
+        q.submit({"i": i})
+    q.stop()
+    assert [r["i"] for r in store.scan()] == list(range(35))
+    assert q.written == 35
+    # Three full batches by size, the remainder flushed on shutdown.
+    assert q.batches == 4
+
+
+def test_ingest_blocking_submit_times_out():
+    store = _BlockingStore()
+    q = IngestQueue(lambda: store, maxsize=1, batch_size=1, block_timeout=0.05)
+    q.start()
+    try:
+        q.submit({"i": 0})  # picked up by the writer, which then blocks
+        q.submit({"i": 1})  # fills the queue
+        with pytest.raises(QueueFull):
+            q.submit({"i": 2})
+    finally:
+        store.release.set()
+        q.stop()
+    assert [r["i"] for b in store.batches for r in b] == [0, 1]
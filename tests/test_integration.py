@@ -42,8 +42,8 @@ def test_integration_lead_persistence(client_and_dir):
     payload = {"name": "Alice", "email": "alice@example.com", "phone": "+12345678901"}
     resp = client.post("/api/leads", json=payload)
     assert resp.status_code == 200
-    with open(data_dir / "leads.json") as f:
-        data = json.load(f)
+    with open(data_dir / "leads.jsonl") as f:
+        data = [json.loads(line) for line in f]
     assert data[0]["email"] == "alice@example.com"
 def test_integration_track_persistence(client_and_dir):
     """Tests that a tracking event submitted to /api/track is persisted to disk."""
@@ -51,6 +51,6 @@ def test_integration_track_persistence(client_and_dir):
     payload = {"affiliate": "partner1"}
     resp = client.post("/api/track", json=payload)
     assert resp.status_code == 200
-    with open(data_dir / "tracks.json") as f:
-        data = json.load(f)
+    with open(data_dir / "tracks.jsonl") as f:
+        data = [json.loads(line) for line in f]
     assert data[0]["affiliate"] == "partner1"
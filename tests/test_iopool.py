@@ -0,0 +1,123 @@
+import asyncio
+import contextvars
+import threading
+
+import httpx
+import pytest
+
+from api import app as app_module
+from api.app import app
+from api.iopool import IO_POOL_REJECTED, IOPool, PoolBusy
+from api.metrics import render
+
+QUOTE = {"vehicle_price": 30000, "apr": 5.0, "term_months": 60}
+
+request_id = contextvars.ContextVar("request_id", default=None)
+
+
+def test_calls_run_on_the_pool_in_the_callers_context():
+    pool = IOPool("test", threads=2)
+
+    async def scenario():
+        request_id.set("r1")
+        return await pool.run(
+            lambda: (threading.current_thread().name, request_id.get())
+        )
+
+    name, seen = asyncio.run(scenario())
+    assert name.startswith("test-io")
+    assert seen == "r1"
+    pool.shutdown()
+
+
+def test_full_queue_rejects_calls():
+    pool = IOPool("bounded", threads=1, max_queued=1)
+    gate = threading.Event()
+
+    async def scenario():
+        running = asyncio.ensure_future(pool.run(gate.wait, 5))
+        queued = asyncio.ensure_future(pool.run(gate.wait, 5))
+        await asyncio.sleep(0.05)
+        assert (pool.active, pool.queued) == (1, 1)
+        with pytest.raises(PoolBusy):
+            await pool.run(gate.wait, 5)
+        gate.set()
+        await asyncio.gather(running, queued)
+        assert await pool.run(len, "ok") == 2
+
+    before = IO_POOL_REJECTED.samples().get(("bounded",), 0)
+    asyncio.run(scenario())
+    assert IO_POOL_REJECTED.samples()[("bounded",)] == before + 1
+    assert (pool.active, pool.queued) == (0, 0)
+    pool.shutdown()
+
+
+def test_iterate_pulls_on_the_pool_and_closes_early_exits():
+    pool = IOPool("iter", threads=1)
+    closed = []
+
+    def rows():
+        try:
+            for n in range(5):
+                yield n, threading.current_thread().name
+        finally:
+            closed.append(True)
+
+    async def scenario():
+        seen = [item async for item in pool.iterate(rows())]
+        assert [n for n, _ in seen] == [0, 1, 2, 3, 4]
+        assert all(name.startswith("iter-io") for _, name in seen)
+        partial = pool.iterate(rows())
+        assert (await partial.__anext__())[0] == 0
+        await partial.aclose()
+
+    asyncio.run(scenario())
+    assert closed == [True, True]
+    pool.shutdown()
+
+
+@pytest.fixture
+def slow_disk(tmp_path, monkeypatch):
+    """Lead writes that wait until the test releases them, on a 1-thread pool."""
+    monkeypatch.setenv("PERSIST_DIR", str(tmp_path))
+    monkeypatch.setenv("ROLLUPS_ENABLED", "0")
+    pool = IOPool("persist", threads=1, max_queued=1)
+    monkeypatch.setattr(app_module, "PERSIST", pool)
+    gate = threading.Event()
+    store_lead = app_module.store_lead
+
+    def stalled(*args):
+        gate.wait(5)
+        return store_lead(*args)
+
+    monkeypatch.setattr(app_module, "store_lead", stalled)
+    yield gate
+    gate.set()
+    pool.shutdown()
+
+
+def test_slow_storage_does_not_stall_quotes_or_health(slow_disk):
+    lead = {"name": "Jo", "email": "jo@example.com"}
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://t") as c:
+            writes = [
+                asyncio.create_task(c.post("/api/leads", json=lead)) for _ in range(2)
+            ]
+            await asyncio.sleep(0.05)
+            assert (await c.get("/api/health")).status_code == 200
+            assert (await c.post("/api/quote", json=QUOTE)).status_code == 200
+            shed = await c.post("/api/leads", json=lead)
+            assert shed.status_code == 503
+            assert shed.headers["Retry-After"] == "1"
+            slow_disk.set()
+            assert [(await w).status_code for w in writes] == [200, 200]
+
+    asyncio.run(scenario())
+
+
+def test_pool_sizes_are_exported():
+    text = render()
+    assert 'io_pool_threads{pool="persist"} 8' in text
+    assert 'io_pool_queued{pool="persist"}' in text
@@ -10,7 +10,7 @@ client = TestClient(app)
 
 
 def test_lead_persistence(tmp_path, monkeypatch):
-    """Tests that a valid lead is persisted to a JSON file."""
+    """Tests that a valid lead is persisted to the JSON Lines store."""
     monkeypatch.setenv("PERSIST_DIR", str(tmp_path))
     payload = {
         "name": "Alice",
@@ -19,9 +19,9 @@ def test_lead_persistence(tmp_path, monkeypatch):
     }
     resp = client.post("/api/leads", json=payload)
     assert resp.status_code == 200
-    leads_file = tmp_path / "leads.json"
+    leads_file = tmp_path / "leads.jsonl"
     assert leads_file.exists()
-    data = json.loads(leads_file.read_text())
+    data = [json.loads(line) for line in leads_file.read_text().splitlines()]
     assert data[0]["email"] == "alice@example.com"
     assert data[0]["phone"] == "+12345678901"
 
@@ -56,7 +56,7 @@ def test_lead_invalid_not_persisted(tmp_path, monkeypatch):
     payload = {"name": "", "email": "bob@example.com"}
     resp = client.post("/api/leads", json=payload)
     assert resp.status_code == 422
-    assert not (tmp_path / "leads.json").exists()
+    assert not (tmp_path / "leads.jsonl").exists()
 
 
 def test_lead_model_phone_validation():
@@ -74,15 +74,15 @@ def test_lead_multiple_appends(tmp_path, monkeypatch):
     resp1 = client.post("/api/leads", json=payload1)
     resp2 = client.post("/api/leads", json=payload2)
     assert resp1.status_code == 200 and resp2.status_code == 200
-    leads_file = tmp_path / "leads.json"
-    data = json.loads(leads_file.read_text())
+    leads_file = tmp_path / "leads.jsonl"
+    data = [json.loads(line) for line in leads_file.read_text().splitlines()]
     assert len(data) == 2
     assert data[0]["email"] == "a1@example.com"
     assert data[1]["email"] == "a2@example.com"
 
 
 def test_lead_corrupt_file_returns_500_and_unmodified(tmp_path, monkeypatch):
-    """If leads.json is corrupt, API should return 500 and not overwrite it."""
+    """If a legacy leads.json is corrupt, API should return 500 and not touch it."""
     monkeypatch.setenv("PERSIST_DIR", str(tmp_path))
     leads_file = tmp_path / "leads.json"
     original = "not valid json"
@@ -95,3 +95,19 @@ def test_lead_corrupt_file_returns_500_and_unmodified(tmp_path, monkeypatch):
         resp = c.post("/api/leads", json=payload)
     assert resp.status_code == 500
     assert leads_file.read_text() == original
+    assert not (tmp_path / "leads.jsonl").exists()
+
+
+def test_lead_migrates_legacy_json_array(tmp_path, monkeypatch):
+    """Existing leads.json entries are carried over ahead of new leads."""
+    monkeypatch.setenv("PERSIST_DIR", str(tmp_path))
+    (tmp_path / "leads.json").write_text(
+        json.dumps([{"name": "Old", "email": "old@example.com"}])
+    )
+    payload = {"name": "New", "email": "new@example.com"}
+    resp = client.post("/api/leads", json=payload)
+    assert resp.status_code == 200
+    lines = (tmp_path / "leads.jsonl").read_text().splitlines()
+    assert [json.loads(line)["name"] for line in lines] == ["Old", "New"]
+    assert not (tmp_path / "leads.json").exists()
+    assert (tmp_path / "leads.json.migrated").exists()
@@ -0,0 +1,88 @@
+import argparse
+import json
+
+import pytest
+
+from bench import load
+from bench.load import Write
+
+
+def test_requests_are_reproducible_and_follow_the_mix():
+    mix = {"quote": 1, "lead": 1}
+    sent = [load.request(n, mix, "run", seed=7) for n in range(200)]
+    assert sent == [load.request(n, mix, "run", seed=7) for n in range(200)]
+    assert {route for route, *_ in sent} == {"quote", "lead"}
+    terms = {body["term_months"] for route, _, body, _ in sent if route == "quote"}
+    assert len(terms) > 5
+    write = next(w for *_, w in sent if w is not None)
+    assert write.kind == "leads" and write.record["affiliate"] == "load-run"
+
+
+def test_parse_mix_rejects_unknown_routes():
+    assert load.parse_mix("quote=2,track=1") == {"quote": 2, "track": 1}
+    for value in ("export=1", "quote=x", "quote=0"):
+        with pytest.raises(argparse.ArgumentTypeError):
+            load.parse_mix(value)
+
+
+def test_percentile_is_nearest_rank():
+    values = [float(n) for n in range(1, 101)]
+    assert [load.percentile(values, q) for q in (50, 95, 99)] == [50, 95, 99]
+    assert load.percentile([], 50) == 0.0
+
+
+def test_verify_classifies_lost_and_damaged_writes():
+    writes = [
+        Write("tracks", str(n), {"utm_content": str(n), "x": n}) for n in range(4)
+    ]
+    stamp = {"timestamp": "2025-03-01T00:00:00"}
+    stored = [
+        {"utm_content": "0", "x": 0, **stamp},
+        {"utm_content": "1", "x": 1, **stamp},
+        {"utm_content": "1", "x": 1, **stamp},
+        {"utm_content": "2", "x": -2, **stamp},
+        {"utm_content": "9", "x": 9, **stamp},
+    ]
+    result = load.verify(writes, stored)
+    assert (result.missing, result.duplicated, result.corrupted) == (
+        ["3"],
+        ["1"],
+        ["2"],
+    )
+    assert result.unacknowledged == ["9"]
+    assert not result.ok
+    assert load.verify(writes[:1], stored[:1]).ok
+
+
+@pytest.mark.parametrize("processes", [1, 3])
+def test_run_against_the_app_keeps_every_write(processes, tmp_path, monkeypatch):
+    monkeypatch.setenv("PERSIST_DIR", str(tmp_path))
+    monkeypatch.setenv("ROLLUPS_ENABLED", "0")
+    stats = load.run(None, 120, 8, load.DEFAULT_MIX, "t", processes=processes)
+    assert sum(len(v) for v in stats.latencies.values()) == 120
+    assert all(set(counts) == {"200"} for counts in stats.statuses.values())
+    results = load.check(stats, lambda kind: load.stored_locally(kind, "t"))
+    assert all(r.ok and r.acknowledged == r.stored for r in results.values())
+    assert results["tracks"].acknowledged > 0
+    assert "p99 ms" in load.report(stats)
+
+
+def test_cli_reports_and_fails_on_lost_writes(tmp_path, monkeypatch, capsys):
+    output = tmp_path / "load.json"
+    argv = ["--requests", "60", "--concurrency", "4", "--output", str(output)]
+    assert load.main([*argv, "--backend", "sqlite"]) == 0
+    figures = json.loads(output.read_text())
+    assert figures["integrity"]["leads"]["ok"] is True
+    assert set(figures["routes"]["quote"]) >= {"rps", "p50_ms", "p95_ms", "p99_ms"}
+
+    monkeypatch.setattr(load, "stored_locally", lambda kind, run_id: [])
+    assert load.main([*argv, "--mix", "track=1"]) == 1
+    assert "tracks: FAILED" in capsys.readouterr().out
+
+
+def test_uvicorn_workers_share_the_data_volume(tmp_path):
+    pytest.importorskip("uvicorn")
+    output = tmp_path / "load.json"
+    argv = ["--workers", "2", "--requests", "200", "--output", str(output)]
+    assert load.main(argv) == 0
+    assert json.loads(output.read_text())["integrity"]["tracks"]["ok"] is True
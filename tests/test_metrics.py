@@ -0,0 +1,135 @@
+import json
+import os
+import threading
+
+from fastapi.testclient import TestClient
+
+from api.app import app, quote_cache
+from api.metrics import REGISTRY, Registry
+
+client = TestClient(app)
+
+QUOTE = {"vehicle_price": 20000, "apr": 5, "term_months": 60}
+LEAD = {"name": "Alice", "email": "alice@example.com"}
+
+
+def scrape(c=client) -> dict[str, float]:
+    res = c.get("/api/metrics")
+    assert res.status_code == 200
+    assert res.headers["content-type"].startswith("text/plain; version=0.0.4")
+    samples = {}
+    for line in res.text.splitlines():
+        if line and not line.startswith("#"):
+            name, value = line.rsplit(" ", 1)
+            samples[name] = float(value)
+    return samples
+
+
+def test_http_metrics_per_route():
+    before = scrape()
+    assert client.post("/api/quote", json=QUOTE).status_code == 200
+    assert client.put("/api/quote").status_code == 405
+    assert client.get("/nope").status_code == 404
+    after = scrape()
+
+    def delta(name):
+        return after.get(name, 0) - before.get(name, 0)
+
+    ok = 'http_requests_total{method="POST",route="/api/quote",status="200"}'
+    assert delta(ok) == 1
+    assert (
+        delta('http_requests_total{method="PUT",route="/api/quote",status="405"}') == 1
+    )
+    assert (
+        delta('http_requests_total{method="GET",route="unmatched",status="404"}') == 1
+    )
+    count = 'http_request_duration_seconds_count{method="POST",route="/api/quote"}'
+    inf = 'http_request_duration_seconds_bucket{method="POST",route="/api/quote",le="+Inf"}'
+    assert delta(count) == 1 and after[count] == after[inf]
+    assert after['http_requests_in_flight{method="POST",route="/api/quote"}'] == 0
+    # The scrape in flight is the only request being handled.
+    assert after['http_requests_in_flight{method="GET",route="/api/metrics"}'] == 1
+
+
+def test_quote_term_distribution_and_cache():
+    before = scrape()
+    client.post("/api/quote", json=QUOTE)
+    client.post(
+        "/api/quotes/batch", json={"quotes": [QUOTE, {**QUOTE, "term_months": 240}]}
+    )
+    after = scrape()
+    le60 = 'quote_term_months_bucket{endpoint="quote",le="60"}'
+    le48 = 'quote_term_months_bucket{endpoint="quote",le="48"}'
+    assert after[le60] - before.get(le60, 0) == 1
+    assert after[le48] == before.get(le48, 0)
+    batch = 'quote_term_months_sum{endpoint="batch"}'
+    assert after[batch] - before.get(batch, 0) == 300
+    stats = quote_cache.stats()
+    assert after['quote_cache_events_total{event="hits"}'] == stats["hits"]
+    assert after["quote_cache_entries"] == stats["size"]
+
+
+def test_persistence_metrics(tmp_path, monkeypatch):
+    monkeypatch.setenv("PERSIST_DIR", str(tmp_path))
+    before = scrape()
+    assert client.post("/api/leads", json=LEAD).status_code == 200
+    after = scrape()
+    write = 'persistence_write_seconds_count{store="leads",backend="jsonl"}'
+    wait = 'persistence_lock_wait_seconds_count{store="leads"}'
+    assert after[write] - before.get(write, 0) == 1
+    assert after[wait] - before.get(wait, 0) == 1
+    size = os.path.getsize(tmp_path / "leads.jsonl")
+    assert after['persistence_store_bytes{store="leads"}'] == size
+    assert after['persistence_store_bytes{store="tracks"}'] == 0
+
+
+def test_histogram_rendering_and_concurrent_updates():
+    registry = Registry()
+    hist = registry.histogram("h", "Help.", ("path",), buckets=(1, 5))
+    counter = registry.counter("c", "Help.", ("path",))
+    threads = [
+        threading.Thread(
+            target=lambda: [
+                (hist.observe(v, 'a"b'), counter.inc('a"b')) for v in (0.5, 3, 9) * 500
+            ]
+        )
+        for _ in range(8)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    text = registry.render()
+    assert "# TYPE h histogram" in text
+    assert 'h_bucket{path="a\\"b",le="1"} 4000' in text
+    assert 'h_bucket{path="a\\"b",le="5"} 8000' in text
+    assert 'h_bucket{path="a\\"b",le="+Inf"} 12000' in text
+    assert 'h_count{path="a\\"b"} 12000' in text
+    assert 'h_sum{path="a\\"b"} 50000' in text
+    assert "c_total" not in text and 'c{path="a\\"b"} 12000' in text
+
+
+def test_other_workers_are_merged(tmp_path, monkeypatch):
+    monkeypatch.setenv("METRICS_DIR", str(tmp_path))
+    client.post("/api/quotes/batch", json={"quotes": [QUOTE]})
+    mine = scrape()
+    other = REGISTRY.snapshot()
+    (tmp_path / "99999.json").write_text(json.dumps(other))
+    stale = tmp_path / "99998.json"
+    stale.write_text(json.dumps(other))
+    os.utime(stale, (0, 0))
+    merged = scrape()
+    batch = 'quote_term_months_count{endpoint="batch"}'
+    assert merged[batch] == 2 * mine[batch]
+    # Shared-state metrics come from this worker only.
+    store = 'persistence_store_bytes{store="leads"}'
+    assert merged[store] == mine[store]
+
+
+def test_snapshot_writer_lifecycle(tmp_path, monkeypatch):
+    monkeypatch.setenv("METRICS_DIR", str(tmp_path))
+    own = tmp_path / f"{os.getpid()}.json"
+    with TestClient(app):
+        assert own.exists()
+        assert "http_requests_total" in json.loads(own.read_text())
+    assert not own.exists()
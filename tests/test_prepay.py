@@ -0,0 +1,181 @@
+import random
+from decimal import Decimal
+
+import pytest
+from fastapi.testclient import TestClient
+
+import api.app as app_module
+from api.app import (
+    PrepayReq,
+    QuoteReq,
+    _loan_terms,
+    _to_cents,
+    app,
+    baseline,
+    prepay_schedule,
+)
+from api.cache import LRUCache
+
+client = TestClient(app)
+
+LOAN = {"vehicle_price": 35000, "down_payment": 3000, "apr": 6.9, "term_months": 72}
+
+
+@pytest.fixture(autouse=True)
+def fresh_cache(monkeypatch):
+    monkeypatch.setattr(app_module, "quote_cache", LRUCache(maxsize=64))
+
+
+def reference(req: PrepayReq) -> list[tuple[Decimal, Decimal, Decimal, Decimal]]:
+    """Decimal walk of the prepaid schedule, written like quote_decimal."""
+    amount, r, monthly = _loan_terms(req)
+    extras = {}
+    for lump in req.lump_sums:
+        extras[lump.month] = extras.get(lump.month, 0) + Decimal(str(lump.amount))
+    recurring = Decimal(str(req.extra_monthly))
+    thirteenth = _to_cents(monthly / 12) if req.thirteenth_payment else Decimal("0")
+    rows = []
+    balance = amount
+    for month in range(1, req.term_months + 1):
+        if balance == 0:
+            break
+        interest = Decimal("0") if r == 0 else _to_cents(balance * r)
+        principal = monthly - interest
+        payment = monthly
+        if principal < 0:
+            principal = Decimal("0")
+            payment = interest
+        extra = thirteenth + extras.get(month, Decimal("0"))
+        if month >= req.extra_start_month:
+            extra += recurring
+        principal += extra
+        payment += extra
+        if principal > balance or month == req.term_months:
+            principal = balance
+            payment = principal + interest
+        balance -= principal
+        rows.append((payment, principal, interest, balance))
+    return rows
+
+
+def random_request(rng: random.Random) -> PrepayReq:
+    term = rng.choice([12, 36, 60, 72, 84, 180, 360])
+    return PrepayReq(
+        vehicle_price=round(rng.uniform(2000, 120000), 2),
+        down_payment=rng.choice([0, 1000, 5000]),
+        apr=rng.choice([0.0, round(rng.uniform(0, 25), 2)]),
+        term_months=term,
+        tax_rate=rng.choice([0.0, 0.0725]),
+        extra_monthly=rng.choice([0, 25, 100, round(rng.uniform(0, 900), 2)]),
+        extra_start_month=rng.randint(1, term),
+        lump_sums=[
+            {"month": rng.randint(1, term + 12), "amount": round(rng.uniform(1, 9000))}
+            for _ in range(rng.choice([0, 0, 1, 3]))
+        ],
+        thirteenth_payment=rng.random() < 0.3,
+    )
+
+
+def test_scenarios_match_decimal_reference_randomized():
+    rng = random.Random(20250907)
+    for _ in range(300):
+        req = random_request(rng)
+        sched = prepay_schedule(baseline(req), req)
+        expected = reference(req)
+        got = list(zip(sched.payment, sched.principal, sched.interest, sched.balance))
+        while got and got[-1][0] == 0:
+            got.pop()  # a baseline paid off early ends in all-zero rows
+        assert len(got) == len(expected), req
+        for row, ref in zip(got, expected):
+            assert row == tuple(int(v * 100) for v in ref), req
+        assert sched.total_interest == sum(row[2] for row in got)
+
+
+def test_no_extras_is_the_regular_quote():
+    data = client.post("/api/quote/prepay?schedule=none", json=LOAN).json()
+    quoted = client.post("/api/quote?schedule=none", json=LOAN).json()
+    assert data["baseline"] == data["scenario"] == quoted
+    assert data["months_saved"] == 0
+    assert data["interest_saved"] == 0
+
+
+def test_savings_are_reported_against_the_baseline():
+    data = client.post("/api/quote/prepay", json={**LOAN, "extra_monthly": 100}).json()
+    base, scenario = data["baseline"], data["scenario"]
+    assert base["schedule"] == []
+    assert data["months_saved"] == base["schedule_months"] - len(scenario["schedule"])
+    assert data["months_saved"] > 0
+    assert data["interest_saved"] == pytest.approx(
+        base["total_interest"] - scenario["total_interest"]
+    )
+    assert scenario["schedule"][-1]["balance"] == 0
+    assert scenario["schedule"][0]["payment"] == base["monthly_payment"] + 100
+
+
+def test_rows_before_first_extra_are_the_baseline():
+    full = client.post("/api/quote", json=LOAN).json()["schedule"]
+    data = client.post(
+        "/api/quote/prepay",
+        json={**LOAN, "lump_sums": [{"month": 24, "amount": 4000}]},
+    ).json()
+    rows = data["scenario"]["schedule"]
+    assert rows[:23] == full[:23]
+    assert rows[23]["principal"] == full[23]["principal"] + 4000
+
+
+def test_baseline_is_reused_across_scenarios(monkeypatch):
+    calls = []
+    amortize = app_module.amortize_cents
+
+    def counting(loan):
+        calls.append(loan)
+        return amortize(loan)
+
+    monkeypatch.setattr(app_module, "amortize_cents", counting)
+    for extra in (0, 50, 100, 150):
+        client.post("/api/quote/prepay", json={**LOAN, "extra_monthly": extra})
+    assert len(calls) == 1
+
+
+def test_lump_sum_after_payoff_changes_nothing():
+    data = client.post(
+        "/api/quote/prepay?schedule=none",
+        json={**LOAN, "lump_sums": [{"month": 500, "amount": 1000}]},
+    ).json()
+    assert data["scenario"] == data["baseline"]
+
+
+def test_thirteenth_payment_is_spread_over_the_months():
+    data = client.post(
+        "/api/quote/prepay", json={**LOAN, "thirteenth_payment": True}
+    ).json()
+    monthly = data["baseline"]["monthly_payment"]
+    spread = data["thirteenth_payment_spread_monthly"]
+    assert spread == round(monthly / 12, 2)
+    first = data["scenario"]["schedule"][0]
+    assert first["payment"] == pytest.approx(monthly + spread)
+    assert data["months_saved"] > 0
+    # "biweekly" is the field's former name.
+    legacy = client.post("/api/quote/prepay", json={**LOAN, "biweekly": True})
+    assert legacy.json() == data
+    plain = client.post("/api/quote/prepay", json=LOAN).json()
+    assert "thirteenth_payment_spread_monthly" not in plain
+
+
+@pytest.mark.parametrize(
+    "extra",
+    [
+        {"extra_monthly": -1},
+        {"extra_start_month": 0},
+        {"lump_sums": [{"month": 0, "amount": 100}]},
+        {"lump_sums": [{"month": 3, "amount": 0}]},
+        {"lump_sums": [{"month": 3, "amount": 1}] * 121},
+    ],
+)
+def test_invalid_prepayments_are_rejected(extra):
+    assert client.post("/api/quote/prepay", json={**LOAN, **extra}).status_code == 422
+
+
+def test_quote_req_fields_alone_make_the_baseline_key():
+    req = PrepayReq(**LOAN, extra_monthly=10)
+    assert baseline(req) is baseline(QuoteReq(**LOAN))
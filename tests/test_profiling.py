@@ -0,0 +1,133 @@
+import asyncio
+import cProfile
+import pstats
+import threading
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+import api.app as app_module
+from api import profiling as profiling_module
+from api.app import app
+from api.cache import LRUCache
+from api.profiling import span, timed
+
+client = TestClient(app)
+
+QUOTE = {"vehicle_price": 20000, "apr": 5, "term_months": 60}
+LEAD = {"name": "Alice", "email": "alice@example.com"}
+
+
+@pytest.fixture
+def profiling(tmp_path, monkeypatch):
+    monkeypatch.setenv("PERSIST_DIR", str(tmp_path))
+    monkeypatch.setenv("PROFILE_ENABLED", "1")
+    monkeypatch.setattr(app_module, "quote_cache", LRUCache(maxsize=0))
+    return tmp_path / "profiles"
+
+
+def _timings(res) -> dict[str, float]:
+    items = (
+        part.strip().split(";dur=") for part in res.headers["server-timing"].split(",")
+    )
+    return {name: float(ms) for name, ms in items}
+
+
+def test_off_by_default(tmp_path, monkeypatch):
+    monkeypatch.setenv("PERSIST_DIR", str(tmp_path))
+    res = client.post("/api/quote", json=QUOTE, headers={"X-Profile": "1"})
+    assert res.status_code == 200
+    assert "server-timing" not in res.headers
+    assert not (tmp_path / "profiles").exists()
+
+
+def test_profiled_quote(profiling):
+    assert "server-timing" not in client.post("/api/quote", json=QUOTE).headers
+    res = client.post("/api/quote", json=QUOTE, headers={"X-Profile": "1"})
+    assert res.status_code == 200
+    timings = _timings(res)
+    for name in ("principal", "amortize", "build", "serialize", "endpoint", "app"):
+        assert timings[name] >= 0
+    assert timings["app"] >= timings["endpoint"] >= timings["amortize"]
+    (profile,) = profiling.iterdir()
+    assert profile.name.endswith("-POST-api_quote.prof")
+    stats = pstats.Stats(str(profile))
+    assert any(func[2] == "quote_endpoint" for func in stats.stats)
+
+
+def test_profiled_persistence(profiling):
+    res = client.post("/api/leads", json=LEAD, headers={"X-Profile": "1"})
+    assert res.status_code == 200
+    assert {"persist", "lock_wait", "io_wait", "endpoint"} <= set(_timings(res))
+    # The write ran on the persistence pool, and is in the request's profile.
+    (profile,) = profiling.iterdir()
+    functions = {func[2] for func in pstats.Stats(str(profile)).stats}
+    assert {"create_lead", "store_lead", "extend"} <= functions
+
+
+def test_profile_token(profiling, monkeypatch):
+    monkeypatch.setenv("PROFILE_TOKEN", "s3cret")
+    res = client.post("/api/quote", json=QUOTE, headers={"X-Profile": "1"})
+    assert "server-timing" not in res.headers
+    res = client.post("/api/quote", json=QUOTE, headers={"X-Profile": "s3cret"})
+    assert "server-timing" in res.headers
+
+
+def test_sampling_and_retention(profiling, monkeypatch):
+    monkeypatch.setenv("PROFILE_SAMPLE_RATE", "1")
+    monkeypatch.setenv("PROFILE_KEEP", "2")
+    names = []
+    for _ in range(4):
+        assert "server-timing" in client.post("/api/quote", json=QUOTE).headers
+        names.append(sorted(p.name for p in profiling.iterdir())[-1])
+    assert sorted(p.name for p in profiling.iterdir()) == names[-2:]
+
+
+def test_spans_are_noops_outside_profiled_requests():
+    @timed("x")
+    def f():
+        with span("y"):
+            return 42
+
+    assert f() == 42
+
+
+def test_overlapping_profiled_requests(profiling, monkeypatch):
+    both_running = threading.Barrier(2, timeout=5)
+    engine = app_module._engine
+
+    def gated_engine():
+        both_running.wait()  # each request is inside its endpoint
+        return engine()
+
+    monkeypatch.setattr(app_module, "_engine", gated_engine)
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://t") as c:
+            return await asyncio.gather(
+                *(
+                    c.post("/api/quote", json=QUOTE, headers={"X-Profile": "1"})
+                    for _ in range(2)
+                )
+            )
+
+    for res in asyncio.run(scenario()):
+        assert res.status_code == 200
+        assert "endpoint" in _timings(res)
+    assert len(list(profiling.iterdir())) == 1  # only one ran under cProfile
+    assert not profiling_module._profiler_lock.locked()
+
+
+def test_profiler_refused_by_another_tool(profiling, monkeypatch):
+    class Busy(cProfile.Profile):
+        def enable(self, *args, **kwargs):
+            raise ValueError("Another profiling tool is already active")
+
+    monkeypatch.setattr(cProfile, "Profile", Busy)
+    res = client.post("/api/quote", json=QUOTE, headers={"X-Profile": "1"})
+    assert res.status_code == 200
+    assert "endpoint" in _timings(res)
+    assert not profiling.exists()
+    assert not profiling_module._profiler_lock.locked()
@@ -2,7 +2,7 @@ import pytest
 from fastapi.testclient import TestClient
 from pydantic import ValidationError
 
-from api.app import QuoteReq, app, quote
+from api.app import QUOTE_MAX_TERM, QuoteReq, app, quote
 
 client = TestClient(app)
 
@@ -159,3 +159,94 @@ def test_quote_endpoint_validation_error():
     }
     resp = client.post("/api/quote", json=payload)
     assert resp.status_code == 422
+
+
+RV_PAYLOAD = {
+    "vehicle_price": 82000,
+    "down_payment": 8000,
+    "apr": 7.5,
+    "term_months": 180,
+    "tax_rate": 0.06,
+    "fees": 650,
+}
+
+
+@pytest.mark.parametrize("engine", ["cents", "decimal"])
+def test_quote_schedule_none_keeps_totals(monkeypatch, engine):
+    monkeypatch.setenv("QUOTE_ENGINE", engine)
+    full = client.post("/api/quote", json=RV_PAYLOAD).json()
+    resp = client.post("/api/quote?schedule=none", json=RV_PAYLOAD)
+    assert resp.status_code == 200
+    data = resp.json()
+    assert data["schedule"] == []
+    assert data["schedule_months"] == 180
+    for key in ("amount_financed", "monthly_payment", "total_interest", "total_cost"):
+        assert data[key] == full[key]
+    assert "yearly" not in data
+    assert "schedule_months" not in full
+
+
+@pytest.mark.parametrize("engine", ["cents", "decimal"])
+def test_quote_schedule_window(monkeypatch, engine):
+    monkeypatch.setenv("QUOTE_ENGINE", engine)
+    full = client.post("/api/quote", json=RV_PAYLOAD).json()
+    page = client.post("/api/quote?offset=12&limit=12", json=RV_PAYLOAD).json()
+    assert page["schedule"] == full["schedule"][12:24]
+    assert page["total_interest"] == full["total_interest"]
+    tail = client.post("/api/quote?offset=170&limit=50", json=RV_PAYLOAD).json()
+    assert tail["schedule"] == full["schedule"][170:]
+    picked = client.post("/api/quote?months=180&months=1&months=999", json=RV_PAYLOAD)
+    assert [row["month"] for row in picked.json()["schedule"]] == [1, 180]
+
+
+@pytest.mark.parametrize("engine", ["cents", "decimal"])
+def test_quote_yearly_summary(monkeypatch, engine):
+    monkeypatch.setenv("QUOTE_ENGINE", engine)
+    payload = {**RV_PAYLOAD, "term_months": 30}
+    full = client.post("/api/quote", json=payload).json()
+    data = client.post("/api/quote?schedule=none&summary=yearly", json=payload).json()
+    years = data["yearly"]
+    assert [y["year"] for y in years] == [1, 2, 3]
+    assert years[0]["interest"] == round(
+        sum(row["interest"] for row in full["schedule"][:12]), 2
+    )
+    assert years[1]["balance"] == full["schedule"][23]["balance"]
+    assert years[2]["balance"] == 0
+    assert round(sum(y["interest"] for y in years), 2) == full["total_interest"]
+    assert round(sum(y["principal"] for y in years), 2) == full["amount_financed"]
+
+
+def test_quote_schedule_options_validated():
+    assert client.post("/api/quote?offset=-1", json=RV_PAYLOAD).status_code == 422
+    assert client.post("/api/quote?limit=0", json=RV_PAYLOAD).status_code == 422
+    assert client.post("/api/quote?schedule=some", json=RV_PAYLOAD).status_code == 422
+
+
+@pytest.mark.parametrize(
+    "method,url,body",
+    [
+        ("post", "/api/quote", {}),
+        ("post", "/api/quote/stream", {}),
+        ("post", "/api/quote/prepay", {"extra_monthly": 100}),
+        (
+            "post",
+            "/api/quote/solve",
+            {"target_payment": 500, "solve_for": "vehicle_price"},
+        ),
+        (
+            "post",
+            "/api/quote/solve",
+            {"target_payment": 500, "solve_for": "down_payment"},
+        ),
+        ("get", "/api/quote", None),
+    ],
+)
+def test_terms_are_bounded_everywhere(method, url, body):
+    def send(term):
+        loan = {**RV_PAYLOAD, "term_months": term}
+        if body is None:
+            return client.get(url, params=loan, follow_redirects=True)
+        return client.post(f"{url}?schedule=none", json={**loan, **body})
+
+    assert send(QUOTE_MAX_TERM + 1).status_code == 422
+    assert send(QUOTE_MAX_TERM).status_code == 200
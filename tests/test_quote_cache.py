@@ -0,0 +1,114 @@
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+import api.app as app_module
+from api.app import QuoteReq, app
+from api.cache import LRUCache, canonical_key
+from api.warmup import WARMUP
+
+client = TestClient(app)
+
+PAYLOAD = {"vehicle_price": 20000, "down_payment": 2000, "apr": 3.0, "term_months": 60}
+
+
+@pytest.fixture
+def fresh_cache(monkeypatch):
+    cache = LRUCache(maxsize=4, ttl=None)
+    monkeypatch.setattr(app_module, "quote_cache", cache)
+    return cache
+
+
+def test_canonical_key_normalizes_numbers():
+    a = QuoteReq(vehicle_price=20000, apr=3, term_months=60)
+    b = QuoteReq(vehicle_price=20000.0, apr=3.0, term_months=60, down_payment=0.0)
+    c = QuoteReq(vehicle_price=20000.01, apr=3, term_months=60)
+    assert canonical_key(a) == canonical_key(b)
+    assert hash(canonical_key(a)) == hash(canonical_key(b))
+    assert canonical_key(a) != canonical_key(c)
+
+
+def test_lru_eviction_and_counters():
+    cache = LRUCache(maxsize=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1  # "b" is now least recently used
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+    assert cache.stats() == {
+        "size": 2,
+        "maxsize": 2,
+        "ttl": None,
+        "hits": 3,
+        "misses": 1,
+        "evictions": 1,
+    }
+
+
+def test_ttl_expiry(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("api.cache.time.monotonic", lambda: now[0])
+    cache = LRUCache(maxsize=8, ttl=10)
+    cache.set("k", "v")
+    now[0] += 9
+    assert cache.get("k") == "v"
+    now[0] += 2
+    assert cache.get("k") is None
+    assert len(cache) == 0
+
+
+def test_disabled_cache_stores_nothing():
+    cache = LRUCache(maxsize=0)
+    cache.set("k", "v")
+    assert cache.get("k") is None
+    assert cache.stats()["misses"] == 0
+
+
+def test_quote_endpoint_uses_cache(fresh_cache):
+    first = client.post("/api/quote", json=PAYLOAD)
+    second = client.post("/api/quote", json={**PAYLOAD, "vehicle_price": 20000.0})
+    assert first.json() == second.json()
+    assert fresh_cache.hits == 1 and fresh_cache.misses == 1
+    # A different view of the same loan is a separate entry.
+    page = client.post("/api/quote?limit=12", json=PAYLOAD).json()
+    assert len(page["schedule"]) == 12
+    assert fresh_cache.misses == 2
+    stats = client.get("/api/quote/cache").json()
+    assert stats["hits"] == 1 and stats["size"] == 2
+
+
+def test_cache_keys_include_engine(fresh_cache, monkeypatch):
+    client.post("/api/quote", json=PAYLOAD)
+    monkeypatch.setenv("QUOTE_ENGINE", "decimal")
+    client.post("/api/quote", json=PAYLOAD)
+    assert fresh_cache.misses == 2 and fresh_cache.hits == 0
+
+
+def test_prewarm_on_startup(monkeypatch):
+    cache = LRUCache(maxsize=100)
+    monkeypatch.setattr(app_module, "quote_cache", cache)
+    monkeypatch.setenv("QUOTE_CACHE_PREWARM", "1")
+    monkeypatch.setenv("QUOTE_CACHE_PREWARM_PRICES", "20000")
+    monkeypatch.setenv("WARMUP_STEPS", "cache")
+    monkeypatch.setattr(WARMUP, "done", {})  # as in a fresh worker
+    with TestClient(app) as c:
+        while c.get("/api/ready").status_code == 503:  # warms in the background
+            time.sleep(0.01)
+        assert len(cache) == 8  # 4 presets x (first UI page, rest of schedule)
+        misses = cache.misses
+        # Compressed variants come from the cache too.
+        monkeypatch.setattr(app_module, "compress", None)
+        # What web/dist/app.js requests for the "auto" preset, as a browser.
+        ui = "apr=10&encoding=delta&format=columnar&term_months=60&vehicle_price=20000"
+        for query in ("limit=12&summary=yearly", "offset=12"):
+            url = "/api/quote?" + "&".join(sorted(f"{ui}&{query}".split("&")))
+            resp = c.get(
+                url,
+                headers={"Accept-Encoding": "gzip, deflate, br"},
+                follow_redirects=False,
+            )
+            assert resp.status_code == 200
+    assert cache.hits == 2
+    assert cache.misses == misses
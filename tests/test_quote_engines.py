@@ -0,0 +1,67 @@
+from decimal import Decimal
+
+import pytest
+from fastapi.testclient import TestClient
+from hypothesis import given, settings
+from hypothesis import strategies as st
+
+from api.amortization import CentsRate, interest_cents
+from api.app import QuoteReq, app, quote_cents, quote_decimal
+
+client = TestClient(app)
+
+money = st.decimals(min_value=0, max_value=500000, places=2).map(float)
+rates = st.decimals(min_value=0, max_value=36, places=3).map(float)
+
+quote_reqs = st.builds(
+    QuoteReq,
+    vehicle_price=st.decimals(min_value="0.01", max_value=500000, places=2).map(float),
+    down_payment=money,
+    apr=rates,
+    term_months=st.integers(min_value=1, max_value=360),
+    tax_rate=st.decimals(min_value=0, max_value="0.15", places=4).map(float),
+    fees=money,
+    trade_in_value=money,
+)
+
+
+@settings(max_examples=300, deadline=None)
+@given(quote_reqs)
+def test_cents_engine_matches_decimal_reference(req):
+    assert quote_cents(req).model_dump() == quote_decimal(req).model_dump()
+
+
+@settings(max_examples=500, deadline=None)
+@given(
+    balance=st.integers(min_value=0, max_value=10**13),
+    apr=st.decimals(min_value=0, max_value=100, places=6),
+)
+def test_cents_rate_matches_decimal_interest(balance, apr):
+    r = apr / Decimal("100") / Decimal("12")
+    assert CentsRate(r).interest(balance) == interest_cents(balance, r)
+
+
+@pytest.mark.parametrize("engine", ["decimal", "cents"])
+def test_quote_engine_selectable(monkeypatch, engine):
+    monkeypatch.setenv("QUOTE_ENGINE", engine)
+    payload = {
+        "vehicle_price": 20000,
+        "down_payment": 2000,
+        "apr": 3.0,
+        "term_months": 60,
+        "tax_rate": 0.07,
+        "fees": 500,
+    }
+    data = client.post("/api/quote", json=payload).json()
+    assert data["monthly_payment"] == 357.58
+    assert data["total_cost"] == 21454.61
+    assert data["schedule"][0]["interest"] == 49.75
+
+
+def test_unknown_quote_engine_is_an_error(monkeypatch):
+    monkeypatch.setenv("QUOTE_ENGINE", "abacus")
+    with TestClient(app, raise_server_exceptions=False) as c:
+        resp = c.post(
+            "/api/quote", json={"vehicle_price": 1000, "apr": 5, "term_months": 12}
+        )
+    assert resp.status_code == 500
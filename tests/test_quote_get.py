@@ -0,0 +1,83 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from api.app import QuoteReq, app, canonical_quote_query
+
+client = TestClient(app)
+
+PAYLOAD = {"vehicle_price": 20000, "down_payment": 2000, "apr": 3.0, "term_months": 60}
+CANONICAL = "/api/quote?apr=3&down_payment=2000&term_months=60&vehicle_price=20000"
+
+
+def get(url, **headers):
+    return client.get(url, headers=headers, follow_redirects=False)
+
+
+def test_get_matches_post():
+    resp = get(CANONICAL)
+    assert resp.status_code == 200
+    assert resp.content == client.post("/api/quote", json=PAYLOAD).content
+    assert resp.headers["Cache-Control"] == "public, max-age=3600"
+    assert resp.headers["Vary"] == "Accept, Accept-Encoding"
+
+
+@pytest.mark.parametrize(
+    "query",
+    [
+        "vehicle_price=20000&down_payment=2000&apr=3&term_months=60",
+        "apr=3.0&down_payment=2e3&term_months=60&vehicle_price=20000.00",
+        "apr=3&down_payment=2000&fees=0&offset=0&schedule=full&term_months=60"
+        "&encoding=delta&vehicle_price=20000",
+    ],
+)
+def test_other_spellings_redirect_to_the_canonical_url(query):
+    resp = get(f"/api/quote?{query}")
+    assert resp.status_code == 301
+    assert resp.headers["Location"] == CANONICAL
+    assert resp.headers["Cache-Control"] == "public, max-age=3600"
+
+
+def test_canonical_query_keeps_options_in_order():
+    q = QuoteReq(vehicle_price=8e4, apr=6.9, term_months=72, fees=-0.0)
+    query = canonical_quote_query(
+        q, "none", 12, 24, [12, 6, 12], "yearly", "columnar", "float"
+    )
+    assert query == (
+        "apr=6.9&format=columnar&limit=24&months=6&months=12"
+        "&offset=12&schedule=none&summary=yearly&term_months=72&vehicle_price=80000"
+    )
+    assert get(f"/api/quote?{query}").status_code == 200
+
+
+def test_if_none_match_gets_not_modified():
+    etag = get(CANONICAL).headers["ETag"]
+    assert etag.startswith('"') and etag.endswith('"')  # strong
+    for header in (etag, f'"other", W/{etag}', "*"):
+        resp = get(CANONICAL, **{"If-None-Match": header})
+        assert resp.status_code == 304
+        assert resp.content == b""
+        assert resp.headers["ETag"] == etag
+        assert resp.headers["Cache-Control"] == "public, max-age=3600"
+    assert get(CANONICAL, **{"If-None-Match": '"other"'}).status_code == 200
+
+
+def test_each_representation_has_its_own_etag():
+    plain = get(CANONICAL, **{"Accept-Encoding": "identity"})
+    gzipped = get(CANONICAL, **{"Accept-Encoding": "gzip"})
+    columnar = get(CANONICAL, Accept="application/vnd.dealer-quote.columnar+json")
+    assert gzipped.headers["Content-Encoding"] == "gzip"
+    etags = {r.headers["ETag"] for r in (plain, gzipped, columnar)}
+    assert len(etags) == 3
+    assert get(CANONICAL.replace("60", "48")).headers["ETag"] not in etags
+
+
+def test_max_age_is_configurable(monkeypatch):
+    monkeypatch.setenv("QUOTE_MAX_AGE", "60")
+    assert get(CANONICAL).headers["Cache-Control"] == "public, max-age=60"
+
+
+@pytest.mark.parametrize(
+    "query", ["apr=3&term_months=60", "apr=3&term_months=60&vehicle_price=0"]
+)
+def test_invalid_quotes_are_rejected(query):
+    assert get(f"/api/quote?{query}").status_code == 422
@@ -0,0 +1,110 @@
+import random
+
+import pytest
+from fastapi.testclient import TestClient
+
+from api.amortization import Loan, amortize_batch, amortize_totals, to_cents
+from api.app import (
+    QUOTE_MATRIX_MAX_APRS,
+    QUOTE_MATRIX_MAX_TERMS,
+    QUOTE_MAX_TERM,
+    QuoteReq,
+    _loan_terms,
+    app,
+    quote_decimal,
+)
+
+client = TestClient(app)
+
+APRS = [0.0, 1.9, 3.49, 4.9, 6.9, 8.0, 9.99, 12.0]
+TERMS = [24, 36, 48, 60, 72, 84]
+
+
+def matrix(**body):
+    return client.post("/api/quote/matrix", json=body)
+
+
+@pytest.mark.parametrize(
+    "loan",
+    [
+        {"vehicle_price": 35000, "down_payment": 3000},
+        {
+            "vehicle_price": 82000.55,
+            "down_payment": 8000,
+            "tax_rate": 0.0825,
+            "fees": 649.99,
+            "trade_in_value": 4000,
+        },
+        {"vehicle_price": 10000, "trade_in_value": 15000},
+    ],
+)
+def test_every_cell_matches_quote(loan):
+    resp = matrix(**loan, aprs=APRS, terms=TERMS)
+    assert resp.status_code == 200
+    data = resp.json()
+    assert data["aprs"] == APRS
+    assert data["terms"] == TERMS
+    for i, apr in enumerate(APRS):
+        for j, term in enumerate(TERMS):
+            ref = quote_decimal(QuoteReq(**loan, apr=apr, term_months=term))
+            assert data["amount_financed"] == ref.amount_financed
+            assert data["monthly_payment"][i][j] == ref.monthly_payment
+            assert data["total_interest"][i][j] == ref.total_interest
+            assert data["total_cost"][i][j] == ref.total_cost
+
+
+def test_totals_match_batch_schedules_randomized():
+    rng = random.Random(20250901)
+    loans = []
+    for _ in range(400):
+        req = QuoteReq(
+            vehicle_price=round(rng.uniform(500, 250000), 2),
+            apr=rng.choice([0.0, round(rng.uniform(0, 30), 3)]),
+            term_months=rng.choice([1, 12, 60, 84, rng.randint(1, 360)]),
+        )
+        amount, r, payment = _loan_terms(req)
+        loans.append(Loan(to_cents(amount), r, to_cents(payment), req.term_months))
+    totals = amortize_totals(loans)
+    for sched, got in zip(amortize_batch(loans), totals):
+        assert got == (sched.total_principal, sched.total_interest)
+
+
+def test_duplicate_and_unsorted_axes_keep_request_order():
+    data = matrix(vehicle_price=20000, aprs=[9, 3, 9], terms=[72, 12]).json()
+    assert data["terms"] == [72, 12]
+    assert data["monthly_payment"][0] == data["monthly_payment"][2]
+    assert data["monthly_payment"][1][1] > data["monthly_payment"][1][0]
+
+
+@pytest.mark.parametrize(
+    "aprs,terms",
+    [
+        ([], [60]),
+        ([5], []),
+        ([-1], [60]),
+        ([5], [0]),
+        ([5], [60, QUOTE_MAX_TERM + 1]),
+        ([5] * (QUOTE_MATRIX_MAX_APRS + 1), [60]),
+        ([5], [60] * (QUOTE_MATRIX_MAX_TERMS + 1)),
+    ],
+)
+def test_grid_limits_are_enforced(aprs, terms):
+    assert matrix(vehicle_price=20000, aprs=aprs, terms=terms).status_code == 422
+
+
+def test_longest_term_is_accepted():
+    resp = matrix(vehicle_price=20000, aprs=[5], terms=[QUOTE_MAX_TERM])
+    assert resp.status_code == 200
+
+
+@pytest.mark.parametrize("price", [9.2e15, 1e17, 1e20])
+def test_loans_beyond_int64_cents(price):
+    resp = matrix(vehicle_price=price, aprs=[0, 7.5], terms=[60, 600])
+    assert resp.status_code == 200
+    data = resp.json()
+    for i, apr in enumerate([0, 7.5]):
+        for j, term in enumerate([60, 600]):
+            req = QuoteReq(vehicle_price=price, apr=apr, term_months=term)
+            ref = quote_decimal(req)
+            assert data["monthly_payment"][i][j] == ref.monthly_payment
+            assert data["total_interest"][i][j] == ref.total_interest
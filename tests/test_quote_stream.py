@@ -0,0 +1,95 @@
+import json
+import random
+import tracemalloc
+
+import pytest
+from fastapi.testclient import TestClient
+
+from api.app import QuoteReq, app, quote_decimal, stream_schedule_ndjson
+
+client = TestClient(app)
+
+
+def _parse(chunks):
+    lines = b"".join(chunks).decode().splitlines()
+    records = [json.loads(line) for line in lines]
+    return records[:-1], records[-1]["summary"]
+
+
+def _assert_matches_reference(q, rows, summary):
+    ref = quote_decimal(q).model_dump(exclude_none=True)
+    assert rows == ref.pop("schedule")
+    assert summary == {**ref, "schedule_months": q.term_months}
+
+
+def test_stream_matches_reference_randomized():
+    rng = random.Random(9)
+    for _ in range(200):
+        price = round(rng.uniform(500, 250000), 2)
+        q = QuoteReq(
+            vehicle_price=price,
+            down_payment=round(rng.uniform(0, price * 0.3), 2),
+            apr=rng.choice([0.0, round(rng.uniform(0, 30), 2)]),
+            term_months=rng.randint(1, 360),
+            tax_rate=rng.choice([0.0, 0.0825]),
+            fees=rng.choice([0.0, 649.99]),
+        )
+        # A small chunk size exercises rows split across chunks.
+        rows, summary = _parse(stream_schedule_ndjson(q, chunk_rows=7))
+        _assert_matches_reference(q, rows, summary)
+
+
+@pytest.mark.parametrize(
+    "payload",
+    [
+        # The last payment absorbs the rounding remainder.
+        {"vehicle_price": 10000, "apr": 5, "term_months": 37},
+        # Trade-in exceeds the price: nothing financed.
+        {"vehicle_price": 10000, "apr": 5, "term_months": 12, "trade_in_value": 15000},
+        {"vehicle_price": 3e16, "apr": 4, "term_months": 3},
+    ],
+)
+def test_stream_preserves_last_period_adjustment(payload):
+    q = QuoteReq(**payload)
+    rows, summary = _parse(stream_schedule_ndjson(q))
+    _assert_matches_reference(q, rows, summary)
+    if payload["term_months"] == 37:
+        assert rows[-1]["payment"] != summary["monthly_payment"]
+        assert rows[-1]["balance"] == 0
+
+
+def test_stream_endpoint():
+    payload = {
+        "vehicle_price": 82000,
+        "down_payment": 8000,
+        "apr": 7.5,
+        "term_months": 600,
+    }
+    res = client.post("/api/quote/stream", json=payload)
+    assert res.status_code == 200
+    assert res.headers["content-type"] == "application/x-ndjson"
+    lines = res.text.splitlines()
+    assert len(lines) == 601
+    assert [json.loads(line)["month"] for line in lines[:3]] == [1, 2, 3]
+    summary = json.loads(lines[-1])["summary"]
+    quote = client.post("/api/quote?schedule=none", json=payload).json()
+    assert quote.pop("schedule") == []
+    assert summary == quote
+    assert client.post("/api/quote/stream", json={}).status_code == 422
+
+
+def _peak_streaming(term: int) -> int:
+    # Past QUOTE_MAX_TERM, which a deployment may raise.
+    q = QuoteReq.model_construct(vehicle_price=50000, apr=6.5, term_months=term)
+    tracemalloc.start()
+    try:
+        for _ in stream_schedule_ndjson(q):
+            pass
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def test_stream_memory_does_not_grow_with_term():
+    small, large = _peak_streaming(1_000), _peak_streaming(50_000)
+    assert large < small * 1.5
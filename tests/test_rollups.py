@@ -0,0 +1,195 @@
+import json
+import shutil
+
+import pytest
+from fastapi.testclient import TestClient
+
+from api import rollups, storage
+from api.app import app
+from api.storage import file_lock, get_store
+
+client = TestClient(app)
+
+
+@pytest.fixture(autouse=True)
+def data_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv("PERSIST_DIR", str(tmp_path))
+    monkeypatch.setenv("EXPORT_TOKEN", "s3cret")
+    return tmp_path
+
+
+AUTH = {"Authorization": "Bearer s3cret"}
+
+
+def click(day, affiliate="partnerX", **utm):
+    return {"affiliate": affiliate, **utm, "timestamp": f"{day}T12:00:00.000000"}
+
+
+def lead(day, affiliate="partnerX", **utm):
+    return {
+        "name": "Jane",
+        "email": "jane@example.com",
+        "affiliate": affiliate,
+        **utm,
+        "timestamp": f"{day}T13:00:00.000000",
+    }
+
+
+def seed():
+    get_store("tracks").extend(
+        [
+            click("2025-03-01", utm_source="google", utm_campaign="spring"),
+            click("2025-03-01", utm_source="google", utm_campaign="spring"),
+            click("2025-03-01", "partnerY"),
+            click("2025-03-02", utm_source="google", utm_campaign="spring"),
+            click("2025-03-05", utm_source="fb", utm_medium="cpc"),
+        ]
+    )
+    get_store("leads").extend(
+        [
+            lead("2025-03-01", utm_source="google", utm_campaign="spring"),
+            lead("2025-03-05", affiliate=None),
+        ]
+    )
+
+
+def report(**params):
+    resp = client.get("/api/rollups", params=params, headers=AUTH)
+    assert resp.status_code == 200
+    return resp.json()
+
+
+def test_writes_update_daily_buckets():
+    seed()
+    data = report()
+    assert data["clicks"] == 5
+    assert data["leads"] == 2
+    assert data["buckets"][:2] == [
+        {
+            "day": "2025-03-01",
+            "affiliate": "partnerX",
+            "utm_source": "google",
+            "utm_medium": None,
+            "utm_campaign": "spring",
+            "clicks": 2,
+            "leads": 1,
+        },
+        {
+            "day": "2025-03-01",
+            "affiliate": "partnerY",
+            "utm_source": None,
+            "utm_medium": None,
+            "utm_campaign": None,
+            "clicks": 1,
+            "leads": 0,
+        },
+    ]
+    assert [b["day"] for b in data["buckets"]] == sorted(
+        b["day"] for b in data["buckets"]
+    )
+
+
+def test_date_range_and_affiliate_filters():
+    seed()
+    assert report(start="2025-03-02", end="2025-03-04")["clicks"] == 1
+    assert report(start="2025-03-02")["clicks"] == 2
+    assert report(end="2025-03-01")["leads"] == 1
+    data = report(affiliate="partnerY")
+    assert [(b["day"], b["clicks"]) for b in data["buckets"]] == [("2025-03-01", 1)]
+
+
+def test_inverted_range_is_rejected():
+    resp = client.get(
+        "/api/rollups",
+        params={"start": "2025-03-02", "end": "2025-03-01"},
+        headers=AUTH,
+    )
+    assert resp.status_code == 422
+
+
+def test_needs_the_export_token(monkeypatch):
+    assert client.get("/api/rollups").status_code == 401
+    resp = client.get("/api/rollups", headers={"Authorization": "Bearer nope"})
+    assert resp.status_code == 401
+    monkeypatch.delenv("EXPORT_TOKEN")
+    assert client.get("/api/rollups", headers=AUTH).status_code == 403
+
+
+def test_writes_do_not_wait_for_the_rollups(data_dir):
+    lock = rollups._lock_path(rollups.rollup_dir())
+    with file_lock(lock):  # as during a flush
+        seed()
+        assert list((data_dir / "rollups").glob("*.json")) == []
+    rollups.flush()
+    with file_lock(lock):  # the background flusher may hold the counts
+        pass
+    assert sorted(p.name for p in (data_dir / "rollups").glob("*.json")) == [
+        "2025-03-01.json",
+        "2025-03-02.json",
+        "2025-03-05.json",
+    ]
+    assert report()["clicks"] == 5
+
+
+def test_api_writes_are_rolled_up():
+    client.post("/api/track", json={"affiliate": "a1", "utm_source": "news"})
+    client.post(
+        "/api/leads",
+        json={"name": "Bo", "email": "bo@example.com", "affiliate": "a1"},
+    )
+    data = report()
+    assert (data["clicks"], data["leads"]) == (1, 1)
+    assert {b["utm_source"] for b in data["buckets"]} == {"news", None}
+
+
+def test_rebuild_matches_incremental_rollups(data_dir, capsys):
+    seed()
+    incremental = report()
+    shutil.rmtree(data_dir / "rollups")
+    # A stale day with no raw events behind it is dropped by the rebuild.
+    rollups.update("tracks", [click("2024-12-31")])
+    rollups.flush()
+    rollups.main(["rebuild", "--dir", str(data_dir)])
+    assert report() == incremental
+    assert "tracks: counted 5 record(s)" in capsys.readouterr().out
+
+
+def test_rebuild_drops_counts_it_already_counted():
+    seed()  # still buffered when the rebuild scans the stores
+    assert rollups.rebuild() == {"tracks": 5, "leads": 2}
+    assert (report()["clicks"], report()["leads"]) == (5, 2)
+
+
+def test_rebuild_includes_legacy_arrays(data_dir):
+    (data_dir / "tracks.json").write_text(
+        '[{"affiliate": "old", "timestamp": "2024-01-02T00:00:00"}]'
+    )
+    assert rollups.rebuild() == {"tracks": 1, "leads": 0}
+    assert report()["buckets"][0]["affiliate"] == "old"
+
+
+def test_disabled_rollups_skip_updates(monkeypatch):
+    monkeypatch.setenv("ROLLUPS_ENABLED", "0")
+    seed()
+    assert report()["buckets"] == []
+
+
+def test_failing_hook_does_not_fail_the_write(monkeypatch):
+    def broken(kind, records):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(storage, "WRITE_HOOKS", [broken])
+    get_store("tracks").append(click("2025-03-01"))
+    assert len(list(get_store("tracks").scan())) == 1
+
+
+@pytest.mark.parametrize("backend", ["segments", "sqlite"])
+def test_folding_the_jsonl_store_does_not_count_twice(data_dir, monkeypatch, backend):
+    monkeypatch.setenv("PERSIST_BACKEND", "jsonl")
+    get_store("tracks").append(click("2025-03-01"))
+    # A JSON array from before the rollups, never counted.
+    (data_dir / "tracks.json").write_text(f"[{json.dumps(click('2025-03-01'))}]")
+    monkeypatch.setenv("PERSIST_BACKEND", backend)
+    get_store("tracks").append(click("2025-03-02"))
+    assert len(list(get_store("tracks").scan())) == 3
+    assert report()["clicks"] == 3
@@ -0,0 +1,194 @@
+import json
+import os
+from datetime import datetime
+
+import pytest
+from fastapi.testclient import TestClient
+
+from api import storage
+from api.app import app
+from api.storage import JsonlStore, SegmentedStore, get_store
+
+client = TestClient(app)
+
+NOW = datetime(2025, 3, 20, 12)
+
+
+@pytest.fixture(autouse=True)
+def segments_backend(tmp_path, monkeypatch):
+    monkeypatch.setenv("PERSIST_DIR", str(tmp_path))
+    monkeypatch.setenv("PERSIST_BACKEND", "segments")
+    monkeypatch.setenv("ROLLUPS_ENABLED", "0")
+
+
+def event(day, n=0, hour=12):
+    return {"n": n, "timestamp": f"{day}T{hour:02d}:00:00.000000"}
+
+
+def names(store):
+    return sorted(os.listdir(store.path))
+
+
+def test_records_are_partitioned_by_day(tmp_path):
+    store = get_store("tracks")
+    assert isinstance(store, SegmentedStore)
+    store.extend([event("2025-03-01", 1), event("2025-03-02", 2)])
+    store.append(event("2025-03-01", 3))
+    assert names(store) == ["2025-03-01.jsonl", "2025-03-02.jsonl"]
+    assert [r["n"] for r in store.scan()] == [1, 3, 2]
+    assert (tmp_path / "tracks.lock").exists()
+
+
+def test_month_granularity(monkeypatch):
+    monkeypatch.setenv("PERSIST_SEGMENT", "month")
+    store = get_store("leads")
+    store.extend([event("2025-02-28", 1), event("2025-03-01", 2)])
+    assert names(store) == ["2025-02.jsonl", "2025-03.jsonl"]
+    segment = store.segments()[0]
+    assert (segment.first, segment.last) == ("2025-02-01", "2025-02-28")
+
+
+def test_unknown_granularity_rejected(monkeypatch):
+    monkeypatch.setenv("PERSIST_SEGMENT", "week")
+    with pytest.raises(ValueError):
+        get_store("tracks")
+
+
+def test_range_scan_reads_only_overlapping_segments(monkeypatch):
+    store = get_store("tracks")
+    store.extend(
+        [
+            event("2025-03-01", 1),
+            event("2025-03-02", 2, hour=9),
+            event("2025-03-02", 3, hour=18),
+            event("2025-03-03", 4),
+        ]
+    )
+    read = []
+    original = storage._read_segment
+
+    def spy(path):
+        read.append(os.path.basename(path))
+        return original(path)
+
+    monkeypatch.setattr(storage, "_read_segment", spy)
+    got = store.scan_range("2025-03-02T12:00:00", "2025-03-03T00:00:00")
+    assert [r["n"] for r in got] == [3]
+    assert read == ["2025-03-02.jsonl", "2025-03-03.jsonl"]
+
+
+def test_scan_range_on_other_backends(tmp_path):
+    store = JsonlStore(str(tmp_path / "x.jsonl"))
+    store.extend([event("2025-03-01", 1), event("2025-03-02", 2), {"n": 3}])
+    assert [r["n"] for r in store.scan_range("2025-03-02")] == [2]
+    assert [r["n"] for r in store.scan_range()] == [1, 2, 3]
+
+
+def test_torn_line_in_segment_is_skipped():
+    store = get_store("tracks")
+    store.append(event("2025-03-01", 1))
+    with open(os.path.join(store.path, "2025-03-01.jsonl"), "a") as f:
+        f.write('{"n": 2, "timest')
+    store.append(event("2025-03-01", 3))
+    assert [r["n"] for r in store.scan()] == [1, 3]
+
+
+def test_retention_drops_whole_segments():
+    store = get_store("tracks")
+    store.extend([event(f"2025-03-{d:02d}", d) for d in (1, 2, 3, 10)])
+    assert store.retain(days=17, now=NOW) == 2
+    assert names(store) == ["2025-03-03.jsonl", "2025-03-10.jsonl"]
+
+
+def test_retain_command_uses_per_kind_settings(tmp_path, monkeypatch, capsys):
+    get_store("tracks").append(event("2000-01-01"))
+    get_store("leads").append(event("2000-01-01"))
+    storage.main(["retain", "--dir", str(tmp_path)])
+    out = capsys.readouterr().out
+    assert "tracks: dropped 1 segment(s)" in out
+    assert "leads: dropped 0 segment(s)" in out
+    monkeypatch.setenv("LEADS_RETENTION_DAYS", "30")
+    assert storage.retain() == {"leads": 1, "tracks": 0}
+
+
+def test_retain_needs_segmented_backend(monkeypatch):
+    monkeypatch.setenv("PERSIST_BACKEND", "jsonl")
+    with pytest.raises(SystemExit):
+        storage.retain()
+
+
+def test_compaction_merges_small_closed_segments():
+    store = get_store("tracks")
+    days = [f"2025-03-{d:02d}" for d in (1, 2, 3, 4, 20)]
+    store.extend([event(day, i) for i, day in enumerate(days)])
+    before = list(store.scan())
+    segment_size = os.path.getsize(os.path.join(store.path, "2025-03-01.jsonl"))
+    merged = store.compact(target_bytes=3 * segment_size, now=NOW)
+    assert merged == 2
+    assert names(store) == [
+        "2025-03-01--2025-03-03.jsonl",
+        "2025-03-04.jsonl",
+        "2025-03-20.jsonl",
+    ]
+    assert list(store.scan()) == before
+    assert [r["n"] for r in store.scan_range("2025-03-02", "2025-03-03")] == [1]
+    # New records for a compacted day still land in (and are read from) a
+    # day segment of their own.
+    store.append(event("2025-03-02", 9))
+    assert [r["n"] for r in store.scan_range("2025-03-02", "2025-03-03")] == [1, 9]
+
+
+def test_compact_command(tmp_path, capsys):
+    store = get_store("leads")
+    store.extend([event("2024-01-01"), event("2024-01-02")])
+    storage.main(["compact", "--dir", str(tmp_path)])
+    assert "leads: merged 1 segment(s)" in capsys.readouterr().out
+    assert names(store) == ["2024-01-01--2024-01-02.jsonl"]
+
+
+def test_interrupted_compaction_neither_loses_nor_duplicates():
+    store = get_store("tracks")
+    store.extend([event("2025-03-01", 1), event("2025-03-02", 2)])
+    # Crash after the merged file was swapped in, before the sources went.
+    merged = os.path.join(store.path, "2025-03-01--2025-03-02.jsonl")
+    with open(merged, "wb") as out:
+        for name in ("2025-03-01.jsonl", "2025-03-02.jsonl"):
+            with open(os.path.join(store.path, name), "rb") as f:
+                out.write(f.read())
+    with open(store.journal, "w") as f:
+        json.dump(
+            {
+                "target": os.path.basename(merged),
+                "sources": ["2025-03-01.jsonl", "2025-03-02.jsonl"],
+            },
+            f,
+        )
+    assert [r["n"] for r in store.scan()] == [1, 2]
+    store.append(event("2025-03-05", 3))  # the next writer finishes the job
+    assert names(store) == ["2025-03-01--2025-03-02.jsonl", "2025-03-05.jsonl"]
+    assert [r["n"] for r in store.scan()] == [1, 2, 3]
+
+
+def test_legacy_files_are_folded_in_on_first_write(tmp_path):
+    (tmp_path / "tracks.json").write_text(json.dumps([event("2024-12-31", 1)]))
+    JsonlStore(str(tmp_path / "tracks.jsonl")).append(event("2025-01-01", 2))
+    store = get_store("tracks")
+    store.append(event("2025-01-02", 3))
+    assert [r["n"] for r in store.scan()] == [1, 2, 3]
+    assert (tmp_path / "tracks.json.migrated").exists()
+    assert (tmp_path / "tracks.jsonl.migrated").exists()
+    assert not (tmp_path / "tracks.jsonl").exists()
+
+
+def test_migrate_command_folds_into_segments(tmp_path, capsys):
+    JsonlStore(str(tmp_path / "leads.jsonl")).append(event("2025-01-01", 1))
+    storage.main(["migrate", "--dir", str(tmp_path)])
+    assert "leads: migrated 1 record(s)" in capsys.readouterr().out
+    assert names(get_store("leads")) == ["2025-01-01.jsonl"]
+
+
+def test_api_writes_use_segments():
+    client.post("/api/track", json={"affiliate": "partnerX"})
+    records = list(get_store("tracks").scan())
+    assert [r["affiliate"] for r in records] == ["partnerX"]
+    assert names(get_store("tracks")) == [records[0]["timestamp"][:10] + ".jsonl"]
@@ -0,0 +1,73 @@
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+import api.app as app_module
+import api.serialization as serialization
+from api.app import app
+from api.cache import LRUCache
+
+client = TestClient(app)
+
+PAYLOADS = [
+    {
+        "vehicle_price": 20000,
+        "down_payment": 2000,
+        "apr": 3.0,
+        "term_months": 60,
+        "tax_rate": 0.07,
+        "fees": 500,
+    },
+    {"vehicle_price": 10000, "apr": 0, "term_months": 10},
+    {
+        "vehicle_price": 82000.55,
+        "down_payment": 8000,
+        "apr": 7.49,
+        "term_months": 240,
+        "tax_rate": 0.0825,
+        "fees": 649.99,
+    },
+    {"vehicle_price": 10000, "apr": 5, "term_months": 12, "trade_in_value": 15000},
+    {"vehicle_price": 0.01, "apr": 99.9, "term_months": 1},
+    {"vehicle_price": 3e16, "apr": 4, "term_months": 3},
+]
+QUERIES = [
+    "",
+    "?schedule=none",
+    "?offset=5&limit=3",
+    "?months=2&months=1",
+    "?limit=12&summary=yearly",
+]
+
+
+@pytest.fixture(autouse=True)
+def no_cache(monkeypatch):
+    monkeypatch.setattr(app_module, "quote_cache", LRUCache(maxsize=0))
+
+
+@pytest.mark.parametrize("engine", ["cents", "decimal"])
+@pytest.mark.parametrize("query", QUERIES)
+@pytest.mark.parametrize("payload", PAYLOADS)
+def test_fast_serializer_is_byte_compatible(monkeypatch, engine, query, payload):
+    monkeypatch.setenv("QUOTE_ENGINE", engine)
+    monkeypatch.setenv("QUOTE_SERIALIZER", "pydantic")
+    reference = client.post(f"/api/quote{query}", json=payload)
+    monkeypatch.setenv("QUOTE_SERIALIZER", "fast")
+    fast = client.post(f"/api/quote{query}", json=payload)
+    assert fast.status_code == reference.status_code == 200
+    assert fast.content == reference.content
+    assert fast.headers["content-type"] == reference.headers["content-type"]
+
+
+def test_dumps_matches_stdlib_without_orjson(monkeypatch):
+    monkeypatch.setattr(serialization, "orjson", None)
+    content = {"a": 1.5, "b": [1, 2.25], "c": "é"}
+    assert (
+        serialization.dumps(content)
+        == json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode()
+    )
+
+
+def test_dumps_large_values_use_stdlib_formatting():
+    assert serialization.dumps({"v": 1e16}, max_magnitude=1e16) == b'{"v":1e+16}'
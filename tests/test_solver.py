@@ -0,0 +1,192 @@
+import math
+
+import pytest
+from fastapi.testclient import TestClient
+from hypothesis import given, settings
+from hypothesis import strategies as st
+
+from api import solver
+from api.app import QUOTE_SOLVE_MAX_TERM, app
+
+client = TestClient(app)
+
+payments = st.decimals(min_value="25", max_value=5000, places=2).map(float)
+rates = st.decimals(min_value=0, max_value=36, places=3).map(float)
+terms = st.integers(min_value=1, max_value=360)
+money = st.decimals(min_value=0, max_value=20000, places=2).map(float)
+tax_rates = st.decimals(min_value=0, max_value="0.15", places=4).map(float)
+
+
+def solve(**body):
+    return client.post("/api/quote/solve", json=body)
+
+
+def monthly_payment(inputs: dict) -> float:
+    resp = client.post("/api/quote?schedule=none", json=inputs)
+    assert resp.status_code == 200
+    return resp.json()["monthly_payment"]
+
+
+@settings(max_examples=60, deadline=None)
+@given(
+    target=payments,
+    apr=rates,
+    term=terms,
+    down=money,
+    tax=tax_rates,
+    fees=money,
+    trade=money,
+)
+def test_max_price_round_trips(target, apr, term, down, tax, fees, trade):
+    resp = solve(
+        target_payment=target,
+        solve_for="vehicle_price",
+        apr=apr,
+        term_months=term,
+        down_payment=down,
+        tax_rate=tax,
+        fees=fees,
+        trade_in_value=trade,
+    )
+    if resp.status_code == 422:
+        # Even a one-cent car costs more than the target (fees and taxes).
+        assert (
+            monthly_payment(
+                {
+                    "vehicle_price": 0.01,
+                    "apr": apr,
+                    "term_months": term,
+                    "down_payment": down,
+                    "tax_rate": tax,
+                    "fees": fees,
+                    "trade_in_value": trade,
+                }
+            )
+            > target
+        )
+        return
+    data = resp.json()
+    inputs = data["inputs"]
+    assert monthly_payment(inputs) == data["quote"]["monthly_payment"] <= target
+    assert data["exact"] == (data["quote"]["monthly_payment"] == target)
+    # One more cent of price no longer fits the budget.
+    over = {**inputs, "vehicle_price": round(inputs["vehicle_price"] + 0.01, 2)}
+    assert monthly_payment(over) > target
+
+
+@settings(max_examples=60, deadline=None)
+@given(
+    target=payments,
+    price=st.decimals(min_value="1000", max_value=150000, places=2).map(float),
+    apr=rates,
+    term=terms,
+)
+def test_min_down_payment_round_trips(target, price, apr, term):
+    resp = solve(
+        target_payment=target,
+        solve_for="down_payment",
+        vehicle_price=price,
+        apr=apr,
+        term_months=term,
+    )
+    assert resp.status_code == 200
+    data = resp.json()
+    inputs = data["inputs"]
+    assert monthly_payment(inputs) == data["quote"]["monthly_payment"] <= target
+    if inputs["down_payment"] > 0:
+        under = {**inputs, "down_payment": round(inputs["down_payment"] - 0.01, 2)}
+        assert monthly_payment(under) > target
+
+
+@settings(max_examples=60, deadline=None)
+@given(
+    target=payments,
+    price=st.decimals(min_value="1000", max_value=150000, places=2).map(float),
+    apr=rates,
+)
+def test_min_term_round_trips(target, price, apr):
+    resp = solve(
+        target_payment=target, solve_for="term_months", vehicle_price=price, apr=apr
+    )
+    inputs = {"vehicle_price": price, "apr": apr}
+    if resp.status_code == 422:
+        longest = {**inputs, "term_months": QUOTE_SOLVE_MAX_TERM}
+        assert monthly_payment(longest) > target
+        return
+    data = resp.json()
+    term = data["value"]
+    assert isinstance(term, int)
+    assert monthly_payment({**inputs, "term_months": term}) <= target
+    if term > 1:
+        assert monthly_payment({**inputs, "term_months": term - 1}) > target
+
+
+def test_price_for_known_payment_is_exact():
+    # 20000 @ 3% over 60 months with 7% tax and 500 fees is 357.58/month.
+    data = solve(
+        target_payment=357.58,
+        solve_for="vehicle_price",
+        down_payment=2000,
+        apr=3.0,
+        term_months=60,
+        tax_rate=0.07,
+        fees=500,
+    ).json()
+    assert data["exact"] is True
+    assert data["quote"]["monthly_payment"] == 357.58
+    assert data["quote"]["schedule"] == []
+    assert data["quote"]["schedule_months"] == 60
+    assert data["value"] >= 20000
+
+
+def test_zero_apr_term_is_ceiling_of_division():
+    data = solve(
+        target_payment=448.72, solve_for="term_months", vehicle_price=35000, apr=0
+    ).json()
+    assert data["value"] == math.ceil(35000 / 448.72)
+
+
+def test_down_payment_is_zero_when_already_affordable():
+    data = solve(
+        target_payment=1000,
+        solve_for="down_payment",
+        vehicle_price=10000,
+        apr=5,
+        term_months=60,
+    ).json()
+    assert data["value"] == 0
+
+
+def test_unreachable_term_is_rejected():
+    # 10/month does not even cover the interest on 35000 at 6.9%.
+    resp = solve(
+        target_payment=10, solve_for="term_months", vehicle_price=35000, apr=6.9
+    )
+    assert resp.status_code == 422
+    assert "term_months" in resp.json()["detail"]
+
+
+@pytest.mark.parametrize(
+    "body",
+    [
+        {"solve_for": "vehicle_price", "apr": 5},
+        {"solve_for": "term_months", "apr": 5},
+        {"solve_for": "down_payment", "vehicle_price": 20000, "apr": 5},
+        {"solve_for": "apr", "vehicle_price": 20000, "term_months": 60},
+        {"target_payment": 0, "solve_for": "vehicle_price", "apr": 5, "term_months": 1},
+    ],
+)
+def test_invalid_requests_are_rejected(body):
+    body = {"target_payment": 400, **body}
+    assert solve(**body).status_code == 422
+
+
+def test_bracket_search_finds_step_edges():
+    def payment(x):
+        return x // 7
+
+    assert solver.max_within(payment, 10, guess=0, lo=0, hi=1000) == 76
+    assert solver.max_within(payment, 10, guess=900, lo=0, hi=1000) == 76
+    assert solver.min_within(lambda x: 100 - x // 7, 90, 0, 0, 1000) == 70
+    with pytest.raises(solver.NoSolution):
+        solver.max_within(payment, 10, guess=0, lo=100, hi=1000)
@@ -0,0 +1,143 @@
+import json
+import multiprocessing
+import sqlite3
+
+import pytest
+from fastapi.testclient import TestClient
+
+from api import export, rollups, storage
+from api.app import app
+from api.storage import JsonlStore, SqliteStore, get_store
+
+client = TestClient(app)
+
+
+@pytest.fixture(autouse=True)
+def sqlite_backend(tmp_path, monkeypatch):
+    monkeypatch.setenv("PERSIST_DIR", str(tmp_path))
+    monkeypatch.setenv("PERSIST_BACKEND", "sqlite")
+    monkeypatch.setenv("ROLLUPS_ENABLED", "0")
+
+
+def event(day, n=0, **fields):
+    return {"n": n, "timestamp": f"{day}T12:00:00.000000", **fields}
+
+
+def test_records_round_trip_in_order(tmp_path):
+    store = get_store("tracks")
+    assert isinstance(store, SqliteStore)
+    assert list(store.scan()) == []
+    assert not (tmp_path / "tracks.sqlite3").exists()  # reads create nothing
+    store.extend([event("2025-03-02", 1, nested={"a": [1]}), event("2025-03-01", 2)])
+    store.append({"n": 3})
+    assert [r["n"] for r in store.scan()] == [1, 2, 3]
+    assert next(store.scan())["nested"] == {"a": [1]}
+    assert store.size() > 0
+    assert (tmp_path / "tracks.sqlite3.lock").exists()
+
+
+def test_database_is_indexed_and_in_wal_mode(tmp_path):
+    get_store("leads").append(event("2025-03-01"))
+    conn = sqlite3.connect(tmp_path / "leads.sqlite3")
+    assert conn.execute("PRAGMA journal_mode").fetchone() == ("wal",)
+    indexes = {row[1] for row in conn.execute("PRAGMA index_list(leads)")}
+    assert indexes == {
+        "idx_leads_timestamp",
+        "idx_leads_affiliate",
+        "idx_leads_utm_source",
+    }
+    plan = conn.execute(
+        "EXPLAIN QUERY PLAN SELECT data FROM leads WHERE affiliate = ?", ("a",)
+    ).fetchall()
+    assert "idx_leads_affiliate" in str(plan)
+
+
+def test_range_and_field_selection():
+    store = get_store("tracks")
+    store.extend(
+        [
+            event("2025-03-01", 1, affiliate="a", utm_source="x"),
+            event("2025-03-02", 2, affiliate="b", utm_source="x"),
+            event("2025-03-03", 3, affiliate="a", utm_source="y", medium="m"),
+            {"n": 4, "affiliate": "a"},
+        ]
+    )
+    assert [r["n"] for r in store.scan_range("2025-03-02", "2025-03-03")] == [2]
+    assert [r["n"] for r in store.select(affiliate="a")] == [1, 3, 4]
+    assert [r["n"] for r in store.select("2025-03-01", affiliate="a")] == [1, 3]
+    assert [r["n"] for r in store.select(utm_source="x", affiliate=None)] == [1, 2]
+    assert [r["n"] for r in store.select(medium="m")] == [3]  # not indexed
+
+
+def test_select_on_other_backends(monkeypatch):
+    monkeypatch.setenv("PERSIST_BACKEND", "jsonl")
+    store = get_store("tracks")
+    store.extend([event("2025-03-01", 1, affiliate="a"), event("2025-03-02", 2)])
+    assert [r["n"] for r in store.select("2025-03-01", affiliate="a")] == [1]
+
+
+def test_connections_are_pooled():
+    store = get_store("tracks")
+    for n in range(5):
+        store.append(event("2025-03-01", n))
+        list(store.scan())
+    assert len(store.pool._idle) == 1
+    before = storage.SQLITE_CONNECTIONS.samples()[("tracks",)]
+    with store.pool.connection(), store.pool.connection():
+        pass
+    assert storage.SQLITE_CONNECTIONS.samples()[("tracks",)] == before + 1
+
+
+def _write(barrier, worker):
+    barrier.wait()
+    store = get_store("tracks")
+    for n in range(20):
+        store.extend([event("2025-03-01", worker * 100 + n)] * 2)
+
+
+def test_concurrent_writers_from_several_processes():
+    ctx = multiprocessing.get_context("fork")
+    barrier = ctx.Barrier(4)
+    procs = [ctx.Process(target=_write, args=(barrier, w)) for w in range(4)]
+    for p in procs:
+        p.start()
+    for p in procs:
+        p.join(30)
+    assert [p.exitcode for p in procs] == [0, 0, 0, 0]
+    records = list(get_store("tracks").scan())
+    assert len(records) == 160
+    assert len({r["n"] for r in records}) == 80
+
+
+def test_legacy_files_are_imported_on_first_write(tmp_path):
+    (tmp_path / "tracks.json").write_text(json.dumps([event("2024-12-31", 1)]))
+    JsonlStore(str(tmp_path / "tracks.jsonl")).append(event("2025-01-01", 2))
+    store = get_store("tracks")
+    store.append(event("2025-01-02", 3))
+    assert [r["n"] for r in store.scan()] == [1, 2, 3]
+    assert (tmp_path / "tracks.json.migrated").exists()
+    assert (tmp_path / "tracks.jsonl.migrated").exists()
+
+
+def test_migrate_command_imports_into_sqlite(tmp_path, monkeypatch, capsys):
+    monkeypatch.setenv("PERSIST_BACKEND", "jsonl")
+    leads = [event("2025-01-01", n, affiliate="a") for n in range(3)]
+    (tmp_path / "leads.json").write_text(json.dumps(leads))
+    storage.main(["migrate", "--backend", "sqlite", "--dir", str(tmp_path)])
+    assert "leads: migrated 3 record(s)" in capsys.readouterr().out
+    store = get_store("leads")
+    assert isinstance(store, SqliteStore)
+    assert [r["n"] for r in store.select(affiliate="a")] == [0, 1, 2]
+    assert not (tmp_path / "leads.json").exists()
+
+
+def test_api_writes_exports_and_rollups(tmp_path, monkeypatch):
+    monkeypatch.setenv("ROLLUPS_ENABLED", "1")
+    monkeypatch.setenv("EXPORT_TOKEN", "secret")
+    client.post("/api/track", json={"affiliate": "partnerX", "utm_source": "g"})
+    lead = {"name": "Jo", "email": "jo@example.com", "affiliate": "partnerX"}
+    assert client.post("/api/leads", json=lead).status_code == 200
+    assert [r["affiliate"] for r in get_store("tracks").scan()] == ["partnerX"]
+    rows = list(export.records(export.Query("leads", affiliate="partnerX")))
+    assert [r["email"] for r in rows] == ["jo@example.com"]
+    assert rollups.rebuild() == {"tracks": 1, "leads": 1}
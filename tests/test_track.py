@@ -8,14 +8,14 @@ client = TestClient(app)
 
 
 def test_track_persistence(tmp_path, monkeypatch):
-    """Tests that a valid tracking event is persisted to a JSON file."""
+    """Tests that a valid tracking event is persisted to the JSON Lines store."""
     monkeypatch.setenv("PERSIST_DIR", str(tmp_path))
     payload = {"affiliate": "partner1"}
     resp = client.post("/api/track", json=payload)
     assert resp.status_code == 200
-    track_file = tmp_path / "tracks.json"
+    track_file = tmp_path / "tracks.jsonl"
     assert track_file.exists()
-    data = json.loads(track_file.read_text())
+    data = [json.loads(line) for line in track_file.read_text().splitlines()]
     assert data[0]["affiliate"] == "partner1"
 
 
@@ -25,7 +25,7 @@ def test_track_invalid_affiliate(tmp_path, monkeypatch):
     payload = {"affiliate": ""}
     resp = client.post("/api/track", json=payload)
     assert resp.status_code == 422
-    assert not (tmp_path / "tracks.json").exists()
+    assert not (tmp_path / "tracks.jsonl").exists()
 
 
 def test_track_multiple_appends(tmp_path, monkeypatch):
@@ -36,15 +36,15 @@ def test_track_multiple_appends(tmp_path, monkeypatch):
     r1 = client.post("/api/track", json=payload1)
     r2 = client.post("/api/track", json=payload2)
     assert r1.status_code == 200 and r2.status_code == 200
-    track_file = tmp_path / "tracks.json"
-    data = json.loads(track_file.read_text())
+    track_file = tmp_path / "tracks.jsonl"
+    data = [json.loads(line) for line in track_file.read_text().splitlines()]
     assert len(data) == 2
     assert data[0]["affiliate"] == "p1"
     assert data[1]["affiliate"] == "p2"
 
 
 def test_track_corrupt_file_returns_500_and_unmodified(tmp_path, monkeypatch):
-    """If tracks.json is corrupt, API should return 500 and not overwrite it."""
+    """If a legacy tracks.json is corrupt, API should return 500 and not touch it."""
     monkeypatch.setenv("PERSIST_DIR", str(tmp_path))
     track_file = tmp_path / "tracks.json"
     original = "not valid json"
@@ -72,7 +72,10 @@ def test_track_persists_utms_when_provided(tmp_path, monkeypatch):
     }
     resp = client.post("/api/track", json=payload)
     assert resp.status_code == 200
-    data = json.loads((tmp_path / "tracks.json").read_text())
+    data = [
+        json.loads(line)
+        for line in (tmp_path / "tracks.jsonl").read_text().splitlines()
+    ]
     assert data[0]["affiliate"] == "partnerX"
     # UTMs are optional but should be present when provided
     assert data[0]["utm_source"] == "newsletter"
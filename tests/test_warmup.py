@@ -0,0 +1,161 @@
+import os
+import signal
+import sys
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+import api.app as app_module
+from api import serve
+from api.app import app
+from api.cache import LRUCache
+from api.metrics import render
+from api.warmup import WARMUP, Warmup
+
+
+@pytest.fixture
+def fresh(tmp_path, monkeypatch):
+    """A data dir and a worker that has not warmed up yet."""
+    monkeypatch.setenv("PERSIST_DIR", str(tmp_path))
+    monkeypatch.setattr(WARMUP, "done", {})
+    monkeypatch.setattr(app_module, "quote_cache", LRUCache(maxsize=100))
+
+
+def wait_ready(client):
+    for _ in range(500):
+        resp = client.get("/api/ready")
+        if resp.status_code != 503 or resp.json()["status"] == "failed":
+            return resp
+        time.sleep(0.01)
+    raise AssertionError("never ready")
+
+
+def test_ready_after_warmup(fresh, tmp_path):
+    assert TestClient(app).get("/api/ready").status_code == 503  # no lifespan
+    with TestClient(app) as c:
+        resp = wait_ready(c)
+        assert c.get("/api/health").status_code == 200
+        text = render()
+    assert resp.status_code == 200
+    body = resp.json()
+    assert body["status"] == "ready"
+    assert list(body["steps"]) == ["quotes", "persistence", "cache", "openapi"]
+    assert len(app_module.quote_cache) == 0  # sample quotes bypass the cache
+    assert (tmp_path / "leads.jsonl.lock").exists()
+    assert "workers_ready 1" in text
+    assert 'warmup_seconds{step="quotes"}' in text
+    assert "workers_ready 0" in render()  # shut down
+
+
+def test_steps_are_configurable(fresh, monkeypatch):
+    monkeypatch.setenv("WARMUP_STEPS", "cache, openapi")
+    monkeypatch.setenv("QUOTE_CACHE_PREWARM", "1")
+    monkeypatch.setenv("QUOTE_CACHE_PREWARM_PRICES", "10000")
+    monkeypatch.setattr(app, "openapi_schema", None)
+    with TestClient(app) as c:
+        assert list(wait_ready(c).json()["steps"]) == ["cache", "openapi"]
+    assert len(app_module.quote_cache) == 8
+    assert app.openapi_schema is not None
+    monkeypatch.setenv("WARMUP_STEPS", "")
+    monkeypatch.setattr(WARMUP, "done", {})
+    with TestClient(app) as c:
+        assert wait_ready(c).json() == {"status": "ready", "steps": {}}
+
+
+def test_failed_step_keeps_the_worker_unready(monkeypatch):
+    warmup = Warmup()
+    calls = []
+    warmup.step("ok")(lambda: calls.append("ok"))
+
+    @warmup.step("disk")
+    def disk():
+        calls.append("disk")
+        if len(calls) < 3:
+            raise OSError("read-only file system")
+
+    warmup.run()
+    assert not warmup.ready
+    assert warmup.status()["failed"] == {
+        "step": "disk",
+        "error": "OSError: read-only file system",
+    }
+    warmup.run()  # a retry resumes at the failed step
+    assert warmup.ready and calls == ["ok", "disk", "disk"]
+    monkeypatch.setenv("WARMUP_STEPS", "ok,typo")
+    warmup.reset()
+    warmup.run()
+    assert warmup.status()["failed"]["error"].startswith("ValueError: unknown")
+
+
+def test_steps_done_before_a_fork_are_not_repeated():
+    warmup = Warmup()
+    runs = []
+    warmup.step("slow")(lambda: runs.append(os.getpid()))
+    warmup.run()
+    pid = os.fork()
+    if pid == 0:
+        warmup.start().join()
+        os._exit(0 if warmup.ready and len(runs) == 1 else 1)
+    assert os.waitstatus_to_exitcode(os.waitpid(pid, 0)[1]) == 0
+
+
+def test_supervisor_replaces_and_stops_workers(tmp_path, monkeypatch):
+    monkeypatch.setattr(serve, "RESPAWN_DELAY", 0)
+    starts = tmp_path / "starts"
+
+    def worker():
+        with open(starts, "a") as fh:
+            fh.write(f"{os.getpid()}\n")
+        if len(starts.read_text().split()) == 1:
+            os._exit(3)  # the first worker crashes
+        signal.pause()
+        os._exit(0)
+
+    supervisor = os.fork()
+    if supervisor == 0:
+        try:
+            serve.supervise(worker, 2)
+        finally:
+            os._exit(0)
+    for _ in range(500):
+        if starts.exists() and len(starts.read_text().split()) == 3:
+            break
+        time.sleep(0.01)
+    workers = [int(p) for p in starts.read_text().split()]
+    assert len(workers) == 3
+    os.kill(supervisor, signal.SIGTERM)
+    _, status = os.waitpid(supervisor, 0)
+    assert os.waitstatus_to_exitcode(status) == 0
+    for pid in workers:
+        with pytest.raises(ProcessLookupError):
+            os.kill(pid, 0)
+
+
+def test_serve_forks_warm_uvicorn_workers(tmp_path):
+    pytest.importorskip("uvicorn")
+    import socket
+    import subprocess
+
+    import httpx
+
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "api.serve", "--port", str(port), "--workers", "2"],
+        env={**os.environ, "PERSIST_DIR": str(tmp_path)},
+    )
+    try:
+        for _ in range(300):
+            try:
+                resp = httpx.get(f"http://127.0.0.1:{port}/api/ready")
+                if resp.status_code == 200:
+                    break
+            except httpx.HTTPError:
+                pass
+            time.sleep(0.1)
+        assert resp.json()["status"] == "ready"
+    finally:
+        proc.terminate()
+        assert proc.wait(30) == 0
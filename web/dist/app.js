@@ -1,15 +1,28 @@
 const params = new URLSearchParams(window.location.search);
 const aff = params.get('aff');
-['utm_source', 'utm_medium', 'utm_campaign', 'utm_term', 'utm_content'].forEach(k => {
+const UTM_KEYS = ['utm_source', 'utm_medium', 'utm_campaign', 'utm_term', 'utm_content'];
+const utm = {};
+UTM_KEYS.forEach(k => {
   const v = params.get(k);
-  if (v) localStorage.setItem(k, v);
+  if (v) {
+    localStorage.setItem(k, v);
+    utm[k] = v;
+  }
 });
+// Sent with writes so the API stores a retried request only once.
+function newIdempotencyKey() {
+  if (window.crypto && crypto.randomUUID) {
+    return crypto.randomUUID();
+  }
+  return Date.now().toString(36) + '-' + Math.random().toString(36).slice(2);
+}
+
 if (aff) {
   localStorage.setItem('affiliate', aff);
   fetch('/api/track', {
     method: 'POST',
-    headers: { 'Content-Type': 'application/json' },
-    body: JSON.stringify({ affiliate: aff })
+    headers: { 'Content-Type': 'application/json', 'Idempotency-Key': newIdempotencyKey() },
+    body: JSON.stringify({ affiliate: aff, ...utm })
   });
 }
 
@@ -43,7 +56,11 @@ const scheduleToggleBtn = document.getElementById('amortization-view-toggle');
 const scheduleTableContainer = document.getElementById('amortization-table-container');
 const amortizationCanvas = document.getElementById('amortization-chart');
 const SCHEDULE_PAGE_SIZE = 12;
+// Longer schedules are fetched a page at a time; the chart uses yearly points.
+const SCHEDULE_PAGED_MIN_MONTHS = SCHEDULE_PAGE_SIZE * 2;
 let scheduleRows = [];
+let scheduleTotal = 0;
+let schedulePayload = null;
 let scheduleExpanded = false;
 let amortizationChart;
 
@@ -86,14 +103,62 @@ function renderSchedule() {
   });
 }
 
-function updateSchedule(rows) {
-  scheduleRows = (rows || []).map((row) => ({
+// The schedule is requested in the columnar wire format: parallel arrays of
+// integer cents, each stored as its first value followed by differences.
+const SCHEDULE_FORMAT = { format: 'columnar', encoding: 'delta' };
+
+// Quotes are fetched with GET in the API's canonical form (parameters sorted
+// by name, defaults left out), so the browser and the proxy can cache them.
+const QUOTE_DEFAULTS = { down_payment: 0, tax_rate: 0, fees: 0, trade_in_value: 0, offset: 0 };
+
+function quoteUrl(payload, options) {
+  const params = { ...payload, ...options, ...SCHEDULE_FORMAT };
+  const query = Object.keys(params)
+    .filter(name => params[name] !== QUOTE_DEFAULTS[name])
+    .sort()
+    .map(name => `${name}=${encodeURIComponent(params[name])}`)
+    .join('&');
+  return `/api/quote?${query}`;
+}
+
+function columnarRows(schedule) {
+  const columns = {};
+  for (const [name, values] of Object.entries(schedule || {})) {
+    let running = 0;
+    columns[name] = values.map((value) => (running += value));
+  }
+  return (columns.month || []).map((month, i) => ({
+    month,
+    payment: columns.payment[i] / 100,
+    principal: columns.principal[i] / 100,
+    interest: columns.interest[i] / 100,
+    balance: columns.balance[i] / 100
+  }));
+}
+
+function toScheduleRows(rows) {
+  return (rows || []).map((row) => ({
     month: row.month,
     payment: row.payment,
     principal: row.principal,
     interest: row.interest,
     balance: row.balance
   }));
+}
+
+// Yearly summaries carry the same fields as monthly rows; plot them at the
+// last month of each year so the chart axis stays in months.
+function yearlyChartRows(yearly, totalMonths) {
+  return (yearly || []).map((year) => ({
+    month: Math.min(year.year * 12, totalMonths),
+    principal: year.principal,
+    balance: year.balance
+  }));
+}
+
+function updateSchedule(rows, totalMonths, chartRows) {
+  scheduleRows = toScheduleRows(rows);
+  scheduleTotal = totalMonths ?? scheduleRows.length;
   scheduleExpanded = false;
 
   if (!scheduleRows.length) {
@@ -108,27 +173,45 @@ function updateSchedule(rows) {
   }
 
   renderSchedule();
-  updateAmortizationChart(scheduleRows);
+  updateAmortizationChart(chartRows || scheduleRows);
 
   if (!scheduleToggleBtn) {
-    setScheduleStatus(`Showing all ${scheduleRows.length} months.`, 'info');
+    setScheduleStatus(`Showing all ${scheduleTotal} months.`, 'info');
     return;
   }
 
-  if (scheduleRows.length > SCHEDULE_PAGE_SIZE) {
+  if (scheduleTotal > SCHEDULE_PAGE_SIZE) {
     scheduleToggleBtn.hidden = false;
-    scheduleToggleBtn.textContent = `Show full schedule (${scheduleRows.length} months)`;
+    scheduleToggleBtn.textContent = `Show full schedule (${scheduleTotal} months)`;
     scheduleToggleBtn.setAttribute('aria-expanded', 'false');
-    setScheduleStatus(`Showing first ${SCHEDULE_PAGE_SIZE} of ${scheduleRows.length} months.`, 'info');
+    setScheduleStatus(`Showing first ${SCHEDULE_PAGE_SIZE} of ${scheduleTotal} months.`, 'info');
   } else {
     scheduleToggleBtn.hidden = true;
     scheduleToggleBtn.setAttribute('aria-expanded', 'false');
-    setScheduleStatus(`Showing all ${scheduleRows.length} months.`, 'info');
+    setScheduleStatus(`Showing all ${scheduleTotal} months.`, 'info');
+  }
+}
+
+// Fetch the rows after the first page only when the user expands the table.
+async function loadRemainingSchedule() {
+  if (!schedulePayload || scheduleRows.length >= scheduleTotal) return true;
+  setScheduleStatus('Loading full schedule…', 'loading');
+  try {
+    const response = await fetch(quoteUrl(schedulePayload, { offset: scheduleRows.length }));
+    if (!response.ok) throw new Error(`HTTP ${response.status}`);
+    const data = await response.json();
+    scheduleRows = scheduleRows.concat(columnarRows(data.schedule));
+    return true;
+  } catch (err) {
+    console.error('Failed to load full schedule', err);
+    setScheduleStatus('Unable to load the full schedule. Please try again.', 'error');
+    return false;
   }
 }
 
 function startScheduleLoading() {
   scheduleRows = [];
+  scheduleTotal = 0;
   scheduleExpanded = false;
   if (scheduleTableBody) {
     scheduleTableBody.innerHTML = '';
@@ -149,6 +232,8 @@ function finishScheduleLoading() {
 
 function showScheduleError(message) {
   scheduleRows = [];
+  scheduleTotal = 0;
+  schedulePayload = null;
   scheduleExpanded = false;
   if (scheduleTableBody) {
     scheduleTableBody.innerHTML = '';
@@ -164,22 +249,28 @@ function showScheduleError(message) {
 }
 
 if (scheduleToggleBtn) {
-  scheduleToggleBtn.addEventListener('click', () => {
+  scheduleToggleBtn.addEventListener('click', async () => {
     if (!scheduleRows.length) return;
+    if (!scheduleExpanded) {
+      scheduleToggleBtn.disabled = true;
+      const loaded = await loadRemainingSchedule();
+      scheduleToggleBtn.disabled = false;
+      if (!loaded) return;
+    }
     scheduleExpanded = !scheduleExpanded;
     renderSchedule();
     scheduleToggleBtn.setAttribute('aria-expanded', String(scheduleExpanded));
     if (scheduleExpanded) {
       scheduleToggleBtn.textContent = 'Collapse schedule';
-      setScheduleStatus(`Showing all ${scheduleRows.length} months.`, 'info');
+      setScheduleStatus(`Showing all ${scheduleTotal} months.`, 'info');
     } else {
-      scheduleToggleBtn.textContent = scheduleRows.length > SCHEDULE_PAGE_SIZE
-        ? `Show full schedule (${scheduleRows.length} months)`
+      scheduleToggleBtn.textContent = scheduleTotal > SCHEDULE_PAGE_SIZE
+        ? `Show full schedule (${scheduleTotal} months)`
         : 'Show full schedule';
-      if (scheduleRows.length > SCHEDULE_PAGE_SIZE) {
-        setScheduleStatus(`Showing first ${SCHEDULE_PAGE_SIZE} of ${scheduleRows.length} months.`, 'info');
+      if (scheduleTotal > SCHEDULE_PAGE_SIZE) {
+        setScheduleStatus(`Showing first ${SCHEDULE_PAGE_SIZE} of ${scheduleTotal} months.`, 'info');
       } else {
-        setScheduleStatus(`Showing all ${scheduleRows.length} months.`, 'info');
+        setScheduleStatus(`Showing all ${scheduleTotal} months.`, 'info');
       }
     }
   });
@@ -450,13 +541,11 @@ async function calc(){
       trade_in_value: 0
     };
 
-    const response = await fetch('/api/quote', {
-      method: 'POST',
-      headers: {
-        'Content-Type': 'application/json'
-      },
-      body: JSON.stringify(payload)
-    });
+    // Long terms: fetch only the first page plus yearly points for the chart.
+    const paged = termMonths >= SCHEDULE_PAGED_MIN_MONTHS;
+    const response = await fetch(
+      quoteUrl(payload, paged ? { limit: SCHEDULE_PAGE_SIZE, summary: 'yearly' } : {})
+    );
 
     if (!response.ok) {
       let message = 'Unable to compute loan details. Please try again.';
@@ -480,7 +569,14 @@ async function calc(){
     animateNumber(document.getElementById('tot'), data.total_cost);
 
     updateChart(data.amount_financed, data.total_interest);
-    updateSchedule(data.schedule || []);
+    schedulePayload = payload;
+    const rows = columnarRows(data.schedule);
+    const totalMonths = data.schedule_months ?? rows.length;
+    updateSchedule(
+      rows,
+      totalMonths,
+      data.yearly ? yearlyChartRows(data.yearly, totalMonths) : null
+    );
 
     calcStatus.className = 'calculation-status show success';
     calcStatus.textContent = 'Calculation completed successfully!';
@@ -525,6 +621,38 @@ function closeLeadModal() {
   document.getElementById('lead-form').addEventListener('submit', handleLeadSubmission);
 }
 
+// The last lead submitted and its key: resubmitting the same details after a
+// failure reuses the key, so a lead that did reach the server is not duplicated.
+let lastLead = { body: null, key: null };
+const LEAD_RETRY_DELAYS_MS = [500, 1500];
+
+async function postLead(body) {
+  if (body !== lastLead.body) {
+    lastLead = { body, key: newIdempotencyKey() };
+  }
+  for (let attempt = 0; ; attempt++) {
+    try {
+      const response = await fetch('/api/leads', {
+        method: 'POST',
+        headers: {
+          'Content-Type': 'application/json',
+          'Idempotency-Key': lastLead.key
+        },
+        body
+      });
+      if (response.status < 500 || attempt >= LEAD_RETRY_DELAYS_MS.length) {
+        return response;
+      }
+    } catch (error) {
+      // Network failure: the lead may or may not have been stored.
+      if (attempt >= LEAD_RETRY_DELAYS_MS.length) {
+        throw error;
+      }
+    }
+    await new Promise(resolve => setTimeout(resolve, LEAD_RETRY_DELAYS_MS[attempt]));
+  }
+}
+
 async function handleLeadSubmission(e) {
   e.preventDefault();
   
@@ -544,16 +672,13 @@ async function handleLeadSubmission(e) {
       phone: document.getElementById('lead-phone').value || null,
       vehicle_type: document.getElementById('lead-vehicle').value,
       price: parseFloat(document.getElementById('lead-price').value) || null,
-      affiliate: localStorage.getItem('affiliate') || null
+      affiliate: localStorage.getItem('affiliate') || null,
+      utm_source: localStorage.getItem('utm_source') || null,
+      utm_medium: localStorage.getItem('utm_medium') || null,
+      utm_campaign: localStorage.getItem('utm_campaign') || null
     };
     
-    const response = await fetch('/api/leads', {
-      method: 'POST',
-      headers: {
-        'Content-Type': 'application/json'
-      },
-      body: JSON.stringify(formData)
-    });
+    const response = await postLead(JSON.stringify(formData));
     
     if (response.ok) {
       // Show success message